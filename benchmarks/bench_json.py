@@ -0,0 +1,58 @@
+"""Compares JSON parse and encode time for the available backends on the
+sample SXM responses in `tests/sample_data`.
+
+Run with `python benchmarks/bench_json.py`. Backends that are not
+installed are skipped.
+"""
+
+import importlib
+import json
+import pathlib
+import timeit
+
+SAMPLE_DIR = pathlib.Path(__file__).parent.parent / "tests" / "sample_data"
+NUMBER = 200
+
+
+def _backends():
+    backends = {
+        "json": (
+            json.loads,
+            lambda obj: json.dumps(obj, separators=(",", ":")).encode("utf-8"),
+        )
+    }
+
+    try:
+        orjson = importlib.import_module("orjson")
+        backends["orjson"] = (orjson.loads, orjson.dumps)
+    except ImportError:
+        pass
+
+    try:
+        msgspec = importlib.import_module("msgspec")
+        backends["msgspec"] = (msgspec.json.decode, msgspec.json.encode)
+    except ImportError:
+        pass
+
+    return backends
+
+
+def main():
+    samples = sorted(SAMPLE_DIR.glob("*.json"))
+    backends = _backends()
+
+    print(f"{'sample':<24} {'backend':<8} {'size':>8} {'parse ms':>9} {'encode ms':>9}")
+    for sample in samples:
+        raw = sample.read_bytes()
+        obj = json.loads(raw)
+        for name, (loads, dumps) in backends.items():
+            parse = timeit.timeit(lambda: loads(raw), number=NUMBER) / NUMBER
+            encode = timeit.timeit(lambda: dumps(obj), number=NUMBER) / NUMBER
+            print(
+                f"{sample.name:<24} {name:<8} {len(raw):>8} "
+                f"{parse * 1000:>9.3f} {encode * 1000:>9.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
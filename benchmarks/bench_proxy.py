@@ -0,0 +1,161 @@
+"""Benchmarks the HLS proxy from `make_http_app` and the client's
+parsing hot paths against the local SXM mock in `mock_sxm.py`.
+
+Listeners are the simulated HLS players from `sxm.loadtest`. Reports
+request throughput, bytes/sec, stalls and p50/p99 latency for playlist
+and segment requests. Then times `get_playlist`, building the channel
+list, building an `XMLiveChannel` with its markers the way
+`get_live_channel` does and `extract_now_playing`.
+
+Run with `python benchmarks/bench_proxy.py --listeners 50 --output out.json`.
+"""
+
+import argparse
+import asyncio
+import json
+import pathlib
+import sys
+import time
+import timeit
+from typing import Any, Dict
+
+from aiohttp import web
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent))
+
+from mock_sxm import SAMPLE_DIR, MockSXM, make_client, start_mock  # noqa: E402
+
+from sxm.http import make_http_app  # noqa: E402
+from sxm.loadtest import run_load_test  # noqa: E402
+from sxm.models import (  # noqa: E402
+    XMChannel,
+    XMLiveChannel,
+    extract_now_playing,
+)
+from sxm.scheduler import UpstreamScheduler  # noqa: E402
+from sxm.structs import XMChannelStruct  # noqa: E402
+
+NUMBER = 200
+
+
+async def bench_proxy(args) -> Dict[str, Any]:
+    mock = MockSXM(
+        channels=args.channels,
+        latency=args.latency,
+        cdn_latency=args.cdn_latency,
+        target_duration=args.target_duration,
+    )
+    mock_runner = await start_mock(mock)
+    mock_url = "http://{}:{}".format(*mock_runner.addresses[0])
+
+    # same upstream limits as `sxm server`
+    sxm = make_client(mock_url, scheduler=UpstreamScheduler())
+    await sxm.authenticate()
+    await asyncio.gather(sxm.configuration, sxm.channels)
+
+    app = make_http_app(sxm, renew_session=False, precache=args.precache)
+    proxy_runner = web.AppRunner(app, access_log=None)
+    await proxy_runner.setup()
+    await web.TCPSite(proxy_runner, "127.0.0.1", 0).start()
+    proxy_url = "http://{}:{}".format(*proxy_runner.addresses[0])
+
+    channels = [f"channel{i + 1}" for i in range(args.listening_channels)]
+    result = await run_load_test(
+        proxy_url, channels, players=args.listeners, duration=args.duration
+    )
+
+    await proxy_runner.cleanup()
+    await sxm.close_session()
+    await mock_runner.cleanup()
+
+    summary = result.summary()
+    requests = summary["playlist_requests"] + summary["segment_requests"]
+    return {
+        "channels": args.listening_channels,
+        "precache": args.precache,
+        **summary,
+        "requests_per_s": requests / result.duration,
+        "upstream_requests": mock.requests,
+    }
+
+
+async def bench_get_playlist(args) -> Dict[str, Any]:
+    mock = MockSXM(channels=args.channels)
+    mock_runner = await start_mock(mock)
+    sxm = make_client("http://{}:{}".format(*mock_runner.addresses[0]))
+    await sxm.authenticate()
+
+    await sxm.get_playlist("channel1")
+    start = time.monotonic()
+    for _ in range(NUMBER):
+        await sxm.get_playlist("channel1")
+    elapsed = (time.monotonic() - start) / NUMBER
+
+    await sxm.close_session()
+    await mock_runner.cleanup()
+    return {"get_playlist_ms": elapsed * 1000}
+
+
+def bench_parsing(args) -> Dict[str, Any]:
+    raw_channels = MockSXM(channels=args.channels).channels
+    live_channel = json.loads((SAMPLE_DIR / "xm_live_channel.json").read_bytes())
+    live_channel_data = live_channel["moduleList"]["modules"][0]["moduleResponse"][
+        "liveChannelData"
+    ]
+
+    def _time(func) -> float:
+        return timeit.timeit(func, number=NUMBER) / NUMBER * 1000
+
+    def _live_channel() -> XMLiveChannel:
+        # same parse as `SXMClientAsync.get_live_channel`, markers included
+        channel = XMLiveChannel.model_validate(
+            {
+                "channelId": live_channel_data["channelId"],
+                "hlsAudioInfos": live_channel_data.get("hlsAudioInfos", []),
+                "customAudioInfos": live_channel_data.get("customAudioInfos", []),
+            }
+        )
+        channel.merge(live_channel_data)
+        channel.get_latest_cut()
+        channel.get_latest_episode()
+        return channel
+
+    return {
+        "channels_model_ms": _time(
+            lambda: [XMChannel.model_validate(c) for c in raw_channels]
+        ),
+        "channels_struct_ms": _time(
+            lambda: [XMChannelStruct.from_dict(c) for c in raw_channels]
+        ),
+        "live_channel_ms": _time(_live_channel),
+        "live_channel_cut_markers": len(_live_channel().cut_markers),
+        "now_playing_ms": _time(lambda: extract_now_playing({"octane": live_channel})),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--listeners", type=int, default=20)
+    parser.add_argument("--listening-channels", type=int, default=4)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--cdn-latency", type=float, default=0.02)
+    parser.add_argument("--target-duration", type=int, default=2)
+    parser.add_argument("--no-precache", dest="precache", action="store_false")
+    parser.add_argument("--output", type=pathlib.Path)
+    args = parser.parse_args()
+
+    results = {
+        "proxy": asyncio.run(bench_proxy(args)),
+        "client": asyncio.run(bench_get_playlist(args)),
+        "parsing": bench_parsing(args),
+    }
+
+    print(json.dumps(results, indent=2))
+    if args.output is not None:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Local mock of the SXM REST API and HLS CDN for benchmarks.
+
+Serves login/resume, configuration, the channel list, now playing, the
+variant and media playlists and AAC segments with configurable latency.
+:class:`MockTransport` sends every request an :class:`SXMClientAsync`
+makes to the mock, so the client runs unmodified.
+"""
+
+import asyncio
+import json
+import pathlib
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from aiohttp import web
+
+from sxm import SXMClientAsync
+
+SAMPLE_DIR = pathlib.Path(__file__).parent.parent / "tests" / "sample_data"
+
+
+def _module_response(module_response: Dict[str, Any], **module) -> Dict[str, Any]:
+    return {
+        "ModuleListResponse": {
+            "messages": [{"message": "Successful", "code": 100}],
+            "status": 1,
+            "moduleList": {"modules": [{"moduleResponse": module_response, **module}]},
+        }
+    }
+
+
+def make_channels(count: int) -> List[Dict[str, Any]]:
+    """Returns `count` raw channel dicts shaped like the SXM channel list"""
+
+    channels = []
+    for number in range(1, count + 1):
+        channel_id = f"channel{number}"
+        channels.append(
+            {
+                "channelGuid": f"{channel_id}-guid",
+                "channelId": channel_id,
+                "name": f"Channel {number}",
+                "streamingName": f"Channel {number}",
+                "sortOrder": number,
+                "shortDescription": "Mock channel",
+                "mediumDescription": "Mock channel for benchmarks",
+                "url": "",
+                "isAvailable": True,
+                "isFavorite": number <= 10,
+                "isMature": False,
+                "siriusChannelNumber": number,
+                "images": {
+                    "images": [
+                        {
+                            "name": "color channel logo (on dark)",
+                            "url": f"https://example.com/{channel_id}.png",
+                            "platform": "web",
+                            "height": 100,
+                            "width": 100,
+                        }
+                    ]
+                },
+                "categories": {
+                    "categories": [{"categoryGuid": "rock-guid", "name": "Rock"}]
+                },
+            }
+        )
+    return channels
+
+
+class MockSXM:
+    """aiohttp app mocking SXM
+
+    Parameters
+    ----------
+    channels : :class:`int`
+        Number of channels in the channel list
+    latency : :class:`float`
+        Seconds added to every REST response
+    cdn_latency : :class:`float`
+        Seconds added to every playlist and segment response
+    segment_size : :class:`int`
+        Size of each AAC segment in bytes
+    target_duration : :class:`int`
+        Segment length in seconds; the media sequence advances in real time
+    """
+
+    def __init__(
+        self,
+        channels: int = 50,
+        latency: float = 0.0,
+        cdn_latency: float = 0.0,
+        segment_size: int = 160_000,
+        target_duration: int = 10,
+    ):
+        self.latency = latency
+        self.cdn_latency = cdn_latency
+        self.target_duration = target_duration
+        self.segment = bytes(segment_size)
+        self.requests: Dict[str, int] = {}
+
+        self.channels = make_channels(channels)
+        self.config = json.loads((SAMPLE_DIR / "xm_config.json").read_bytes())
+        self.live_channel = (
+            '{"ModuleListResponse": '
+            + (SAMPLE_DIR / "xm_live_channel.json").read_text()
+            + "}"
+        )
+
+    def _count(self, name: str) -> None:
+        self.requests[name] = self.requests.get(name, 0) + 1
+
+    async def _rest(self, name: str) -> None:
+        self._count(name)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def _cdn(self, name: str) -> None:
+        self._count(name)
+        if self.cdn_latency:
+            await asyncio.sleep(self.cdn_latency)
+
+    async def login(self, request: web.Request) -> web.Response:
+        await self._rest("login")
+        response = web.json_response(_module_response({}))
+        response.set_cookie("SXMAUTHNEW", "mock")
+        return response
+
+    async def resume(self, request: web.Request) -> web.Response:
+        await self._rest("resume")
+        response = web.json_response(_module_response({}))
+        response.set_cookie("AWSALB", "mock")
+        response.set_cookie("JSESSIONID", "mock")
+        response.set_cookie("SXMAKTOKEN", "token=mock,expiry")
+        return response
+
+    async def configuration(self, request: web.Request) -> web.Response:
+        await self._rest("configuration")
+        return web.json_response(self.config)
+
+    async def channel_list(self, request: web.Request) -> web.Response:
+        await self._rest("channels")
+        return web.json_response(
+            _module_response(
+                {"contentData": {"channelListing": {"channels": self.channels}}}
+            )
+        )
+
+    async def now_playing(self, request: web.Request) -> web.Response:
+        await self._rest("now_playing")
+        channel_id = request.query.get("channelId", "octane")
+        return web.Response(
+            text=self.live_channel.replace("octane", channel_id),
+            content_type="application/json",
+        )
+
+    async def variant_playlist(self, request: web.Request) -> web.Response:
+        await self._cdn("variant")
+        channel_id = request.match_info["channel"]
+        size = request.match_info["size"]
+        return web.Response(
+            text=(
+                "#EXTM3U\n"
+                '#EXT-X-STREAM-INF:BANDWIDTH=281600,CODECS="mp4a.40.2"\n'
+                f"{channel_id}_{size}_v3/prog_index.m3u8\n"
+            ),
+            content_type="application/x-mpegURL",
+        )
+
+    async def media_playlist(self, request: web.Request) -> web.Response:
+        await self._cdn("playlist")
+        folder = request.match_info["folder"]
+        first = int(time.time() // self.target_duration) - 5
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            f"#EXT-X-MEDIA-SEQUENCE:{first}",
+        ]
+        for sequence in range(first, first + 6):
+            lines.append(f"#EXTINF:{self.target_duration},")
+            lines.append(f"{folder}_{sequence}.aac")
+        return web.Response(text="\n".join(lines), content_type="application/x-mpegURL")
+
+    async def aac_segment(self, request: web.Request) -> web.Response:
+        await self._cdn("segment")
+        return web.Response(body=self.segment, content_type="audio/x-aac")
+
+    def make_app(self) -> web.Application:
+        modules = "/rest/{version}/experience/modules"
+        app = web.Application()
+        app.router.add_post(f"{modules}/modify/authentication", self.login)
+        app.router.add_post(f"{modules}/resume", self.resume)
+        app.router.add_get(f"{modules}/get/configuration", self.configuration)
+        app.router.add_post(f"{modules}/get", self.channel_list)
+        app.router.add_get(f"{modules}/tune/now-playing-live", self.now_playing)
+        app.router.add_get(
+            "/AAC_Data/{channel}/{channel2}_variant_{size}_v3.m3u8",
+            self.variant_playlist,
+        )
+        app.router.add_get(
+            "/AAC_Data/{channel}/{folder}/prog_index.m3u8", self.media_playlist
+        )
+        app.router.add_get("/AAC_Data/{path:.*}.aac", self.aac_segment)
+        return app
+
+
+class MockTransport(httpx.AsyncBaseTransport):
+    """httpx transport that sends every request to the mock server,
+    keeping the path and query"""
+
+    def __init__(self, base_url: str):
+        self._base = httpx.URL(base_url)
+        self._transport = httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.url = request.url.copy_with(
+            scheme=self._base.scheme, host=self._base.host, port=self._base.port
+        )
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+class MockSXMClient(SXMClientAsync):
+    """:class:`SXMClientAsync` whose sessions talk to a :class:`MockSXM`"""
+
+    mock_url: Optional[str] = None
+
+    def reset_session(self) -> None:
+        super().reset_session()
+        if self.mock_url is not None:
+            headers = self._session.headers
+            self._session = httpx.AsyncClient(transport=MockTransport(self.mock_url))
+            self._session.headers.update(headers)
+
+
+async def start_mock(mock: MockSXM, host: str = "127.0.0.1") -> web.AppRunner:
+    """Starts the mock on a free port. The URL is in
+    `runner.addresses`"""
+
+    runner = web.AppRunner(mock.make_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, 0).start()
+    return runner
+
+
+def make_client(mock_url: str, **kwargs) -> MockSXMClient:
+    """Returns a client bound to the mock at `mock_url`"""
+
+    client_cls = type("MockSXMClient", (MockSXMClient,), {"mock_url": mock_url})
+    return client_cls("user", "password", user_agent="benchmark", **kwargs)
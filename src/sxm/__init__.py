@@ -9,7 +9,7 @@ from sxm.client import (
     SXMClient,
     SXMClientAsync,
 )
-from sxm.http import make_http_handler, run_http_server
+from sxm.http import make_http_app, make_http_handler, run_http_server, serve
 from sxm.models import QualitySize, RegionChoice
 
 __author__ = """AngellusMortis"""
@@ -18,8 +18,10 @@ __version__ = "0.2.8"
 __all__ = [
     "AuthenticationError",
     "HLS_AES_KEY",
+    "make_http_app",
     "make_http_handler",
     "run_http_server",
+    "serve",
     "SegmentRetrievalException",
     "SXMClient",
     "SXMClientAsync",
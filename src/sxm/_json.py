@@ -0,0 +1,49 @@
+"""JSON backend for sxm
+
+Uses `orjson` or `msgspec` if either is installed, otherwise falls back
+to the standard library `json` module. Both functions work on bytes so
+HTTP bodies never need an extra decode/encode step.
+"""
+
+import json
+from typing import Any, Union
+
+__all__ = ["BACKEND", "dumps", "loads"]
+
+
+try:
+    import orjson  # type: ignore
+
+    BACKEND = "orjson"
+
+    def loads(data: Union[bytes, str]) -> Any:
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+except ImportError:
+    try:
+        import msgspec  # type: ignore
+
+        BACKEND = "msgspec"
+        _encoder = msgspec.json.Encoder()
+        _decoder = msgspec.json.Decoder()
+
+        def loads(data: Union[bytes, str]) -> Any:
+            try:
+                return _decoder.decode(data)
+            except msgspec.DecodeError as e:
+                raise ValueError(str(e)) from e
+
+        def dumps(obj: Any) -> bytes:
+            return _encoder.encode(obj)
+
+    except ImportError:
+        BACKEND = "json"
+
+        def loads(data: Union[bytes, str]) -> Any:
+            return json.loads(data)
+
+        def dumps(obj: Any) -> bytes:
+            return json.dumps(obj, separators=(",", ":")).encode("utf-8")
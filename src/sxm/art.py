@@ -0,0 +1,311 @@
+"""Artwork proxy module for sxm
+
+Channel, show and album art URLs from the SXM models point at a handful
+of SXM image hosts. :class:`ArtProxy` fetches them once, caches them and
+optionally scales them down to one of :data:`ART_SIZES`, so UIs for many
+clients only cost one upstream request per image. Resizing needs the
+`art` extra (Pillow); without it, the original image is served.
+"""
+
+import logging
+import re
+from asyncio import CancelledError, Semaphore, Task, gather, get_event_loop, shield
+from io import BytesIO
+from typing import Dict, Optional
+from urllib import parse
+
+import httpx
+
+from sxm.cache import SegmentCache
+
+try:
+    from PIL import Image  # type: ignore
+
+    HAS_PILLOW = True
+except ImportError:  # pragma: no cover
+    HAS_PILLOW = False
+
+__all__ = [
+    "ART_HOSTS",
+    "ART_SIZES",
+    "ArtProxy",
+    "art_path",
+    "art_url",
+    "is_art_host",
+    "is_art_url",
+    "resize_image",
+]
+
+# max width/height in pixels of each size
+ART_SIZES = {"small": 120, "medium": 300, "large": 600}
+ART_MAX_AGE = 86400
+ART_MAX_SIZE = 5 * 1024 * 1024
+# image hosts only, so `/art/` can not reach the SXM API hosts
+ART_HOSTS = frozenset(
+    {
+        "albumart.siriusxm.com",
+        "pri.art.prod.streaming.siriusxm.com",
+        "sec.art.prod.streaming.siriusxm.com",
+        "siriusxm-priprodart.akamaized.net",
+        "siriusxm-secprodart.akamaized.net",
+    }
+)
+HOST_RE = re.compile(r"[A-Za-z0-9.-]+")
+
+
+def is_art_host(host: str) -> bool:
+    """Returns if `host` is one of the SXM image hosts in
+    :data:`ART_HOSTS`. Only plain host names are accepted, no ports, user
+    info or other URL syntax."""
+
+    if not HOST_RE.fullmatch(host):
+        return False
+    return host.lower() in ART_HOSTS
+
+
+def is_art_url(url: str) -> bool:
+    """Returns if `url` parses to an http(s) URL on an SXM image host"""
+
+    try:
+        parsed = httpx.URL(url)
+    except httpx.InvalidURL:
+        return False
+    return parsed.scheme in ("http", "https") and is_art_host(parsed.host)
+
+
+def art_url(scheme: str, host: str, path: str) -> Optional[str]:
+    """Returns the SXM art URL for an `/art/{scheme}/{host}/{path}`
+    request, or `None` if it does not point at an SXM image host
+
+    Parameters
+    ----------
+    scheme : :class:`str`
+        `http` or `https`
+    host : :class:`str`
+        Image host name
+    path : :class:`str`
+        Decoded image path
+    """
+
+    if scheme not in ("http", "https") or not is_art_host(host):
+        return None
+
+    url = f"{scheme}://{host}/{parse.quote(path)}"
+    # check what the URL actually parses to, not the parts it was built from
+    if not is_art_url(url):
+        return None
+    return url
+
+
+def art_path(url: str, size: Optional[str] = None) -> Optional[str]:
+    """Returns the proxy path for an SXM art URL, e.g. for
+    :attr:`XMArt.url`, or `None` if it is not from an SXM image host
+
+    Parameters
+    ----------
+    url : :class:`str`
+        Absolute art URL
+    size : Optional[:class:`str`]
+        One of :data:`ART_SIZES` to scale the image down to
+    """
+
+    parts = parse.urlsplit(url)
+    if art_url(parts.scheme, parts.netloc, parse.unquote(parts.path[1:])) is None:
+        return None
+
+    path = f"/art/{parts.scheme}/{parts.netloc}{parts.path}"
+    if size is not None:
+        path += f"?size={size}"
+    return path
+
+
+def resize_image(data: bytes, size: int) -> bytes:
+    """Scales an image down to fit in a `size` by `size` box, keeping its
+    format. Images that already fit are returned as is."""
+
+    with Image.open(BytesIO(data)) as image:
+        if max(image.size) <= size:
+            return data
+
+        image_format = image.format
+        image.thumbnail((size, size))
+        output = BytesIO()
+        if image_format == "JPEG":
+            image.save(output, format=image_format, quality=85, optimize=True)
+        else:
+            image.save(output, format=image_format, optimize=True)
+        return output.getvalue()
+
+
+class ArtProxy:
+    """Fetches, resizes and caches SXM artwork.
+
+    Requests for the same image and size share one upstream fetch and one
+    resize, and at most `concurrency` images are fetched at a time. Images
+    larger than `max_size` are not fetched.
+
+    Parameters
+    ----------
+    cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache for original and resized images. Without
+        one, every request fetches the image again
+    concurrency : :class:`int`
+        Max concurrent upstream image requests
+    session : Optional[:class:`httpx.AsyncClient`]
+        HTTP client to fetch images with. Defaults to a client owned and
+        closed by the proxy
+    max_size : :class:`int`
+        Max size of an upstream image in bytes
+    """
+
+    cache: Optional[SegmentCache]
+    max_size: int
+
+    _semaphore: Semaphore
+    _tasks: Dict[str, Task]
+    _session: Optional[httpx.AsyncClient]
+
+    def __init__(
+        self,
+        cache: Optional[SegmentCache] = None,
+        concurrency: int = 8,
+        session: Optional[httpx.AsyncClient] = None,
+        max_size: int = ART_MAX_SIZE,
+    ):
+        self._log = logging.getLogger(__file__)
+
+        self.cache = cache
+        self.max_size = max_size
+
+        self._semaphore = Semaphore(concurrency)
+        self._tasks = {}
+        self._session = session
+        self._owns_session = session is None
+
+    @property
+    def can_resize(self) -> bool:
+        return HAS_PILLOW
+
+    def cache_key(self, url: str, size: Optional[str] = None) -> str:
+        """Returns the cache key for an image at `size`"""
+
+        if size is None or not self.can_resize:
+            return url
+        return f"{url}@{size}"
+
+    async def get(self, url: str, size: Optional[str] = None) -> Optional[bytes]:
+        """Returns an image, scaled down to `size` if resizing is
+        available, from the cache or upstream. Returns `None` if it could
+        not be fetched."""
+
+        key = self.cache_key(url, size)
+        data = await self._get_cached(key)
+        if data is not None:
+            return data
+
+        task = self._tasks.get(key)
+        if task is None:
+            if size is None or key == url:
+                task = get_event_loop().create_task(self._fetch(url))
+            else:
+                task = get_event_loop().create_task(self._resize(url, size))
+            self._tasks[key] = task
+            task.add_done_callback(lambda _: self._tasks.pop(key, None))
+
+        try:
+            return await shield(task)
+        except CancelledError:
+            if task.cancelled():
+                return None
+            raise
+
+    async def close(self) -> None:
+        """Cancels running fetches and closes the HTTP client, if owned"""
+
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await gather(*tasks, return_exceptions=True)
+
+        if self._owns_session and self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    async def _get_cached(self, key: str) -> Optional[bytes]:
+        if self.cache is None:
+            return None
+
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        file_path = self.cache.get_file(key)
+        if file_path is None:
+            return None
+        try:
+            return await get_event_loop().run_in_executor(None, file_path.read_bytes)
+        except OSError:
+            return None
+
+    async def _fetch(self, url: str) -> Optional[bytes]:
+        if not is_art_url(url):
+            self._log.warning(f"Refusing to fetch art from {url}")
+            return None
+
+        if self._session is None:
+            self._session = httpx.AsyncClient()
+
+        async with self._semaphore:
+            try:
+                data = await self._download(self._session, url)
+            except httpx.RequestError as e:
+                self._log.warning(f"Could not fetch art {url}: {e}")
+                return None
+
+        if data is None:
+            return None
+        if self.cache is not None:
+            self.cache.put(url, data)
+        return data
+
+    async def _download(self, session: httpx.AsyncClient, url: str) -> Optional[bytes]:
+        # redirects could point anywhere, so they are not followed
+        async with session.stream("GET", url, follow_redirects=False) as response:
+            if response.status_code != 200:
+                self._log.warning(
+                    f"Received status code {response.status_code} for {url}"
+                )
+                return None
+
+            length = response.headers.get("Content-Length", "")
+            if length.isdigit() and int(length) > self.max_size:
+                self._log.warning(f"Art {url} is larger than {self.max_size} bytes")
+                return None
+
+            chunks = []
+            received = 0
+            # the header can be missing or wrong, so count what arrives
+            async for chunk in response.aiter_bytes():
+                received += len(chunk)
+                if received > self.max_size:
+                    self._log.warning(f"Art {url} is larger than {self.max_size} bytes")
+                    return None
+                chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def _resize(self, url: str, size: str) -> Optional[bytes]:
+        data = await self.get(url)
+        if data is None:
+            return None
+
+        try:
+            resized = await get_event_loop().run_in_executor(
+                None, resize_image, data, ART_SIZES[size]
+            )
+        except Exception as e:  # noqa: BLE001
+            self._log.warning(f"Could not resize art {url}: {e}")
+            return data
+
+        if self.cache is not None:
+            self.cache.put(self.cache_key(url, size), resized)
+        return resized
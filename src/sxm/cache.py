@@ -0,0 +1,168 @@
+"""Segment cache module for sxm"""
+
+import hashlib
+import logging
+import os
+import pathlib
+from asyncio import Task, gather, get_event_loop
+from collections import OrderedDict
+from typing import List, Optional, Set, Union
+
+__all__ = ["SegmentCache"]
+
+
+class SegmentCache:
+    """Two tier cache for HLS segments: a small in memory LRU on top of a
+    size capped directory on disk.
+
+    Disk writes and deletes run in the default executor, so the event
+    loop never blocks on disk IO. Files on disk can be served with
+    :class:`aiohttp.web.FileResponse`, which uses `sendfile`. Files left
+    in the directory by an earlier run are reused.
+
+    Parameters
+    ----------
+    directory : Union[:class:`str`, :class:`pathlib.Path`]
+        Directory to store segments in. Created if it does not exist
+    max_bytes : :class:`int`
+        Max total size of the segments on disk
+    memory_items : :class:`int`
+        Number of segments kept in memory
+    suffix : :class:`str`
+        File name suffix of the cached files, so other kinds of files
+        (e.g. artwork) can be cached in their own directory
+    """
+
+    directory: pathlib.Path
+    max_bytes: int
+    memory_items: int
+    suffix: str
+
+    _memory: "OrderedDict[str, bytes]"
+    _files: "OrderedDict[str, int]"
+    _size: int
+    _pending: Set[str]
+    _writes: Set[Task]
+
+    def __init__(
+        self,
+        directory: Union[str, pathlib.Path],
+        max_bytes: int = 512 * 1024 * 1024,
+        memory_items: int = 32,
+        suffix: str = ".aac",
+    ):
+        self._log = logging.getLogger(__file__)
+
+        self.directory = pathlib.Path(directory)
+        self.max_bytes = max_bytes
+        self.memory_items = memory_items
+        self.suffix = suffix
+
+        self._memory = OrderedDict()
+        self._files = OrderedDict()
+        self._size = 0
+        self._pending = set()
+        self._writes = set()
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    @property
+    def size(self) -> int:
+        """Total size of the segments on disk"""
+
+        return self._size
+
+    def get(self, path: str) -> Optional[bytes]:
+        """Returns a segment from the memory tier"""
+
+        data = self._memory.get(path)
+        if data is not None:
+            self._memory.move_to_end(path)
+        return data
+
+    def get_file(self, path: str) -> Optional[pathlib.Path]:
+        """Returns the file for a segment from the disk tier"""
+
+        name = self._file_name(path)
+        if name not in self._files:
+            return None
+
+        self._files.move_to_end(name)
+        return self.directory / name
+
+    def put(self, path: str, data: bytes) -> None:
+        """Adds a segment to the memory tier and writes it to disk in the
+        background"""
+
+        self._memory[path] = data
+        self._memory.move_to_end(path)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+        name = self._file_name(path)
+        if name in self._files or name in self._pending:
+            return
+
+        self._pending.add(name)
+        task = get_event_loop().create_task(self._write(name, data))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def close(self) -> None:
+        """Waits for pending disk writes"""
+
+        if self._writes:
+            await gather(*self._writes, return_exceptions=True)
+
+    def _file_name(self, path: str) -> str:
+        digest = hashlib.blake2b(path.encode("utf-8"), digest_size=16).hexdigest()
+        return f"{digest}{self.suffix}"
+
+    def _load(self) -> None:
+        for temp_file in self.directory.glob("*.tmp"):
+            temp_file.unlink(missing_ok=True)
+
+        entries = sorted(
+            (entry.stat().st_mtime, entry.name, entry.stat().st_size)
+            for entry in self.directory.glob(f"*{self.suffix}")
+        )
+        for _, name, size in entries:
+            self._files[name] = size
+            self._size += size
+
+        self._remove(self._evict())
+
+    async def _write(self, name: str, data: bytes) -> None:
+        loop = get_event_loop()
+        try:
+            await loop.run_in_executor(None, self._write_file, name, data)
+        except OSError as e:
+            self._log.warning(f"Could not write segment to cache: {e}")
+            return
+        finally:
+            self._pending.discard(name)
+
+        self._files[name] = len(data)
+        self._size += len(data)
+
+        victims = self._evict()
+        if victims:
+            await loop.run_in_executor(None, self._remove, victims)
+
+    def _write_file(self, name: str, data: bytes) -> None:
+        temp_file = self.directory / f"{name}.tmp"
+        temp_file.write_bytes(data)
+        os.replace(temp_file, self.directory / name)
+
+    def _evict(self) -> List[str]:
+        victims = []
+        while self._size > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self._size -= size
+            victims.append(name)
+        return victims
+
+    def _remove(self, names: List[str]) -> None:
+        for name in names:
+            (self.directory / name).unlink(missing_ok=True)
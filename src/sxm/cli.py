@@ -2,11 +2,22 @@
 
 """Console script for sxm."""
 
+import asyncio
 import logging
+from pathlib import Path
+from typing import List, Optional
 
 import typer
 
-from sxm import QualitySize, RegionChoice, SXMClient, run_http_server
+from sxm import QualitySize, RegionChoice, SXMClient, SXMClientAsync
+from sxm._json import dumps as json_dumps
+from sxm.cache import SegmentCache
+from sxm.client import AuthenticationError, ConfigurationError
+from sxm.http import serve
+from sxm.loadtest import run_load_test
+from sxm.models import extract_now_playing
+from sxm.scheduler import DEFAULT_CDN_RATE, DEFAULT_REST_RATE, UpstreamScheduler
+from sxm.tracing import Tracer
 
 app = typer.Typer()
 
@@ -65,6 +76,83 @@ OPTION_PRECACHE = typer.Option(
     help="Turn off precaching AAC chunks",
     envvar="SXM_PRECACHE",
 )
+OPTION_SEGMENT_CACHE = typer.Option(
+    None,
+    "--segment-cache",
+    help="Directory to cache AAC segments in on disk",
+    envvar="SXM_SEGMENT_CACHE",
+)
+OPTION_SEGMENT_CACHE_SIZE = typer.Option(
+    512,
+    "--segment-cache-size",
+    help="Max size of the on disk segment cache in MB",
+    envvar="SXM_SEGMENT_CACHE_SIZE",
+)
+OPTION_ART_CACHE = typer.Option(
+    None,
+    "--art-cache",
+    help="Directory to cache /art/ images in on disk",
+    envvar="SXM_ART_CACHE",
+)
+OPTION_ART_CACHE_SIZE = typer.Option(
+    128,
+    "--art-cache-size",
+    help="Max size of the on disk art cache in MB",
+    envvar="SXM_ART_CACHE_SIZE",
+)
+OPTION_WARMUP = typer.Option(
+    True,
+    "--warmup/--no-warmup",
+    help="Resolve playlist URLs before serving",
+    envvar="SXM_WARMUP",
+)
+OPTION_WARMUP_CHANNELS = typer.Option(
+    None,
+    "--warmup-channel",
+    "-w",
+    help="Channel to warm up, can be repeated. Defaults to favorite channels",
+    envvar="SXM_WARMUP_CHANNELS",
+)
+OPTION_REST_RATE = typer.Option(
+    DEFAULT_REST_RATE,
+    "--rest-rate",
+    help="Max SXM API requests per second, 0 for no limit",
+    envvar="SXM_REST_RATE",
+)
+OPTION_CDN_RATE = typer.Option(
+    DEFAULT_CDN_RATE,
+    "--cdn-rate",
+    help="Max SXM playlist and segment requests per second, 0 for no limit",
+    envvar="SXM_CDN_RATE",
+)
+OPTION_FAST_MODELS = typer.Option(
+    False,
+    "--fast-models",
+    help="Build the channel list without pydantic validation",
+    envvar="SXM_FAST_MODELS",
+)
+OPTION_SLOW_REQUESTS = typer.Option(
+    None,
+    "--slow-requests",
+    help="Log SXM requests slower than this many seconds with phase timings",
+    envvar="SXM_SLOW_REQUESTS",
+)
+OPTION_LOADTEST_URL = typer.Option(
+    "http://127.0.0.1:9999", "--url", "-u", help="Base URL of running SXM proxy"
+)
+OPTION_LOADTEST_PLAYERS = typer.Option(
+    10, "--players", "-n", help="Number of simulated HLS players"
+)
+OPTION_LOADTEST_DURATION = typer.Option(
+    60, "--duration", "-d", help="Seconds to run the load test for"
+)
+OPTION_LOADTEST_RAMP_UP = typer.Option(
+    0, "--ramp-up", help="Seconds to spread player start times over"
+)
+OPTION_LOADTEST_QUALITY = typer.Option(
+    None, "--quality", "-q", help="Stream quality to request"
+)
+OPTION_LOADTEST_JSON = typer.Option(False, "--json", help="Print results as JSON")
 
 
 @app.command()
@@ -78,6 +166,16 @@ def server(
     region: RegionChoice = OPTION_REGION,
     quality: QualitySize = OPTION_QUALITY,
     precache: bool = OPTION_PRECACHE,
+    slow_requests: Optional[float] = OPTION_SLOW_REQUESTS,
+    segment_cache_dir: Optional[Path] = OPTION_SEGMENT_CACHE,
+    segment_cache_size: int = OPTION_SEGMENT_CACHE_SIZE,
+    art_cache_dir: Optional[Path] = OPTION_ART_CACHE,
+    art_cache_size: int = OPTION_ART_CACHE_SIZE,
+    warmup: bool = OPTION_WARMUP,
+    warmup_channels: Optional[List[str]] = OPTION_WARMUP_CHANNELS,
+    rest_rate: float = OPTION_REST_RATE,
+    cdn_rate: float = OPTION_CDN_RATE,
+    fast_models: bool = OPTION_FAST_MODELS,
 ) -> int:
     """SXM proxy command line application."""
 
@@ -88,8 +186,52 @@ def server(
     else:
         logging.basicConfig(level=logging.WARNING)
 
-    with SXMClient(username, password, region=region, quality=quality) as sxm:
-        run_http_server(sxm, port, ip=host, precache=precache)
+    tracer = None
+    if slow_requests is not None:
+        tracer = Tracer(slow_threshold=slow_requests)
+
+    segment_cache = None
+    if segment_cache_dir is not None:
+        segment_cache = SegmentCache(
+            segment_cache_dir, max_bytes=segment_cache_size * 1024 * 1024
+        )
+
+    art_cache = None
+    if art_cache_dir is not None:
+        art_cache = SegmentCache(
+            art_cache_dir, max_bytes=art_cache_size * 1024 * 1024, suffix=".img"
+        )
+
+    scheduler = UpstreamScheduler(rest_rate=rest_rate, cdn_rate=cdn_rate)
+
+    async def run_server():
+        async with SXMClientAsync(
+            username,
+            password,
+            region=region,
+            quality=quality,
+            fast_models=fast_models,
+            tracer=tracer,
+            scheduler=scheduler,
+        ) as sxm:
+            await serve(
+                sxm,
+                port,
+                ip=host,
+                precache=precache,
+                segment_cache=segment_cache,
+                art_cache=art_cache,
+                warmup=warmup,
+                warmup_channels=warmup_channels or None,
+            )
+
+    try:
+        asyncio.run(run_server())
+    except (AuthenticationError, ConfigurationError) as e:
+        logging.fatal(str(e))
+        return 1
+    except KeyboardInterrupt:
+        pass
     return 0
 
 
@@ -164,53 +306,61 @@ def now_playing(
                 message = data["messages"][0].get("message", "")
                 typer.echo(f"SXM returned error {message_code} {message}")
                 return 1
-            live_channel_data = data["moduleList"]["modules"][0]["moduleResponse"][
-                "liveChannelData"
-            ]
         except (KeyError, IndexError):
             typer.echo("Error parsing SXM live channel response")
             return 1
-        # Compute latest cut from markerLists
-        marker_lists = live_channel_data.get("markerLists", [])
-        cut_markers = []
-        for marker_list in marker_lists:
-            if marker_list.get("layer") == "cut":
-                for m in marker_list.get("markers", []):
-                    if "cut" in m:
-                        cut_markers.append(m)
-
-        if not cut_markers:
+
+        record = extract_now_playing({channel_id: data})[channel_id]
+        if record is None:
             typer.echo(f"Could not get latest cut for {channel_id}")
             return 1
 
-        # Choose latest by time <= now (ms)
-        import time as _time
-
-        now_ms = int(_time.time() * 1000)
-        cut_markers.sort(key=lambda x: x.get("time", 0))
-        latest = None
-        for m in cut_markers:
-            if m.get("time", 0) <= now_ms:
-                latest = m
-            else:
-                break
-
-        if latest is None:
-            latest = cut_markers[-1]
-
-        cut = latest.get("cut", {})
-        title = cut.get("title") or "Unknown"
-        artists = cut.get("artists") or []
-        artist = artists[0]["name"] if artists else "Unknown"
-        album = None
-        if "album" in cut and cut["album"]:
-            album = cut["album"].get("title")
-
         typer.echo(f"Currently playing on {channel_id}:")
-        typer.echo(f"  Title: {title}")
-        typer.echo(f"  Artist: {artist}")
-        if album:
-            typer.echo(f"  Album: {album}")
+        typer.echo(f"  Title: {record.title}")
+        typer.echo(f"  Artist: {record.artist}")
+        if record.album:
+            typer.echo(f"  Album: {record.album}")
+    return 0
+
+
+@app.command()
+def loadtest(
+    channels: List[str] = typer.Argument(..., help="Channel IDs to play"),
+    url: str = OPTION_LOADTEST_URL,
+    players: int = OPTION_LOADTEST_PLAYERS,
+    duration: float = OPTION_LOADTEST_DURATION,
+    ramp_up: float = OPTION_LOADTEST_RAMP_UP,
+    quality: Optional[QualitySize] = OPTION_LOADTEST_QUALITY,
+    as_json: bool = OPTION_LOADTEST_JSON,
+    verbose: bool = OPTION_VERBOSE,
+    quiet: bool = OPTION_QUIET,
+) -> int:
+    """Simulates HLS players against a running SXM proxy."""
+
+    if verbose:
+        logging.basicConfig(level=logging.DEBUG)
+    elif quiet:
+        logging.basicConfig(level=logging.ERROR)
+    else:
+        logging.basicConfig(level=logging.WARNING)
+
+    result = asyncio.run(
+        run_load_test(
+            url,
+            channels,
+            players=players,
+            duration=duration,
+            ramp_up=ramp_up,
+            quality=None if quality is None else quality.value,
+        )
+    )
+
+    summary = result.summary()
+    if as_json:
+        typer.echo(json_dumps(summary).decode("utf-8"))
+    else:
+        for key, value in summary.items():
+            typer.echo(f"{key}: {value}")
     return 0
 
 
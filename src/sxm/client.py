@@ -1,3 +1,4 @@
+import asyncio
 import base64
 import datetime
 import inspect
@@ -6,7 +7,18 @@ import logging
 import re
 import time
 import traceback
-from typing import Any, Callable, Dict, List, Optional, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 from urllib import parse
 
 import httpx
@@ -15,7 +27,22 @@ from make_it_sync import make_sync  # type: ignore
 from tenacity import retry, stop_after_attempt, wait_fixed
 from ua_parser import user_agent_parser  # type: ignore
 
-from sxm.models import QualitySize, RegionChoice, XMChannel, XMLiveChannel
+from sxm._json import loads as json_loads
+from sxm.models import (
+    QualitySize,
+    RegionChoice,
+    XMChannel,
+    XMLiveChannel,
+    build_hls_variant_table,
+)
+from sxm.scheduler import (
+    EndpointClass,
+    Priority,
+    UpstreamScheduler,
+    upstream_priority,
+)
+from sxm.structs import AnyChannel, XMChannelStruct
+from sxm.tracing import Tracer, trace_retry, traced
 
 __all__ = [
     "HLS_AES_KEY",
@@ -35,6 +62,9 @@ FALLBACK_UA = (
 REST_V2_FORMAT = "https://player.siriusxm.com/rest/v2/experience/modules/{}"
 REST_V4_FORMAT = "https://player.siriusxm.com/rest/v4/experience/modules/{}"
 SESSION_MAX_LIFE = 14400
+SESSION_RENEW_MARGIN = 900
+SESSION_DRAIN_TIME = 30
+MARKER_RETENTION = datetime.timedelta(hours=6)
 
 ENABLE_NEW_CHANNELS = True
 
@@ -78,6 +108,15 @@ class SXMClientAsync:
     update_handler : Optional[Callable[[:class:`dict`], `None`]]
         Callback to be called whenever a playlist updates and new
         Live Channel data is retrieved. Defaults to `None`.
+    fast_models : :class:`bool`
+        Use the unvalidated :mod:`sxm.structs` variants instead of the
+        pydantic models for the channel list. Defaults to `False`.
+    tracer : Optional[:class:`Tracer`]
+        Traces upstream requests, playlist URL resolution, segment fetches
+        and retries. Defaults to `None`.
+    scheduler : Optional[:class:`UpstreamScheduler`]
+        Rate limits and prioritizes upstream requests. Defaults to no
+        limits; `sxm server` passes one with the default limits.
 
     Attributes
     ----------
@@ -91,13 +130,15 @@ class SXMClientAsync:
         Needs documentation
     channels : List[:class:`XMChannel`]
         Retrieves and returns a full list of all :class:`XMChannel`
-        available to the logged in account
+        available to the logged in account, as :class:`XMChannelStruct`
+        with `fast_models`
     favorite_channels : List[:class:`XMChannel`]
         Retrieves and returns a full list of all :class:`XMChannel`
         available to the logged in account that are marked
         as favorite
     """
 
+    fast_models: bool
     last_renew: Optional[float]
     password: str
     region: RegionChoice
@@ -105,15 +146,27 @@ class SXMClientAsync:
     update_interval: int
     username: str
     stream_quality: QualitySize
-
-    _channels: Optional[List[XMChannel]]
-    _favorite_channels: Optional[List[XMChannel]]
-    _playlists: Dict[str, str]
+    tracer: Optional[Tracer]
+    scheduler: UpstreamScheduler
+
+    _channels: Optional[List[AnyChannel]]
+    _channel_index: Dict[str, AnyChannel]
+    _favorite_channels: Optional[List[AnyChannel]]
+    _live_channels: Dict[str, XMLiveChannel]
+    _hls_tables: Dict[str, Tuple[Tuple[Any, ...], Dict[Tuple[str, str], str]]]
+    _playlists: Dict[Tuple[str, QualitySize], str]
     _use_primary: bool
     _ua: Dict[str, Any]
     _session: httpx.AsyncClient
+    _session_start: float
+    _renew_task: Optional[asyncio.Task] = None
+    _auth_task: Optional[asyncio.Task] = None
+    _session_generation: int = 0
+    _draining: Set[asyncio.Task]
     _configuration: Optional[Dict] = None
     _urls: Optional[Dict[str, str]] = None
+    _segment_base: Optional[str] = None
+    _token_query_cache: Optional[Tuple[Tuple[Any, ...], str]] = None
 
     def __init__(
         self,
@@ -123,8 +176,16 @@ class SXMClientAsync:
         quality: QualitySize = QualitySize.LARGE_256k,
         user_agent: Optional[str] = None,
         update_handler: Optional[Callable[[dict], None]] = None,
+        fast_models: bool = False,
+        tracer: Optional[Tracer] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
     ):
         self._log = logging.getLogger(__file__)
+        self.tracer = tracer
+        if scheduler is None:
+            scheduler = UpstreamScheduler(rest_rate=None, cdn_rate=None)
+        self.scheduler = scheduler
+        self._draining = set()
 
         if user_agent is None:
             try:
@@ -140,10 +201,14 @@ class SXMClientAsync:
         self.password = password
         self.region = region
         self.stream_quality = quality
+        self.fast_models = fast_models
 
         self._playlists = {}
         self._channels = None
+        self._channel_index = {}
         self._favorite_channels = None
+        self._live_channels = {}
+        self._hls_tables = {}
         self._use_primary = True
 
         # vars to manage session cache
@@ -157,6 +222,7 @@ class SXMClientAsync:
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop_session_renewal()
         await self.close_session()
 
     @property
@@ -177,6 +243,7 @@ class SXMClientAsync:
         except (KeyError, IndexError):
             return None
 
+    @traced("sxm.segment", "path")
     async def get_segment(self, path: str) -> Optional[bytes]:
         """Fetch a single AAC segment bytes for a given relative path.
 
@@ -185,14 +252,15 @@ class SXMClientAsync:
         with token parameters included.
         """
 
-        # Build absolute URL from current HLS root and provided path
-        root = await self.get_hls_root()
-        base = root if root.endswith("/") else root + "/"
-        rel = path.lstrip("/")
-        url = parse.urljoin(base, rel)
+        base = self._segment_base
+        if base is None:
+            root = await self.get_hls_root()
+            base = self._segment_base = root if root.endswith("/") else root + "/"
+        url = f"{base}{path.lstrip('/')}?{self._token_query()}"
 
+        await self.scheduler.acquire(EndpointClass.CDN)
         try:
-            res = await self._session.get(url, params=self._token_params())
+            res = await self._session.get(url)
         except httpx.RequestError as e:
             self._log.error(f"Error fetching AAC segment at {url}: {e}")
             raise SegmentRetrievalException(str(e)) from e
@@ -214,7 +282,7 @@ class SXMClientAsync:
             return None
 
     @property
-    async def channels(self) -> List[XMChannel]:
+    async def channels(self) -> List[AnyChannel]:
         # download channel list if necessary
         if self._channels is None:
             channels = await self.get_channels()
@@ -224,14 +292,26 @@ class SXMClientAsync:
 
             self._channels = []
             for channel in channels:
-                self._channels.append(XMChannel.model_validate(channel))
+                if self.fast_models:
+                    self._channels.append(XMChannelStruct.from_dict(channel))
+                else:
+                    self._channels.append(XMChannel.model_validate(channel))
 
             self._channels = sorted(self._channels, key=lambda x: int(x.channel_number))
 
+            self._channel_index = {}
+            for xm_channel in self._channels:
+                for key in (
+                    xm_channel.name,
+                    xm_channel.id,
+                    str(xm_channel.channel_number),
+                ):
+                    self._channel_index.setdefault(key.lower(), xm_channel)
+
         return self._channels
 
     @property
-    async def favorite_channels(self) -> List[XMChannel]:
+    async def favorite_channels(self) -> List[AnyChannel]:
         if self._favorite_channels is None:
             self._favorite_channels = [c for c in await self.channels if c.is_favorite]
         return self._favorite_channels
@@ -292,6 +372,7 @@ class SXMClientAsync:
     def set_primary(self, value: bool):
         self._use_primary = value
         self._playlists = {}
+        self._segment_base = None
 
     async def login(self) -> bool:
         """Attempts to log into SXM with stored username/password"""
@@ -317,7 +398,8 @@ class SXMClientAsync:
             self._log.error("Error decoding json response for login")
             return False
 
-    @retry(wait=wait_fixed(3), stop=stop_after_attempt(10))
+    @traced("sxm.authenticate")
+    @retry(wait=wait_fixed(3), stop=stop_after_attempt(10), before_sleep=trace_retry)
     async def authenticate(self) -> bool:
         """Attempts to create a valid session for use with the client
 
@@ -346,7 +428,8 @@ class SXMClientAsync:
             self._log.error(traceback.format_exc())
             return False
 
-    @retry(wait=wait_fixed(3), stop=stop_after_attempt(10))
+    @traced("sxm.configuration")
+    @retry(wait=wait_fixed(3), stop=stop_after_attempt(10), before_sleep=trace_retry)
     async def get_configuration(self) -> Optional[Dict[str, Any]]:
         params = {
             "result-template": "html5",
@@ -356,11 +439,13 @@ class SXMClientAsync:
 
         return await self._get("get/configuration", params=params)
 
-    @retry(stop=stop_after_attempt(25), wait=wait_fixed(1))
+    @traced("sxm.playlist", "channel_id")
+    @retry(stop=stop_after_attempt(25), wait=wait_fixed(1), before_sleep=trace_retry)
     async def get_playlist(
         self,
         channel_id: str,
         use_cache: bool = True,
+        quality: Optional[QualitySize] = None,
     ) -> Union[str, None]:
         """Gets playlist of HLS stream URLs for given channel ID
 
@@ -368,14 +453,18 @@ class SXMClientAsync:
         ----------
         channel_id : :class:`str`
             ID of SXM channel to retrieve playlist for
+        quality : Optional[:class:`QualitySize`]
+            Stream quality to get the playlist for. Defaults to
+            `stream_quality`
         """
 
-        url = await self._get_playlist_url(channel_id, use_cache)
+        url = await self._get_playlist_url(channel_id, use_cache, quality=quality)
         if url is None:
             self._log.warn("No playlist URL available from live channel data")
             return None
 
         response = None
+        await self.scheduler.acquire(EndpointClass.CDN)
         try:
             response = await self._session.get(url, params=self._token_params())
             if response.is_error:
@@ -455,7 +544,7 @@ class SXMClientAsync:
             return []
         return channels
 
-    async def get_channel(self, name: str) -> Union[XMChannel, None]:
+    async def get_channel(self, name: str) -> Union[AnyChannel, None]:
         """Retrieves a specific channel from `self.channels`
 
         Parameters
@@ -464,19 +553,12 @@ class SXMClientAsync:
             name, id, or channel number of SXM channel to get
         """
 
-        name = name.lower()
-        for x in await self.channels:
-            if (
-                x.name.lower() == name
-                or x.id.lower() == name
-                or x.channel_number == name
-            ):
-                return x
-        return None
+        await self.channels
+        return self._channel_index.get(name.lower())
 
     async def get_now_playing(
         self,
-        channel: XMChannel,
+        channel: AnyChannel,
     ) -> Union[Dict[str, Any], None]:
         """Gets raw dictionary of response data for the live channel.
 
@@ -493,25 +575,366 @@ class SXMClientAsync:
             SXM channel to look up live channel data for
         """
 
-        now = time.time()
-        now_dt = datetime.datetime.fromtimestamp(now).replace(
-            tzinfo=datetime.timezone.utc
+        return await self._get(
+            "tune/now-playing-live", self._now_playing_params(channel)
         )
 
-        params = {
-            "assetGUID": channel.guid,
-            "ccRequestType": "AUDIO_VIDEO",
-            "channelId": channel.id,
-            "hls_output_mode": "custom",
-            "marker_mode": "all_separate_cue_points",
-            "result-template": "web",
-            "time": str(int(round(now * 1000.0))),
-            "timestamp": now_dt.isoformat("T") + "Z",
-        }
+    async def get_now_playing_many(
+        self,
+        channels: Iterable[AnyChannel],
+        concurrency: int = 8,
+    ) -> AsyncIterator[Tuple[AnyChannel, Union[Dict[str, Any], None]]]:
+        """Gets raw now playing responses for many channels at once,
+        yielding `(channel, data)` tuples as they complete.
 
-        return await self._get("tune/now-playing-live", params)
+        The session is checked and authenticated once up front and at most
+        `concurrency` requests are in flight at a time. `data` is the same
+        as :meth:`get_now_playing` and is `None` if the request failed.
+
+        Each request also waits on the client's :attr:`scheduler`, so with
+        a REST rate limit a batch takes at least `len(channels) / rate`
+        seconds.
+
+        Parameters
+        ----------
+        channels : Iterable[:class:`XMChannel`]
+            SXM channels to look up live channel data for
+        concurrency : :class:`int`
+            Max number of concurrent requests
+        """
+
+        channels = list(channels)
+        if not await self._ensure_authenticated():
+            for channel in channels:
+                yield channel, None
+            return
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _fetch(channel: AnyChannel):
+            async with semaphore:
+                try:
+                    data = await self._get(
+                        "tune/now-playing-live",
+                        self._now_playing_params(channel),
+                        authenticate=False,
+                    )
+                except httpx.RequestError:
+                    data = None
+                return channel, data
+
+        tasks = [asyncio.ensure_future(_fetch(channel)) for channel in channels]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def get_live_channel(
+        self,
+        channel: AnyChannel,
+        retention: Optional[datetime.timedelta] = MARKER_RETENTION,
+    ) -> Union[XMLiveChannel, None]:
+        """Gets the :class:`XMLiveChannel` for a channel, merging the
+        markers from a fresh now playing response into the ones already
+        known for the channel.
+
+        The same object is returned on every call for a channel, so only
+        markers that are new since the last call are added and markers
+        older than `retention` are evicted.
+
+        Parameters
+        ----------
+        channel : :class:`XMChannel`
+            SXM channel to look up live channel data for
+        retention : Optional[:class:`datetime.timedelta`]
+            How long to keep markers for. `None` keeps them forever
+        """
+
+        data = await self.get_now_playing(channel)
+        if data is None:
+            return None
+
+        try:
+            if data["messages"][0]["code"] != 100:
+                return None
+            live_channel_data = data["moduleList"]["modules"][0]["moduleResponse"][
+                "liveChannelData"
+            ]
+        except (KeyError, IndexError):
+            self._log.error("Error parsing json response for live channel")
+            return None
+
+        live_channel = self._live_channels.get(channel.id)
+        if live_channel is None:
+            live_channel = XMLiveChannel.model_validate(
+                {
+                    "channelId": channel.id,
+                    "hlsAudioInfos": live_channel_data.get("hlsAudioInfos", []),
+                    "customAudioInfos": live_channel_data.get("customAudioInfos", []),
+                }
+            )
+            live_channel.set_stream_quality(self.stream_quality)
+            self._live_channels[channel.id] = live_channel
+
+        live_channel.merge(live_channel_data, retention=retention)
+        return live_channel
+
+    async def get_stream_qualities(self, channel: AnyChannel) -> List[QualitySize]:
+        """Returns the stream qualities SXM has variants of for a channel,
+        from the sizes in its `hlsAudioInfos`. A fresh now playing
+        response is only requested if no playlist URL of the channel is
+        cached.
+
+        Parameters
+        ----------
+        channel : :class:`XMChannel`
+            SXM channel to look up stream qualities for
+        """
+
+        cached = self._hls_tables.get(channel.id)
+        if cached is not None:
+            sizes = {size for _, size, _ in cached[0][2]}
+        else:
+            data = await self.get_now_playing(channel)
+            if data is None:
+                return []
+
+            try:
+                if data["messages"][0]["code"] != 100:
+                    return []
+                live_channel_data = data["moduleList"]["modules"][0]["moduleResponse"][
+                    "liveChannelData"
+                ]
+            except (KeyError, IndexError):
+                self._log.error("Error parsing json response for live channel")
+                return []
+            sizes = {h.get("size") for h in live_channel_data.get("hlsAudioInfos", [])}
+
+        return [quality for quality in QualitySize if quality.value in sizes]
+
+    async def warm_up(
+        self,
+        channel_ids: Optional[Iterable[str]] = None,
+        quality: Optional[QualitySize] = None,
+        concurrency: int = 8,
+    ) -> int:
+        """Loads everything the first playlist request for a channel needs,
+        so it does not pay for it: the configuration and channel list
+        (downloaded concurrently), the channel lookup index and the HLS
+        variant URLs of the channels. Returns the number of channels with
+        a resolved URL.
+
+        Parameters
+        ----------
+        channel_ids : Optional[Iterable[:class:`str`]]
+            Names, IDs or numbers of the channels to resolve URLs for.
+            Defaults to :attr:`favorite_channels`
+        quality : Optional[:class:`QualitySize`]
+            Stream quality to resolve URLs for. Defaults to `stream_quality`
+        concurrency : :class:`int`
+            Max number of channels resolved at a time
+        """
+
+        await asyncio.gather(self.urls, self.channels)
+
+        if channel_ids is None:
+            channels = await self.favorite_channels
+        else:
+            channels = []
+            for channel_id in channel_ids:
+                channel = await self.get_channel(channel_id)
+                if channel is None:
+                    self._log.warning(f"No channel for {channel_id} to warm up")
+                else:
+                    channels.append(channel)
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def _resolve(channel: AnyChannel) -> bool:
+            async with semaphore:
+                try:
+                    url = await self._get_playlist_url(channel.id, quality=quality)
+                except Exception as e:  # noqa: BLE001
+                    self._log.warning(f"Could not warm up {channel.id}: {e}")
+                    return False
+                return url is not None
+
+        resolved = await asyncio.gather(*(_resolve(c) for c in channels))
+        return sum(resolved)
+
+    def release_channel(
+        self, channel_id: str, quality: Optional[QualitySize] = None
+    ) -> None:
+        """Drops the cached playlist URL of a channel once nobody listens to
+        it. When no quality of the channel is cached anymore, its HLS
+        variant table and live channel markers are dropped too.
+
+        Parameters
+        ----------
+        channel_id : :class:`str`
+            Name, ID or number of the channel
+        quality : Optional[:class:`QualitySize`]
+            Stream quality to drop. Defaults to `stream_quality`
+        """
+
+        channel = self._channel_index.get(channel_id.lower())
+        if channel is not None:
+            channel_id = channel.id
+        if quality is None:
+            quality = self.stream_quality
+
+        self._playlists.pop((channel_id, quality), None)
+        if not any(key[0] == channel_id for key in self._playlists):
+            self._hls_tables.pop(channel_id, None)
+            self._live_channels.pop(channel_id, None)
+
+    @property
+    def session_generation(self) -> int:
+        """Increases every time the client's session is replaced"""
+
+        return self._session_generation
+
+    async def reauthenticate(
+        self, generation: Optional[int] = None, reset: bool = False
+    ) -> bool:
+        """Authenticates the session again after a request failed with an
+        auth error.
+
+        Only one login/resume runs at a time; concurrent callers wait for
+        and share its result. A caller that saw the failure on an older
+        session (`generation` is not the current :attr:`session_generation`)
+        does not trigger a new login when the current session is already
+        authenticated.
+
+        Parameters
+        ----------
+        generation : Optional[:class:`int`]
+            :attr:`session_generation` at the time the failed request was
+            made
+        reset : :class:`bool`
+            Close and replace the session before authenticating
+        """
+
+        running = self._auth_task is not None and not self._auth_task.done()
+        if generation is not None and generation != self._session_generation:
+            self._log.debug("Ignoring auth failure from an older session")
+            reset = False
+            if not running and self.is_session_authenticated:
+                return True
+
+        if not running:
+            self._auth_task = asyncio.get_event_loop().create_task(
+                self._run_authentication(reset)
+            )
+        return await asyncio.shield(self._auth_task)  # type: ignore
+
+    async def _run_authentication(self, reset: bool) -> bool:
+        if reset:
+            await self.close_session()
+            self.reset_session()
+
+        try:
+            return await self.authenticate()
+        except Exception as e:  # noqa: BLE001
+            self._log.error(f"Unable to authenticate: {e}")
+            return False
+
+    async def renew_session(self) -> bool:
+        """Logs in and authenticates on a brand new session, then swaps it
+        in as the client's session.
+
+        The current session is left untouched until the new one is ready,
+        so requests keep working during renewal. Requests that are already
+        in flight finish on the old session, which is closed after
+        `SESSION_DRAIN_TIME` seconds.
+        """
+
+        renewed = SXMClientAsync(
+            self.username,
+            self.password,
+            region=self.region,
+            quality=self.stream_quality,
+            user_agent=self._ua["string"],
+            tracer=self.tracer,
+            scheduler=self.scheduler,
+        )
+        try:
+            authenticated = await renewed.authenticate()
+        except Exception as e:  # noqa: BLE001
+            self._log.error(f"Unable to renew session: {e}")
+            authenticated = False
+
+        if not authenticated:
+            await renewed.close_session()
+            return False
+
+        old_session = self._session
+        self._session = renewed._session
+        self._session_start = renewed._session_start
+        self._session_generation += 1
+        renewed._session = None  # type: ignore
+
+        task = asyncio.get_event_loop().create_task(self._drain_session(old_session))
+        self._draining.add(task)
+        task.add_done_callback(self._draining.discard)
+
+        self._log.info("Session renewed")
+        return True
+
+    def start_session_renewal(self, margin: float = SESSION_RENEW_MARGIN) -> None:
+        """Starts a background task that renews the session with
+        :meth:`renew_session` `margin` seconds before it reaches
+        `SESSION_MAX_LIFE`
+
+        Parameters
+        ----------
+        margin : :class:`float`
+            Seconds before the max session life to renew at
+        """
+
+        if self._renew_task is None or self._renew_task.done():
+            # the task copies the context, so renewal requests wait behind
+            # listener and prefetch requests
+            with upstream_priority(Priority.BACKGROUND):
+                self._renew_task = asyncio.get_event_loop().create_task(
+                    self._renew_loop(margin)
+                )
+
+    def stop_session_renewal(self) -> None:
+        """Stops background session renewal"""
+
+        if self._renew_task is not None:
+            self._renew_task.cancel()
+            self._renew_task = None
+
+    async def _renew_loop(self, margin: float) -> None:
+        renew_at = max(SESSION_MAX_LIFE - margin, 0)
+        while True:
+            age = time.monotonic() - self._session_start
+            if age < renew_at:
+                # session may be reset in the meantime, so check again
+                await asyncio.sleep(renew_at - age)
+                continue
+
+            if not await self.renew_session():
+                await asyncio.sleep(60)
+
+    async def _drain_session(self, session: httpx.AsyncClient) -> None:
+        try:
+            await asyncio.sleep(SESSION_DRAIN_TIME)
+        finally:
+            await session.aclose()
 
     async def close_session(self):
+        """Closes the session and any renewed sessions still draining"""
+
+        draining = list(self._draining)
+        for task in draining:
+            task.cancel()
+        await asyncio.gather(*draining, return_exceptions=True)
+
         if self._session is not None:
             await self._session.aclose()
             self._session = None
@@ -520,10 +943,12 @@ class SXMClientAsync:
         """Resets session used by client"""
 
         self._session_start = time.monotonic()
+        self._session_generation += 1
         self._session = httpx.AsyncClient()
         self._session.headers.update({"User-Agent": self._ua["string"]})
         self._urls = None
         self._configuration = None
+        self._segment_base = None
 
     def _token_params(self) -> Dict[str, Union[str, None]]:
         return {
@@ -532,6 +957,37 @@ class SXMClientAsync:
             "gupId": self.gup_id,
         }
 
+    def _token_query(self) -> str:
+        """Returns `_token_params` as an encoded query string, only
+        encoding it again when the token or data cookies change"""
+
+        cookies = self._session.cookies
+        key = (cookies.get("SXMAKTOKEN"), cookies.get("SXMDATA"))
+        cached = self._token_query_cache
+        if cached is None or cached[0] != key:
+            params = {k: v or "" for k, v in self._token_params().items()}
+            cached = self._token_query_cache = (key, parse.urlencode(params))
+        return cached[1]
+
+    def _now_playing_params(self, channel: AnyChannel) -> Dict[str, str]:
+        now = time.time()
+        now_dt = datetime.datetime.fromtimestamp(now).replace(
+            tzinfo=datetime.timezone.utc
+        )
+
+        params = {
+            "assetGUID": channel.guid,
+            "ccRequestType": "AUDIO_VIDEO",
+            "channelId": channel.id,
+            "hls_output_mode": "custom",
+            "marker_mode": "all_separate_cue_points",
+            "result-template": "web",
+            "time": str(int(round(now * 1000.0))),
+            "timestamp": now_dt.isoformat("T") + "Z",
+        }
+
+        return params
+
     def _get_device_info(self) -> dict:
         """Generates a dict of device info to pass to SXM"""
 
@@ -557,6 +1013,23 @@ class SXMClientAsync:
             },
         }
 
+    async def _ensure_authenticated(self) -> bool:
+        """Renews the session if it is too old and authenticates it if
+        needed"""
+
+        reset = False
+        now = time.monotonic()
+        if (now - self._session_start) > SESSION_MAX_LIFE:
+            self._log.info("Session exceed max time, reseting")
+            reset = True
+
+        if reset or not self.is_session_authenticated:
+            if not await self.reauthenticate(self._session_generation, reset=reset):
+                self._log.error("Unable to authenticate")
+                return False
+        return True
+
+    @traced("sxm.request", "method", "path")
     async def _make_request(
         self,
         method: str,
@@ -569,6 +1042,7 @@ class SXMClientAsync:
         else:
             url = url_format.format(path)
 
+        await self.scheduler.acquire(EndpointClass.REST)
         try:
             if method == "GET":
                 response = await self._session.get(url, params=params)
@@ -602,16 +1076,8 @@ class SXMClientAsync:
 
         method = method.upper()
 
-        if authenticate:
-            now = time.monotonic()
-            if (now - self._session_start) > SESSION_MAX_LIFE:
-                self._log.info("Session exceed max time, reseting")
-                await self.close_session()
-                self.reset_session()
-
-            if not self.is_session_authenticated and not await self.authenticate():
-                self._log.error("Unable to authenticate")
-                return None
+        if authenticate and not await self._ensure_authenticated():
+            return None
 
         response = await self._make_request(method, path, params, url_format=url_format)
 
@@ -623,7 +1089,7 @@ class SXMClientAsync:
             return None
 
         try:
-            return response.json()["ModuleListResponse"]
+            return json_loads(response.content)["ModuleListResponse"]
         except (KeyError, ValueError):
             self._log.error(f"Error decoding json for path '{path}'")
             return None
@@ -665,11 +1131,13 @@ class SXMClientAsync:
             "POST", path, postdata, authenticate, url_format=url_format
         )
 
+    @traced("sxm.playlist_url", "channel_id")
     async def _get_playlist_url(
         self,
         channel_id: str,
         use_cache: bool = True,
         max_attempts: int = 5,
+        quality: Optional[QualitySize] = None,
     ) -> Union[str, None]:
         """Returns HLS live stream URL for a given `XMChannel`"""
 
@@ -678,16 +1146,21 @@ class SXMClientAsync:
             self._log.info(f"No channel for {channel_id}")
             return None
 
+        if quality is None:
+            quality = self.stream_quality
+        key = (channel.id, quality)
+
         now = time.monotonic()
-        if use_cache and channel.id in self._playlists:
+        if use_cache and key in self._playlists:
             if (
                 self.last_renew is None
                 or (now - self.last_renew) > self.update_interval
             ):
-                del self._playlists[channel.id]
+                del self._playlists[key]
             else:
-                return self._playlists[channel.id]
+                return self._playlists[key]
 
+        generation = self._session_generation
         data = await self.get_now_playing(channel)
         if data is None:
             return None
@@ -706,10 +1179,10 @@ class SXMClientAsync:
         if message_code == 201 or message_code == 208:
             if max_attempts > 0:
                 self._log.info("Session expired, logging in and authenticating")
-                if await self.authenticate():
+                if await self.reauthenticate(generation):
                     self._log.info("Successfully authenticated")
                     return await self._get_playlist_url(
-                        channel.id, use_cache, max_attempts - 1
+                        channel.id, use_cache, max_attempts - 1, quality
                     )
                 else:
                     self._log.error("Failed to authenticate")
@@ -719,12 +1192,10 @@ class SXMClientAsync:
                 return None
         elif message_code == 204:
             self._log.warn("Multiple login error received, reseting session")
-            await self.close_session()
-            self.reset_session()
-            if await self.authenticate():
+            if await self.reauthenticate(generation, reset=True):
                 self._log.info("Successfully authenticated")
                 return await self._get_playlist_url(
-                    channel.id, use_cache, max_attempts - 1
+                    channel.id, use_cache, max_attempts - 1, quality
                 )
             else:
                 self._log.error("Failed to authenticate")
@@ -735,42 +1206,60 @@ class SXMClientAsync:
 
         module = data["moduleList"]["modules"][0]
         live_channel_data = module["moduleResponse"].get("liveChannelData", {})
-        # Build payload expected by XMLiveChannel WITHOUT raw markers to avoid validation errors
-        payload = {
-            "channelId": channel.id,
-            "hlsAudioInfos": live_channel_data.get("hlsAudioInfos", []),
-            "customAudioInfos": live_channel_data.get("customAudioInfos", []),
-        }
-        marker_lists = live_channel_data.get("markerLists", [])
-        self._log.debug(f"Live channel payload keys: {list(payload.keys())}")
+        hls_infos = live_channel_data.get("hlsAudioInfos", [])
         self._log.debug(
-            f"hlsAudioInfos count: {len(payload['hlsAudioInfos'])}, markerLists present: {len(marker_lists)}"
-        )
-        live_channel = XMLiveChannel.model_validate(payload)
-        live_channel.set_stream_quality(self.stream_quality)
-        live_channel.set_hls_roots(
-            await self.get_primary_hls_root(), await self.get_secondary_hls_root()
+            f"hlsAudioInfos count: {len(hls_infos)}, "
+            f"markerLists present: {len(live_channel_data.get('markerLists', []))}"
         )
+        table = await self._get_hls_variant_table(channel.id, hls_infos)
 
         self.update_interval = int(module["updateFrequency"])
 
         # get m3u8 url
-        url = live_channel.primary_hls.resolved_url
-        if not self._use_primary:
-            url = live_channel.secondary_hls.resolved_url
+        url = table.get(
+            ("primary" if self._use_primary else "secondary", quality.value)
+        )
+        if url is None:
+            self._log.warn(f"No HLS variant available for {channel.id}")
+            return None
 
         self._log.debug(f"Primary playlist URL: {url}")
         playlist = await self._get_playlist_variant_url(url)
         if playlist is not None:
-            self._playlists[channel.id] = playlist
+            self._playlists[key] = playlist
             self.last_renew = time.monotonic()
 
             if self.update_handler is not None:
                 self.update_handler(module)
-            return self._playlists[channel.id]
+            return self._playlists[key]
         return None
 
+    async def _get_hls_variant_table(
+        self, channel_id: str, hls_infos: List[Dict[str, Any]]
+    ) -> Dict[Tuple[str, str], str]:
+        """Returns the resolved variant URL table for a channel, only
+        rebuilding it when the HLS roots or `hlsAudioInfos` change"""
+
+        primary = await self.get_primary_hls_root()
+        secondary = await self.get_secondary_hls_root()
+        signature = (
+            primary,
+            secondary,
+            tuple((h.get("name"), h.get("size"), h.get("url")) for h in hls_infos),
+        )
+
+        cached = self._hls_tables.get(channel_id)
+        if cached is None or cached[0] != signature:
+            cached = (
+                signature,
+                build_hls_variant_table(hls_infos, primary, secondary),
+            )
+            self._hls_tables[channel_id] = cached
+        return cached[1]
+
+    @traced("sxm.playlist_variant_url", "url")
     async def _get_playlist_variant_url(self, url: str) -> Union[str, None]:
+        await self.scheduler.acquire(EndpointClass.CDN)
         res = await self._session.get(url, params=self._token_params())
 
         if res.is_error:
@@ -815,6 +1304,15 @@ class SXMClient:
     update_handler : Optional[Callable[[:class:`dict`], `None`]]
         Callback to be called whenever a playlist updates and new
         Live Channel data is retrieved. Defaults to `None`.
+    fast_models : :class:`bool`
+        Use the unvalidated :mod:`sxm.structs` variants instead of the
+        pydantic models for the channel list. Defaults to `False`.
+    tracer : Optional[:class:`Tracer`]
+        Traces upstream requests, playlist URL resolution, segment fetches
+        and retries. Defaults to `None`.
+    scheduler : Optional[:class:`UpstreamScheduler`]
+        Rate limits and prioritizes upstream requests. Defaults to no
+        limits; `sxm server` passes one with the default limits.
 
     Attributes
     ----------
@@ -829,7 +1327,8 @@ class SXMClient:
         Needs documentation
     channels : List[:class:`XMChannel`]
         Retrieves and returns a full list of all :class:`XMChannel`
-        available to the logged in account
+        available to the logged in account, as :class:`XMChannelStruct`
+        with `fast_models`
     favorite_channels : List[:class:`XMChannel`]
         Retrieves and returns a full list of all :class:`XMChannel`
         available to the logged in account that are marked
@@ -844,6 +1343,9 @@ class SXMClient:
         quality: QualitySize = QualitySize.LARGE_256k,
         user_agent: Optional[str] = None,
         update_handler: Optional[Callable[[dict], None]] = None,
+        fast_models: bool = False,
+        tracer: Optional[Tracer] = None,
+        scheduler: Optional[UpstreamScheduler] = None,
     ):
         self.async_client = SXMClientAsync(
             username=username,
@@ -852,6 +1354,9 @@ class SXMClient:
             quality=quality,
             user_agent=user_agent,
             update_handler=update_handler,
+            fast_models=fast_models,
+            tracer=tracer,
+            scheduler=scheduler,
         )
 
     def __enter__(self) -> "SXMClient":
@@ -0,0 +1,143 @@
+"""Now playing push events module for sxm"""
+
+import time
+from asyncio import Queue, sleep
+from typing import Any, Dict, List, Optional, Tuple
+
+from sxm.client import SXMClientAsync
+from sxm.models import extract_now_playing
+from sxm.scheduler import Priority, upstream_priority
+from sxm.stream import Broadcaster
+from sxm.structs import AnyChannel
+
+__all__ = ["NowPlayingPoller", "format_sse"]
+
+
+DEFAULT_POLL_INTERVAL = 30
+
+
+def format_sse(event: str, data: bytes) -> bytes:
+    """Formats a single server-sent event from single line `data`"""
+
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + data + b"\n\n"
+
+
+def _latest_marker(
+    live_channel_data: Dict[str, Any], layer: str, now_ms: int
+) -> Optional[Dict[str, Any]]:
+    latest: Optional[Dict[str, Any]] = None
+    for marker_list in live_channel_data.get("markerLists", []):
+        if marker_list.get("layer") != layer:
+            continue
+        for marker in marker_list.get("markers", []):
+            if layer not in marker or marker.get("time", 0) > now_ms:
+                continue
+            if latest is None or marker["time"] >= latest["time"]:
+                latest = marker
+    return latest
+
+
+def _episode_event(channel_id: str, marker: Dict[str, Any]) -> Dict[str, Any]:
+    episode = marker.get("episode", {})
+    show = episode.get("show") or {}
+    return {
+        "channel_id": channel_id,
+        "title": episode.get("longTitle") or episode.get("mediumTitle"),
+        "show": show.get("longTitle") or show.get("mediumTitle"),
+        "started_at_ms": marker.get("time"),
+    }
+
+
+class NowPlayingPoller(Broadcaster):
+    """Polls `tune/now-playing-live` for a single channel while anyone is
+    subscribed and pushes `("cut", dict)`/`("episode", dict)` events to the
+    subscribers whenever the current cut or episode changes.
+
+    One poller serves any number of subscribers, so upstream load does not
+    grow with the number of clients watching a channel.
+
+    Parameters
+    ----------
+    sxm : :class:`SXMClientAsync`
+        SXM client to use
+    channel : :class:`XMChannel`
+        SXM channel to poll
+    queue_size : :class:`int`
+        Number of events buffered per subscriber before dropping
+    """
+
+    channel: AnyChannel
+
+    _current: Dict[str, Tuple[str, Dict[str, Any]]]
+    _last: Dict[str, Tuple[str, int]]
+
+    def __init__(self, sxm: SXMClientAsync, channel: AnyChannel, queue_size: int = 16):
+        super().__init__(queue_size=queue_size, burst=0)
+        self._sxm = sxm
+        self._current = {}
+        self._last = {}
+
+        self.channel = channel
+
+    def subscribe(self) -> Queue:
+        """Adds a subscriber that immediately gets the current cut and
+        episode, if known"""
+
+        queue = super().subscribe()
+        for change in self._current.values():
+            queue.put_nowait(change)
+        return queue
+
+    def _change(
+        self, layer: str, key: Tuple[Any, ...], event: Dict[str, Any]
+    ) -> Optional[Tuple[str, Dict[str, Any]]]:
+        if self._last.get(layer) == key:
+            return None
+
+        self._last[layer] = key
+        self._current[layer] = (layer, event)
+        return self._current[layer]
+
+    def _changes(self, data: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+        live_channel_data = data["moduleList"]["modules"][0]["moduleResponse"][
+            "liveChannelData"
+        ]
+        now_ms = int(time.time() * 1000)
+
+        changes = []
+        record = extract_now_playing({self.channel.id: data}, now_ms)[self.channel.id]
+        if record is not None:
+            cut_key = (record.played_at_ms, record.title)
+            changes.append(self._change("cut", cut_key, record._asdict()))
+
+        marker = _latest_marker(live_channel_data, "episode", now_ms)
+        if marker is not None:
+            episode_key = (marker.get("assetGUID"), marker.get("time"))
+            changes.append(
+                self._change(
+                    "episode", episode_key, _episode_event(self.channel.id, marker)
+                )
+            )
+        return [change for change in changes if change is not None]
+
+    async def _run(self) -> None:
+        while self._listeners:
+            interval = DEFAULT_POLL_INTERVAL
+            try:
+                with upstream_priority(Priority.BACKGROUND):
+                    data = await self._sxm.get_now_playing(self.channel)
+            except Exception as e:  # noqa: BLE001
+                self._log.error(f"Error polling now playing: {e}")
+                data = None
+
+            try:
+                if data is not None and data["messages"][0]["code"] == 100:
+                    module = data["moduleList"]["modules"][0]
+                    # never poll in a tight loop on a bogus upstream value
+                    interval = max(int(module.get("updateFrequency", interval)), 1)
+                    for change in self._changes(data):
+                        self._publish(change)
+            except (KeyError, IndexError, ValueError):
+                self._log.error("Error parsing now playing response for events")
+
+            await sleep(interval)
@@ -1,243 +1,995 @@
 """HTTP Server module for sxm"""
 
-import json
+import hashlib
 import logging
-import time
-from asyncio import get_event_loop, sleep
+import mimetypes
+from asyncio import Event, Task, gather, get_event_loop, shield, sleep, wait_for
+from dataclasses import dataclass
 from time import monotonic
-from typing import Any, Callable, Coroutine, Dict, List, Optional
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
 from aiohttp import web
 
-from sxm.client import HLS_AES_KEY, SegmentRetrievalException, SXMClient, SXMClientAsync
+from sxm._json import dumps as json_dumps
+from sxm.art import ART_MAX_AGE, ART_SIZES, ArtProxy, art_url
+from sxm.cache import SegmentCache
+from sxm.client import (
+    HLS_AES_KEY,
+    AuthenticationError,
+    ConfigurationError,
+    SegmentRetrievalException,
+    SXMClient,
+    SXMClientAsync,
+)
+from sxm.events import DEFAULT_POLL_INTERVAL, NowPlayingPoller, format_sse
+from sxm.listeners import ListenerTracker
+from sxm.models import QualitySize, extract_now_playing
+from sxm.prefetch import SegmentPrefetcher
+from sxm.stream import DEFAULT_TARGET_DURATION, HAS_CRYPTOGRAPHY, ChannelStream
+from sxm.structs import AnyChannel
 
-__all__ = ["make_http_handler", "run_http_server"]
+__all__ = [
+    "ProxyMetrics",
+    "SXMProxy",
+    "make_http_app",
+    "make_http_handler",
+    "run_http_server",
+    "serve",
+]
 
+PlaylistKey = Tuple[str, QualitySize]
 
-def make_http_handler(
-    sxm: SXMClientAsync, precache: bool = True
-) -> Callable[[web.Request], Coroutine[Any, Any, web.Response]]:
-    """
-    Creates and returns a configured `aiohttp` request handler ready to be used
-    by a :meth:`aiohttp.web.run_app` instance with your :class:`SXMClient`.
+QUALITY_BANDWIDTH = {
+    QualitySize.SMALL_64k: 64000,
+    QualitySize.MEDIUM_128k: 128000,
+    QualitySize.LARGE_256k: 256000,
+}
 
-    Really useful if you want to create your own HTTP server as part
-    of another application.
+SEGMENT_MAX_AGE = 300
+STATIC_MAX_AGE = 3600
+JSON_COMPRESS_MIN_SIZE = 1024
+
+
+class EncodedBody(NamedTuple):
+    body: bytes
+    etag: str
+    max_age: int
+
+
+def encode_body(body: bytes, max_age: int = 0) -> EncodedBody:
+    """Pairs a response body with a strong ETag for it"""
+
+    digest = hashlib.blake2b(body, digest_size=12).hexdigest()
+    return EncodedBody(body, f'"{digest}"', max_age)
+
+
+class BodyCache:
+    """Encoded response bodies by key. A body is only encoded again when
+    the source object it was built from changes."""
+
+    _entries: Dict[Hashable, Tuple[Any, EncodedBody]]
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(
+        self, key: Hashable, source: Any, encode: Callable[[Any], EncodedBody]
+    ) -> EncodedBody:
+        entry = self._entries.get(key)
+        if entry is None or (entry[0] is not source and entry[0] != source):
+            entry = (source, encode(source))
+            self._entries[key] = entry
+        return entry[1]
+
+    def discard(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+
+KEY_BODY = encode_body(HLS_AES_KEY, STATIC_MAX_AGE)
+
+
+def playlist_max_age(playlist: str) -> int:
+    """Returns half of the playlist's target duration, which is how long a
+    live media playlist can be cached for"""
+
+    target_duration = DEFAULT_TARGET_DURATION
+    start = playlist.find("#EXT-X-TARGETDURATION:")
+    if start != -1:
+        end = playlist.find("\n", start)
+        try:
+            target_duration = float(playlist[start + 22 : end if end != -1 else None])
+        except ValueError:
+            pass
+    return max(int(target_duration // 2), 1)
+
+
+def update_frequency(data: Dict[str, Any]) -> int:
+    """Returns the `updateFrequency` of a now playing response"""
+
+    try:
+        return int(data["moduleList"]["modules"][0]["updateFrequency"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return DEFAULT_POLL_INTERVAL
+
+
+def etag_matches(request: web.Request, etag: str) -> bool:
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def cached_response(
+    request: web.Request, encoded: EncodedBody, content_type: str
+) -> web.Response:
+    """Returns a `304` if the request already has `encoded`, otherwise a
+    `200` with the encoded body. Both carry the ETag and `max-age`."""
+
+    headers = {"ETag": encoded.etag, "Cache-Control": f"max-age={encoded.max_age}"}
+    if etag_matches(request, encoded.etag):
+        return web.Response(status=304, headers=headers)
+
+    headers["Content-Type"] = content_type
+    return web.Response(status=200, body=encoded.body, headers=headers)
+
+
+@dataclass
+class RouteStats:
+    """Request count, server errors and handler time for a single route"""
+
+    requests: int = 0
+    errors: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+
+    def record(self, status: int, duration: float) -> None:
+        self.requests += 1
+        if status >= 500:
+            self.errors += 1
+        self.total_time += duration
+        self.max_time = max(self.max_time, duration)
+
+
+class ProxyMetrics:
+    """Per route request metrics, collected by :func:`metrics_middleware`
+    and served at `/metrics`"""
+
+    routes: Dict[str, RouteStats]
+
+    def __init__(self):
+        self.routes = {}
+
+    def record(self, route: str, status: int, duration: float) -> None:
+        stats = self.routes.get(route)
+        if stats is None:
+            stats = self.routes[route] = RouteStats()
+        stats.record(status, duration)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            route: {
+                "requests": stats.requests,
+                "errors": stats.errors,
+                "avg_ms": stats.total_time * 1000 / stats.requests,
+                "max_ms": stats.max_time * 1000,
+            }
+            for route, stats in self.routes.items()
+        }
+
+
+class SXMProxy:
+    """Request handlers and background state of the SXM proxy.
+
+    :meth:`routes` are the typed routes used by :func:`make_http_app` and
+    :meth:`handle` dispatches on the request path for a catch-all route.
+    Prefetchers, now playing pollers and channel streams are started by
+    requests and run until :meth:`stop`.
+
+    HLS listeners are tracked by client address and `(channel, quality)`
+    from their playlist and segment requests. When the last listener of a
+    channel times out, its prefetcher is stopped and its cached playlist
+    body and playlist URL are dropped.
 
     Parameters
     ----------
-    sxm : :class:`SXMClient`
+    sxm : :class:`SXMClientAsync`
         SXM client to use
+    precache : :class:`bool`
+        Reload requested HLS playlists in the background and prefetch
+        the segments listeners are about to request
+    stream_queue_size : :class:`int`
+        Number of segments buffered per `/stream/{channel}.aac` listener
+        before the listener starts dropping data
+    event_keepalive : :class:`float`
+        Seconds between keepalive comments on idle `/now_playing/events`
+        connections
+    batch_concurrency : :class:`int`
+        Max concurrent upstream requests for batch
+        `/now_playing?channel=a,b,c` requests
+    prefetch_segments : :class:`int`
+        Number of segments kept warm ahead of the furthest HLS listener
+    prefetch_concurrency : :class:`int`
+        Max concurrent segment prefetches per channel and quality
+    segment_cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache to serve repeat segment requests from
+    listener_timeout : :class:`float`
+        Seconds without a playlist or segment request before an HLS
+        listener is gone
+    art_cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache for `/art/...` images
     """
 
-    aac_cache: Dict[str, bytes] = {}
-    playlist_cache: Dict[str, str] = {}
-    active_channel_id: Optional[str] = None
+    precache: bool
+    stream_queue_size: int
+    event_keepalive: float
+    batch_concurrency: int
+    prefetch_segments: int
+    prefetch_concurrency: int
+    segment_cache: Optional[SegmentCache]
+    listeners: ListenerTracker[PlaylistKey]
+    art: ArtProxy
+
+    _streams: Dict[PlaylistKey, ChannelStream]
+    _prefetchers: Dict[PlaylistKey, SegmentPrefetcher]
+    _pollers: Dict[str, NowPlayingPoller]
+    _bodies: BodyCache
+    _sweeper: Optional[Task]
+    _raw_channels: Optional[Tuple[float, List[dict]]]
+    _channels_fetch: Optional[Task]
+
+    def __init__(
+        self,
+        sxm: SXMClientAsync,
+        precache: bool = True,
+        stream_queue_size: int = 4,
+        event_keepalive: float = 15,
+        batch_concurrency: int = 8,
+        prefetch_segments: int = 3,
+        prefetch_concurrency: int = 2,
+        segment_cache: Optional[SegmentCache] = None,
+        listener_timeout: float = 60,
+        art_cache: Optional[SegmentCache] = None,
+    ):
+        self._log = logging.getLogger(__file__)
+        self._sxm = sxm
+
+        self.precache = precache
+        self.stream_queue_size = stream_queue_size
+        self.event_keepalive = event_keepalive
+        self.batch_concurrency = batch_concurrency
+        self.prefetch_segments = prefetch_segments
+        self.prefetch_concurrency = prefetch_concurrency
+        self.segment_cache = segment_cache
+        self.listeners = ListenerTracker(listener_timeout)
+        self.art = ArtProxy(cache=art_cache)
+
+        self._streams = {}
+        self._prefetchers = {}
+        self._pollers = {}
+        self._bodies = BodyCache()
+        self._sweeper = None
+        self._raw_channels = None
+        self._channels_fetch = None
+
+    def routes(self) -> List[web.RouteDef]:
+        """Returns the proxy's routes, segments first"""
+
+        return [
+            web.get(r"/{path:.+\.aac}", self._route_segment, name="segment"),
+            web.get("/{channel_id}.m3u8", self._route_playlist, name="playlist"),
+            web.get("/key/1", self.key, name="key"),
+            web.get("/master/{channel_id}.m3u8", self._route_master, name="master"),
+            web.get("/stream/{channel}.aac", self._route_stream, name="stream"),
+            web.get("/now_playing", self.now_playing, name="now_playing"),
+            web.get(
+                "/now_playing/events",
+                self.now_playing_events,
+                name="now_playing_events",
+            ),
+            web.get("/channels/", self.channels, name="channels"),
+            web.get(
+                "/art/{scheme:https?}/{host}/{path:.+}", self._route_art, name="art"
+            ),
+        ]
+
+    def stop(self) -> None:
+        """Stops all prefetchers, now playing pollers and channel streams.
+        Open stream and event responses end."""
 
-    def set_active(channel_id: Optional[str], initial_playlist: Optional[str] = None):
-        active_channel_id = channel_id  # pylint: disable=unused-variable  # noqa
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        if self._channels_fetch is not None:
+            self._channels_fetch.cancel()
+            self._channels_fetch = None
 
-        if precache and channel_id is not None and initial_playlist is not None:
-            loop = get_event_loop()
-            loop.create_task(cache_playlist(channel_id, initial_playlist.split("\n")))
+        for prefetcher in self._prefetchers.values():
+            prefetcher.stop()
+        for broadcaster in [*self._streams.values(), *self._pollers.values()]:
+            broadcaster.stop()
+
+        self._prefetchers.clear()
+        self._streams.clear()
+        self._pollers.clear()
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        """Catch-all handler that dispatches on the request path"""
+
+        path = request.path
+        if path.startswith("/art/"):
+            scheme, _, rest = path[5:].partition("/")
+            host, _, art_path = rest.partition("/")
+            if scheme in ("http", "https") and host and art_path:
+                return await self.art_image(request, scheme, host, art_path)
+        elif path.startswith("/stream/") and path.endswith(".aac"):
+            return await self.stream(request, path[8:-4])
+        elif path.endswith(".aac"):
+            return await self.segment(request, path[1:])
+        elif path.startswith("/master/") and path.endswith(".m3u8"):
+            return await self.master_playlist(request, path[8:-5])
+        elif path.endswith(".m3u8"):
+            return await self.playlist(request, path.rsplit("/", 1)[1][:-5])
+        elif path.endswith("/key/1"):
+            return await self.key(request)
+        elif path == "/now_playing/events":
+            return await self.now_playing_events(request)
+        elif path == "/now_playing":
+            return await self.now_playing(request)
+        elif path.endswith("/channels/"):
+            return await self.channels(request)
+        return web.Response(status=404)
+
+    async def segment(self, request: web.Request, path: str) -> web.StreamResponse:
+        key, prefetcher = self._find_prefetcher(path)
+        if key is not None:
+            self._track(request, key)
+
+        # segment paths are unique, so the path alone identifies the data
+        etag = encode_body(path.encode("utf-8")).etag
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"max-age={SEGMENT_MAX_AGE}, immutable",
+        }
+        if etag_matches(request, etag):
+            return web.Response(status=304, headers=headers)
+
+        headers["Content-Type"] = "audio/x-aac"
+        data = None
+        if self.segment_cache is not None:
+            data = self.segment_cache.get(path)
+            if data is None:
+                file_path = self.segment_cache.get_file(path)
+                if file_path is not None:
+                    return web.FileResponse(file_path, headers=headers)
+
+        if data is None:
+            if prefetcher is not None:
+                data = await prefetcher.get_segment(path)
+            else:
+                data = await self._get_segment(path)
+            if data and self.segment_cache is not None:
+                self.segment_cache.put(path, data)
+
+        if data:
+            return web.Response(status=200, body=data, headers=headers)
+        return web.Response(status=503)
+
+    async def art_image(
+        self, request: web.Request, scheme: str, host: str, path: str
+    ) -> web.StreamResponse:
+        """Serves an SXM image, scaled down to the `size` query parameter,
+        from the art cache or upstream"""
+
+        size = request.query.get("size")
+        if size is not None and size not in ART_SIZES:
+            return web.Response(status=400, text=f"Invalid size: {size}")
+        url = art_url(scheme, host, path)
+        if url is None:
+            return web.Response(status=404)
+
+        key = self.art.cache_key(url, size)
+        # art URLs are versioned by SXM, so the key identifies the data
+        etag = encode_body(key.encode("utf-8")).etag
+        headers = {"ETag": etag, "Cache-Control": f"max-age={ART_MAX_AGE}"}
+        if etag_matches(request, etag):
+            return web.Response(status=304, headers=headers)
+
+        content_type, _ = mimetypes.guess_type(path)
+        headers["Content-Type"] = content_type or "application/octet-stream"
+        cache = self.art.cache
+        if cache is not None and cache.get(key) is None:
+            file_path = cache.get_file(key)
+            if file_path is not None:
+                return web.FileResponse(file_path, headers=headers)
+
+        data = await self.art.get(url, size)
+        if data is None:
+            return web.Response(status=502)
+        return web.Response(status=200, body=data, headers=headers)
+
+    async def playlist(self, request: web.Request, channel_id: str) -> web.Response:
+        quality = self._get_quality(request)
+        if quality is None:
+            return web.Response(status=400)
+        self._track(request, (channel_id, quality))
 
-    async def get_segment(path: str):
         try:
-            data = await sxm.get_segment(path)
-        except SegmentRetrievalException:
-            await sxm.close_session()
-            sxm.reset_session()
-            await sxm.authenticate()
-            data = await sxm.get_segment(path)
+            playlist = await self._get_playlist(channel_id, quality)
+        except Exception as e:  # noqa: BLE001
+            logging.exception("Error generating playlist for %s: %s", channel_id, e)
+            playlist = None
 
-        return data
+        if not playlist:
+            self._stop_prefetch(channel_id, quality)
+            self._bodies.discard(("playlist", channel_id, quality))
+            return web.Response(status=503)
 
-    async def cache_playlist_chunks(end: float, playlist: List[str]):
-        for item in playlist:
-            if monotonic() >= end:
-                return
+        encoded = self._bodies.get(
+            ("playlist", channel_id, quality),
+            playlist,
+            lambda p: encode_body(p.encode("utf-8"), playlist_max_age(p)),
+        )
+        return cached_response(request, encoded, "application/x-mpegURL")
 
-            while len(aac_cache) > 10:
-                await sleep(1)
+    async def master_playlist(
+        self, request: web.Request, channel_id: str
+    ) -> web.Response:
+        channel = await self._get_channel(channel_id)
+        if channel is None:
+            return web.Response(status=404)
 
-            if not item.startswith("AAC_Data"):
-                continue
+        try:
+            qualities = await self._sxm.get_stream_qualities(channel)
+        except Exception as e:  # noqa: BLE001
+            logging.exception(
+                "Error fetching stream qualities for %s: %s", channel_id, e
+            )
+            qualities = []
 
-            data = await get_segment(item)
-            if data is not None:
-                aac_cache[item] = data
-            await sleep(1)
+        if not qualities:
+            return web.Response(status=503)
 
-    async def cache_playlist(channel_id: str, playlist: List[str]):
-        start = monotonic() - 3
+        # keyed on the resolved ID, so made up IDs never add an entry
+        encoded = self._bodies.get(
+            ("master", channel.id),
+            (channel.id, tuple(qualities)),
+            lambda s: encode_body(
+                self._master_playlist(*s).encode("utf-8"), STATIC_MAX_AGE
+            ),
+        )
+        return cached_response(request, encoded, "application/x-mpegURL")
 
-        while active_channel_id == channel_id:
-            await cache_playlist_chunks(start + 5, playlist)
+    async def key(self, request: web.Request) -> web.Response:
+        return cached_response(request, KEY_BODY, "text/plain")
 
-            new_playlist: Optional[str] = None
-            while new_playlist is None:
-                new_playlist = await sxm.get_playlist(channel_id)
+    async def stream(self, request: web.Request, channel_q: str):
+        # SXM segments are encrypted, so nothing could be streamed
+        if not HAS_CRYPTOGRAPHY:
+            return web.Response(
+                status=501,
+                text="Streaming needs the `stream` extra: pip install 'sxm[stream]'",
+            )
 
-            playlist_cache[channel_id] = new_playlist
-            playlist = new_playlist.split("\n")
-            start = monotonic()
+        quality = self._get_quality(request)
+        if quality is None:
+            return web.Response(status=400)
 
-    async def get_playlist_chunk(segment_path: str):
-        if segment_path in aac_cache:
-            data = aac_cache[segment_path]
-            del aac_cache[segment_path]
-        else:
-            data = await get_segment(segment_path)
+        channel = await self._get_channel(channel_q)
+        if channel is None:
+            return web.Response(status=404)
 
-        return data
+        stream = self._streams.get((channel.id, quality))
+        if stream is None:
+            stream = ChannelStream(
+                self._sxm,
+                channel.id,
+                get_segment=self._get_segment,
+                queue_size=self.stream_queue_size,
+                quality=quality,
+            )
+            self._streams[(channel.id, quality)] = stream
 
-    async def get_playlist(channel_id: str):
-        if channel_id in playlist_cache:
-            playlist: Optional[str] = playlist_cache[channel_id]
-            del playlist_cache[channel_id]
-        else:
-            playlist = await sxm.get_playlist(channel_id)
+        response = web.StreamResponse(
+            status=200,
+            headers={
+                "Content-Type": "audio/aac",
+                "Cache-Control": "no-cache",
+                "icy-name": channel.name,
+            },
+        )
+        response.enable_chunked_encoding()
 
-        if active_channel_id != channel_id and playlist is not None:
-            set_active(channel_id, playlist)
+        queue = stream.subscribe()
+        try:
+            await response.prepare(request)
+            while True:
+                data = await queue.get()
+                if data is None:
+                    break
+                await response.write(data)
+        except ConnectionResetError:
+            pass
+        finally:
+            stream.unsubscribe(queue)
+            if stream.listener_count == 0:
+                self._streams.pop((channel.id, quality), None)
 
-        return playlist
+        return response
 
-    async def sxm_handler(request: web.Request):
-        """SXM Response handler"""
+    async def now_playing(self, request: web.Request) -> web.Response:
+        # Query param: channel=<id|name|number>
+        channel_q = request.query.get("channel")
+        if not channel_q:
+            return web.Response(status=400)
+        if "," in channel_q:
+            return await self._now_playing_many(request, channel_q.split(","))
 
-        response = web.Response(status=404)
-        if request.path == "/now_playing":
-            # Query param: channel=<id|name|number>
-            channel_q = request.query.get("channel")
-            if not channel_q:
-                return web.Response(status=400)
+        channel = await self._get_channel(channel_q)
+        if channel is None:
+            return web.Response(status=404)
 
-            try:
-                channel = await sxm.get_channel(channel_q)
-            except Exception as e:  # noqa: BLE001
-                logging.exception("Error resolving channel %s: %s", channel_q, e)
-                channel = None
+        try:
+            data = await self._sxm.get_now_playing(channel)
+        except Exception as e:  # noqa: BLE001
+            logging.exception("Error fetching now playing for %s: %s", channel_q, e)
+            data = None
 
-            if channel is None:
-                return web.Response(status=404)
+        if data is None:
+            return web.Response(status=503)
 
-            try:
-                data = await sxm.get_now_playing(channel)
-            except Exception as e:  # noqa: BLE001
-                logging.exception("Error fetching now playing for %s: %s", channel_q, e)
-                data = None
+        record = extract_now_playing({channel.id: data})[channel.id]
+        if record is None:
+            return web.Response(status=503)
 
-            if data is None:
-                return web.Response(status=503)
-
-            # Validate response status and extract live channel data
-            try:
-                message_code = data["messages"][0]["code"]
-                if message_code != 100:
-                    return web.Response(status=503)
-                live_channel_data = data["moduleList"]["modules"][0]["moduleResponse"][
-                    "liveChannelData"
-                ]
-            except (KeyError, IndexError):
-                return web.Response(status=500)
-
-            marker_lists = live_channel_data.get("markerLists", [])
-            cut_markers: List[Dict[str, Any]] = []  # type: ignore[name-defined]
-            for marker_list in marker_lists:
-                if marker_list.get("layer") == "cut":
-                    for m in marker_list.get("markers", []):
-                        if "cut" in m:
-                            cut_markers.append(m)
-
-            if not cut_markers:
-                return web.Response(status=503)
-
-            now_ms = int(time.time() * 1000)
-            cut_markers.sort(key=lambda x: x.get("time", 0))
-            latest = None
-            for m in cut_markers:
-                if m.get("time", 0) <= now_ms:
-                    latest = m
-                else:
+        max_age = update_frequency(data)
+        encoded = self._bodies.get(
+            ("now_playing", channel.id),
+            record,
+            lambda r: encode_body(json_dumps(r._asdict()), max_age),
+        )
+        return cached_response(request, encoded, "application/json; charset=utf-8")
+
+    async def now_playing_events(self, request: web.Request):
+        channel_q = request.query.get("channel")
+        if not channel_q:
+            return web.Response(status=400)
+
+        channel = await self._get_channel(channel_q)
+        if channel is None:
+            return web.Response(status=404)
+
+        poller = self._pollers.get(channel.id)
+        if poller is None:
+            poller = NowPlayingPoller(self._sxm, channel)
+            self._pollers[channel.id] = poller
+
+        response = web.StreamResponse(
+            status=200,
+            headers={
+                "Content-Type": "text/event-stream",
+                "Cache-Control": "no-cache",
+            },
+        )
+
+        queue = poller.subscribe()
+        try:
+            await response.prepare(request)
+            while True:
+                try:
+                    change = await wait_for(queue.get(), self.event_keepalive)
+                except TimeoutError:
+                    await response.write(b": keepalive\n\n")
+                    continue
+
+                if change is None:
                     break
-            if latest is None:
-                latest = cut_markers[-1]
-
-            cut = latest.get("cut", {})
-            title = cut.get("title") or "Unknown"
-            artists = cut.get("artists") or []
-            artist = artists[0]["name"] if artists else "Unknown"
-            album = None
-            if "album" in cut and cut["album"]:
-                album = cut["album"].get("title")
-
-            payload = {
-                "channel_id": channel.id,
-                "title": title,
-                "artist": artist,
-                "album": album,
-                "played_at_ms": latest.get("time"),
-            }
+                event, payload = change
+                await response.write(format_sse(event, json_dumps(payload)))
+        except ConnectionResetError:
+            pass
+        finally:
+            poller.unsubscribe(queue)
+            if poller.listener_count == 0:
+                self._pollers.pop(channel.id, None)
 
-            return web.Response(
-                status=200,
-                body=json.dumps(payload).encode("utf-8"),
-                headers={"Content-Type": "application/json; charset=utf-8"},
+        return response
+
+    async def channels(self, request: web.Request) -> web.Response:
+        raw_channels = await self._get_raw_channels()
+        if len(raw_channels) == 0:
+            return web.Response(status=403)
+
+        encoded = self._bodies.get(
+            "channels",
+            raw_channels,
+            lambda c: encode_body(json_dumps(c), STATIC_MAX_AGE),
+        )
+        return cached_response(request, encoded, "application/json; charset=utf-8")
+
+    async def _get_raw_channels(self) -> List[dict]:
+        # the same list object is returned until it expires, so the
+        # encoded body is reused by identity
+        if (
+            self._raw_channels is not None
+            and monotonic() - self._raw_channels[0] < STATIC_MAX_AGE
+        ):
+            return self._raw_channels[1]
+
+        if self._channels_fetch is None or self._channels_fetch.done():
+            self._channels_fetch = get_event_loop().create_task(
+                self._fetch_raw_channels()
             )
-        elif request.path.endswith(".m3u8"):
-            channel_id = request.path.rsplit("/", 1)[1][:-5]
-            try:
-                playlist = await get_playlist(channel_id)
-            except Exception as e:  # noqa: BLE001
-                logging.exception("Error generating playlist for %s: %s", channel_id, e)
-                playlist = None
-
-            if playlist:
-                response = web.Response(
-                    status=200,
-                    body=bytes(playlist, "utf-8"),
-                    headers={"Content-Type": "application/x-mpegURL"},
-                )
-            else:
-                set_active(None)
-                response = web.Response(status=503)
-        elif request.path.endswith(".aac"):
-            segment_path = request.path[1:]
-            data = await get_playlist_chunk(segment_path)
-
-            if data:
-                response = web.Response(
-                    status=200,
-                    body=data,
-                    headers={"Content-Type": "audio/x-aac"},
+        return await shield(self._channels_fetch)
+
+    async def _fetch_raw_channels(self) -> List[dict]:
+        try:
+            raw_channels = await self._sxm.get_channels()
+        except Exception:  # noqa: BLE001
+            return []
+
+        if raw_channels:
+            self._raw_channels = (monotonic(), raw_channels)
+        return raw_channels
+
+    async def _route_segment(self, request: web.Request):
+        return await self.segment(request, request.match_info["path"])
+
+    async def _route_playlist(self, request: web.Request):
+        return await self.playlist(request, request.match_info["channel_id"])
+
+    async def _route_master(self, request: web.Request):
+        return await self.master_playlist(request, request.match_info["channel_id"])
+
+    async def _route_stream(self, request: web.Request):
+        return await self.stream(request, request.match_info["channel"])
+
+    async def _route_art(self, request: web.Request):
+        info = request.match_info
+        return await self.art_image(request, info["scheme"], info["host"], info["path"])
+
+    async def _get_channel(self, channel_q: str) -> Optional[AnyChannel]:
+        try:
+            return await self._sxm.get_channel(channel_q)
+        except Exception as e:  # noqa: BLE001
+            logging.exception("Error resolving channel %s: %s", channel_q, e)
+            return None
+
+    async def _get_segment(self, path: str):
+        generation = self._sxm.session_generation
+        try:
+            data = await self._sxm.get_segment(path)
+        except SegmentRetrievalException:
+            await self._sxm.reauthenticate(generation, reset=True)
+            data = await self._sxm.get_segment(path)
+
+        return data
+
+    def _find_prefetcher(
+        self, segment_path: str
+    ) -> Tuple[Optional[PlaylistKey], Optional[SegmentPrefetcher]]:
+        for key, prefetcher in self._prefetchers.items():
+            if segment_path in prefetcher:
+                return key, prefetcher
+        return None, None
+
+    def _track(self, request: web.Request, key: PlaylistKey) -> None:
+        self.listeners.touch(key, request.remote or "")
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = get_event_loop().create_task(self._sweep())
+
+    async def _sweep(self) -> None:
+        while len(self.listeners):
+            await sleep(self.listeners.timeout / 2)
+            for channel_id, quality in self.listeners.expire():
+                self._release(channel_id, quality)
+
+    def _release(self, channel_id: str, quality: QualitySize) -> None:
+        stream = self._streams.get((channel_id, quality))
+        if stream is not None and stream.listener_count > 0:
+            return
+
+        self._log.debug(f"No listeners left for {channel_id} ({quality.value})")
+        self._stop_prefetch(channel_id, quality)
+        self._bodies.discard(("playlist", channel_id, quality))
+        self._sxm.release_channel(channel_id, quality)
+
+    async def _get_playlist(self, channel_id: str, quality: QualitySize):
+        key = (channel_id, quality)
+        prefetcher = self._prefetchers.get(key)
+        if prefetcher is not None and prefetcher.playlist is not None:
+            prefetcher.touch()
+            return prefetcher.playlist
+
+        playlist = await self._sxm.get_playlist(channel_id, quality=quality)
+        if self.precache and playlist is not None:
+            if prefetcher is None:
+                prefetcher = SegmentPrefetcher(
+                    self._sxm,
+                    channel_id,
+                    quality=quality,
+                    get_segment=self._get_segment,
+                    ahead=self.prefetch_segments,
+                    concurrency=self.prefetch_concurrency,
                 )
-            else:
-                response = web.Response(status=503)
-        elif request.path.endswith("/key/1"):
-            response = web.Response(
-                status=200,
-                body=HLS_AES_KEY,
-                headers={"Content-Type": "text/plain"},
+                self._prefetchers[key] = prefetcher
+            prefetcher.start(playlist)
+
+        return playlist
+
+    def _stop_prefetch(self, channel_id: str, quality: QualitySize):
+        prefetcher = self._prefetchers.pop((channel_id, quality), None)
+        if prefetcher is not None:
+            prefetcher.stop()
+
+    def _get_quality(self, request: web.Request) -> Optional[QualitySize]:
+        value = request.query.get("quality")
+        if not value:
+            return self._sxm.stream_quality
+        try:
+            return QualitySize(value.upper())
+        except ValueError:
+            return None
+
+    def _master_playlist(
+        self, channel_id: str, qualities: Tuple[QualitySize, ...]
+    ) -> str:
+        lines = ["#EXTM3U"]
+        for quality in qualities:
+            lines.append(
+                f"#EXT-X-STREAM-INF:BANDWIDTH={QUALITY_BANDWIDTH[quality]},"
+                f'CODECS="mp4a.40.2"'
             )
-        elif request.path.endswith("/channels/"):
-            try:
-                raw_channels = await sxm.get_channels()
-            except Exception:
-                raw_channels = []
-
-            if len(raw_channels) > 0:
-                response = web.Response(
-                    status=200,
-                    body=json.dumps(raw_channels).encode("utf-8"),
-                    headers={"Content-Type": "application/json; charset=utf-8"},
-                )
-            else:
-                response = web.Response(status=403)
+            lines.append(f"/{channel_id}.m3u8?quality={quality.value}")
+        return "\n".join(lines)
 
+    async def _now_playing_many(self, request: web.Request, channel_qs: List[str]):
+        requested: Dict[str, Optional[AnyChannel]] = {}
+        for channel_q in channel_qs:
+            channel_q = channel_q.strip()
+            if channel_q:
+                requested[channel_q] = await self._get_channel(channel_q)
+
+        channels = {c.id: c for c in requested.values() if c is not None}
+        responses: Dict[str, Optional[Dict[str, Any]]] = {}
+        try:
+            async for channel, data in self._sxm.get_now_playing_many(
+                channels.values(), concurrency=self.batch_concurrency
+            ):
+                responses[channel.id] = data
+        except Exception as e:  # noqa: BLE001
+            logging.exception("Error fetching now playing batch: %s", e)
+
+        records = extract_now_playing(responses)
+        payload = {}
+        for channel_q, found in requested.items():
+            record = None if found is None else records.get(found.id)
+            payload[channel_q] = None if record is None else record._asdict()
+
+        max_age = min(
+            (update_frequency(d) for d in responses.values() if d is not None),
+            default=DEFAULT_POLL_INTERVAL,
+        )
+        return cached_response(
+            request,
+            encode_body(json_dumps(payload), max_age),
+            "application/json; charset=utf-8",
+        )
+
+
+PROXY_KEY = web.AppKey("sxm_proxy", SXMProxy)
+METRICS_KEY = web.AppKey("sxm_metrics", ProxyMetrics)
+SEGMENT_CACHE_KEY = web.AppKey("sxm_segment_cache", SegmentCache)
+
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """Records the status and handler time of every request by route name"""
+
+    start = monotonic()
+    # nginx's "client closed request", for handlers cancelled by a disconnect
+    status = 499
+    try:
+        response = await handler(request)
+        status = response.status
         return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    except Exception:
+        status = 500
+        raise
+    finally:
+        route = request.match_info.route.name or "unmatched"
+        request.app[METRICS_KEY].record(route, status, monotonic() - start)
+
+
+@web.middleware
+async def timing_middleware(request: web.Request, handler) -> web.StreamResponse:
+    """Adds a `Server-Timing` header with the handler time to responses
+    that have not started streaming"""
+
+    start = monotonic()
+    response = await handler(request)
+    if not response.prepared:
+        duration = (monotonic() - start) * 1000
+        response.headers["Server-Timing"] = f"app;dur={duration:.1f}"
+    return response
+
+
+@web.middleware
+async def json_compression_middleware(
+    request: web.Request, handler
+) -> web.StreamResponse:
+    """Compresses JSON bodies of at least `JSON_COMPRESS_MIN_SIZE` bytes
+    for clients that accept it"""
+
+    response = await handler(request)
+    if (
+        isinstance(response, web.Response)
+        and not response.prepared
+        and response.content_type == "application/json"
+        and isinstance(response.body, bytes)
+        and len(response.body) >= JSON_COMPRESS_MIN_SIZE
+    ):
+        response.headers["Vary"] = "Accept-Encoding"
+        response.enable_compression()
+    return response
+
+
+async def _metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=json_dumps(request.app[METRICS_KEY].as_dict()),
+        content_type="application/json",
+    )
+
+
+async def _stop_proxy(app: web.Application) -> None:
+    app[PROXY_KEY].stop()
+
+
+async def _close_segment_cache(app: web.Application) -> None:
+    segment_cache = app.get(SEGMENT_CACHE_KEY)
+    if segment_cache is not None:
+        await segment_cache.close()
+
+
+async def _close_art(app: web.Application) -> None:
+    art = app[PROXY_KEY].art
+    await art.close()
+    if art.cache is not None:
+        await art.cache.close()
+
 
-    return sxm_handler
+def make_http_app(
+    sxm: SXMClientAsync,
+    segment_cache: Optional[SegmentCache] = None,
+    renew_session: bool = True,
+    **options: Any,
+) -> web.Application:
+    """
+    Creates an :class:`aiohttp.web.Application` that proxies SXM requests,
+    with typed routes, request metrics at `/metrics`, `Server-Timing`
+    headers and compression of large JSON responses.
+
+    The application owns the proxy's background work: session renewal
+    starts with the application, streams and pollers stop on shutdown,
+    and prefetchers, image fetches and the segment and art caches are
+    closed on cleanup.
+
+    Parameters
+    ----------
+    sxm : :class:`SXMClientAsync`
+        Authenticated SXM client to use
+    segment_cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache to serve repeat segment requests from
+    renew_session : :class:`bool`
+        Renew the SXM session in the background while the application runs
+
+    Other keyword arguments are passed to :class:`SXMProxy`.
+    """
+
+    proxy = SXMProxy(sxm, segment_cache=segment_cache, **options)
+
+    app = web.Application(
+        middlewares=[metrics_middleware, timing_middleware, json_compression_middleware]
+    )
+    app[PROXY_KEY] = proxy
+    app[METRICS_KEY] = ProxyMetrics()
+    if segment_cache is not None:
+        app[SEGMENT_CACHE_KEY] = segment_cache
+
+    app.router.add_routes(proxy.routes())
+    app.router.add_get("/metrics", _metrics, name="metrics")
+
+    async def start_renewal(app: web.Application):
+        sxm.start_session_renewal()
+
+    async def stop_renewal(app: web.Application):
+        sxm.stop_session_renewal()
+
+    if renew_session:
+        app.on_startup.append(start_renewal)
+        app.on_cleanup.append(stop_renewal)
+    app.on_shutdown.append(_stop_proxy)
+    app.on_cleanup.append(_close_segment_cache)
+    app.on_cleanup.append(_close_art)
+    return app
+
+
+def make_http_handler(
+    sxm: SXMClientAsync,
+    precache: bool = True,
+    stream_queue_size: int = 4,
+    event_keepalive: float = 15,
+    batch_concurrency: int = 8,
+    prefetch_segments: int = 3,
+    prefetch_concurrency: int = 2,
+    segment_cache: Optional[SegmentCache] = None,
+    listener_timeout: float = 60,
+    art_cache: Optional[SegmentCache] = None,
+) -> Callable[[web.Request], Coroutine[Any, Any, web.StreamResponse]]:
+    """
+    Creates and returns a configured `aiohttp` request handler ready to be used
+    by a :meth:`aiohttp.web.run_app` instance with your :class:`SXMClient`.
+
+    Really useful if you want to create your own HTTP server as part
+    of another application. :func:`make_http_app` creates a complete
+    application that also stops the proxy's background tasks.
+
+    Parameters
+    ----------
+    sxm : :class:`SXMClient`
+        SXM client to use
+    precache : :class:`bool`
+        Reload requested HLS playlists in the background and prefetch
+        the segments listeners are about to request
+    stream_queue_size : :class:`int`
+        Number of segments buffered per `/stream/{channel}.aac` listener
+        before the listener starts dropping data
+    event_keepalive : :class:`float`
+        Seconds between keepalive comments on idle `/now_playing/events`
+        connections
+    batch_concurrency : :class:`int`
+        Max concurrent upstream requests for batch
+        `/now_playing?channel=a,b,c` requests
+    prefetch_segments : :class:`int`
+        Number of segments kept warm ahead of the furthest HLS listener
+    prefetch_concurrency : :class:`int`
+        Max concurrent segment prefetches per channel and quality
+    segment_cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache to serve repeat segment requests from
+    listener_timeout : :class:`float`
+        Seconds without a playlist or segment request before an HLS
+        listener is gone
+    art_cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache for `/art/...` images
+    """
+
+    proxy = SXMProxy(
+        sxm,
+        precache=precache,
+        stream_queue_size=stream_queue_size,
+        event_keepalive=event_keepalive,
+        batch_concurrency=batch_concurrency,
+        prefetch_segments=prefetch_segments,
+        prefetch_concurrency=prefetch_concurrency,
+        segment_cache=segment_cache,
+        listener_timeout=listener_timeout,
+        art_cache=art_cache,
+    )
+    return proxy.handle
 
 
 def run_http_server(
@@ -246,6 +998,7 @@ def run_http_server(
     ip="0.0.0.0",  # nosec
     logger: logging.Logger = None,
     precache: bool = True,
+    segment_cache: Optional[SegmentCache] = None,
 ) -> None:
     """
     Creates and runs an instance of :class:`http.server.HTTPServer` to proxy
@@ -260,6 +1013,8 @@ def run_http_server(
         Port number to bind SXM Proxy server on
     ip : :class:`str`
         IP address to bind SXM Proxy server on
+    segment_cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache to serve repeat segment requests from
     """
 
     if logger is None:
@@ -273,8 +1028,9 @@ def run_http_server(
         logging.fatal("Could not get SXM configuration")
         exit(1)
 
-    app = web.Application()
-    app.router.add_get("/{_:.*}", make_http_handler(sxm.async_client))
+    app = make_http_app(
+        sxm.async_client, precache=precache, segment_cache=segment_cache
+    )
     try:
         logger.info(f"running SXM proxy server on http://{ip}:{port}")
         web.run_app(
@@ -286,3 +1042,80 @@ def run_http_server(
         )
     except KeyboardInterrupt:
         pass
+
+
+async def serve(
+    sxm: SXMClientAsync,
+    port: int,
+    ip="0.0.0.0",  # nosec
+    logger: Optional[logging.Logger] = None,
+    segment_cache: Optional[SegmentCache] = None,
+    warmup: bool = True,
+    warmup_channels: Optional[List[str]] = None,
+    **options: Any,
+) -> None:
+    """
+    Authenticates `sxm`, then serves the application from
+    :func:`make_http_app` on the running event loop until cancelled.
+
+    Authentication, the configuration download and the channel list
+    download run concurrently, and the client is only ever used on the
+    serving loop. With `warmup`, playlist URLs are resolved with
+    :meth:`SXMClientAsync.warm_up` before the server starts listening.
+
+    Parameters
+    ----------
+    sxm : :class:`SXMClientAsync`
+        SXM client to use
+    port : :class:`int`
+        Port number to bind SXM Proxy server on
+    ip : :class:`str`
+        IP address to bind SXM Proxy server on
+    segment_cache : Optional[:class:`SegmentCache`]
+        Memory and disk cache to serve repeat segment requests from
+    warmup : :class:`bool`
+        Resolve playlist URLs before serving
+    warmup_channels : Optional[List[:class:`str`]]
+        Channels to resolve playlist URLs for. Defaults to the account's
+        favorite channels
+
+    Other keyword arguments are passed to :func:`make_http_app`.
+
+    Raises
+    ------
+    AuthenticationError
+        If the client could not log into SXM
+    ConfigurationError
+        If the SXM configuration could not be downloaded
+    """
+
+    if logger is None:
+        logger = logging.getLogger(__file__)
+
+    # configuration and channel requests wait for the single in flight login
+    authenticated, configuration, channels = await gather(
+        sxm.reauthenticate(),
+        sxm.configuration,
+        sxm.channels,
+        return_exceptions=True,
+    )
+    if authenticated is not True:
+        raise AuthenticationError("Could not log into SXM")
+    if isinstance(configuration, BaseException):
+        raise ConfigurationError("Could not get SXM configuration") from configuration
+    if isinstance(channels, BaseException) or not channels:
+        logger.warning("Could not get SXM channels, retrying on first request")
+
+    if warmup:
+        resolved = await sxm.warm_up(warmup_channels)
+        logger.info(f"resolved playlist URLs for {resolved} channels")
+
+    app = make_http_app(sxm, segment_cache=segment_cache, **options)
+    runner = web.AppRunner(app, access_log=logger)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, ip, port).start()
+        logger.info(f"running SXM proxy server on http://{ip}:{port}")
+        await Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,76 @@
+"""Listener tracking module for sxm"""
+
+from time import monotonic
+from typing import Dict, Generic, Hashable, List, Optional, TypeVar
+
+__all__ = ["ListenerTracker"]
+
+K = TypeVar("K", bound=Hashable)
+
+
+class ListenerTracker(Generic[K]):
+    """Tracks who is listening to what, by client address and a key such
+    as `(channel_id, quality)`.
+
+    HLS players reload the playlist every target duration and request a
+    segment after each reload, so a listener is refreshed by every
+    request it makes and counts as gone after `timeout` seconds without
+    one.
+
+    Parameters
+    ----------
+    timeout : :class:`float`
+        Seconds without a request before a listener is gone
+    """
+
+    timeout: float
+
+    _listeners: Dict[K, Dict[str, float]]
+
+    def __init__(self, timeout: float = 60):
+        self.timeout = timeout
+        self._listeners = {}
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._listeners
+
+    def __len__(self) -> int:
+        return sum(len(clients) for clients in self._listeners.values())
+
+    def count(self, key: K) -> int:
+        """Returns the number of listeners for `key`"""
+
+        return len(self._listeners.get(key, ()))
+
+    def counts(self) -> Dict[K, int]:
+        """Returns the number of listeners by key"""
+
+        return {key: len(clients) for key, clients in self._listeners.items()}
+
+    def touch(self, key: K, client: str) -> bool:
+        """Refreshes a listener. Returns if it is a new one"""
+
+        clients = self._listeners.get(key)
+        if clients is None:
+            clients = self._listeners[key] = {}
+        new = client not in clients
+        clients[client] = monotonic()
+        return new
+
+    def expire(self, now: Optional[float] = None) -> List[K]:
+        """Removes listeners that timed out. Returns the keys that lost
+        their last listener."""
+
+        if now is None:
+            now = monotonic()
+        cutoff = now - self.timeout
+
+        gone: List[K] = []
+        for key, clients in list(self._listeners.items()):
+            for client, last_seen in list(clients.items()):
+                if last_seen < cutoff:
+                    del clients[client]
+            if not clients:
+                del self._listeners[key]
+                gone.append(key)
+        return gone
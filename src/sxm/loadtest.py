@@ -0,0 +1,172 @@
+"""HLS load generator for the sxm proxy"""
+
+import asyncio
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from sxm.prefetch import LIVE_EDGE_SEGMENTS
+from sxm.stream import DEFAULT_TARGET_DURATION, parse_playlist
+
+__all__ = ["LoadTestResult", "run_load_test"]
+
+
+def _percentile(samples: List[float], percent: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+@dataclass
+class LoadTestResult:
+    """Combined stats for every simulated player
+
+    A stall is counted when a segment finishes downloading after the
+    player's buffer has already run dry; `stall_seconds` is the total time
+    spent rebuffering.
+    """
+
+    players: int = 0
+    duration: float = 0.0
+    bytes: int = 0
+    errors: int = 0
+    stalls: int = 0
+    stall_seconds: float = 0.0
+    playlist_latency: List[float] = field(default_factory=list)
+    segment_latency: List[float] = field(default_factory=list)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes / self.duration if self.duration else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        """Returns a JSON serializable summary of the results"""
+
+        return {
+            "players": self.players,
+            "duration": round(self.duration, 3),
+            "bytes": self.bytes,
+            "bytes_per_second": round(self.bytes_per_second, 1),
+            "errors": self.errors,
+            "stalls": self.stalls,
+            "stall_seconds": round(self.stall_seconds, 3),
+            "playlist_requests": len(self.playlist_latency),
+            "playlist_p50_ms": round(_percentile(self.playlist_latency, 50) * 1000, 2),
+            "playlist_p99_ms": round(_percentile(self.playlist_latency, 99) * 1000, 2),
+            "segment_requests": len(self.segment_latency),
+            "segment_p50_ms": round(_percentile(self.segment_latency, 50) * 1000, 2),
+            "segment_p99_ms": round(_percentile(self.segment_latency, 99) * 1000, 2),
+        }
+
+
+async def _run_player(
+    http: httpx.AsyncClient,
+    channel_id: str,
+    until: float,
+    result: LoadTestResult,
+    quality: Optional[str] = None,
+) -> None:
+    params = {"quality": quality} if quality else None
+    last_sequence: Optional[int] = None
+    buffered_until: Optional[float] = None
+
+    while monotonic() < until:
+        start = monotonic()
+        target_duration = DEFAULT_TARGET_DURATION
+        try:
+            response = await http.get(f"/{channel_id}.m3u8", params=params)
+        except httpx.HTTPError:
+            response = None
+        result.playlist_latency.append(monotonic() - start)
+
+        if response is None or response.status_code != 200:
+            result.errors += 1
+        else:
+            media = parse_playlist(response.text)
+            target_duration = media.target_duration
+
+            segments = media.segments
+            if last_sequence is None:
+                segments = segments[-LIVE_EDGE_SEGMENTS:]
+            else:
+                segments = [s for s in segments if s.sequence > last_sequence]
+
+            for segment in segments:
+                if monotonic() >= until:
+                    break
+
+                segment_start = monotonic()
+                try:
+                    response = await http.get(f"/{segment.path}")
+                except httpx.HTTPError:
+                    response = None
+                now = monotonic()
+                result.segment_latency.append(now - segment_start)
+
+                if response is None or response.status_code != 200:
+                    result.errors += 1
+                    continue
+
+                result.bytes += len(response.content)
+                last_sequence = segment.sequence
+                if buffered_until is None:
+                    buffered_until = now
+                elif now > buffered_until:
+                    result.stalls += 1
+                    result.stall_seconds += now - buffered_until
+                    buffered_until = now
+                buffered_until += segment.duration or target_duration
+
+        # players reload live playlists once per target duration
+        await asyncio.sleep(max(target_duration - (monotonic() - start), 0))
+
+
+async def run_load_test(
+    url: str,
+    channels: Sequence[str],
+    players: int = 10,
+    duration: float = 60,
+    ramp_up: float = 0,
+    quality: Optional[str] = None,
+) -> LoadTestResult:
+    """Simulates HLS players against a running sxm proxy.
+
+    Each player reloads its channel's playlist every target duration and
+    downloads every new segment, tracking its playback buffer to detect
+    stalls.
+
+    Parameters
+    ----------
+    url : :class:`str`
+        Base URL of the proxy, e.g. `http://127.0.0.1:9999`
+    channels : Sequence[:class:`str`]
+        Channel IDs to play; players are spread across them evenly
+    players : :class:`int`
+        Number of simulated players
+    duration : :class:`float`
+        Seconds to run for
+    ramp_up : :class:`float`
+        Seconds over which player start times are spread
+    quality : Optional[:class:`str`]
+        `quality` query parameter to request playlists with
+    """
+
+    result = LoadTestResult(players=players)
+    limits = httpx.Limits(max_connections=players * 2)
+    timeout = httpx.Timeout(DEFAULT_TARGET_DURATION * 2)
+
+    async def _start_player(index: int, until: float):
+        if ramp_up:
+            await asyncio.sleep(ramp_up * index / players)
+        await _run_player(http, channels[index % len(channels)], until, result, quality)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=timeout) as http:
+        start = monotonic()
+        until = start + duration
+        await asyncio.gather(*(_start_player(i, until) for i in range(players)))
+        result.duration = monotonic() - start
+
+    return result
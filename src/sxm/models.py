@@ -1,14 +1,32 @@
 from __future__ import annotations
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Sequence
 from datetime import datetime, timedelta, timezone
 from enum import Enum
-from typing import List, Optional, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
 from pydantic import (
     BaseModel,
     ConfigDict,
     Field,
     PrivateAttr,
+    field_serializer,
     field_validator,
     model_validator,
 )
@@ -29,7 +47,11 @@ __all__ = [
     "XMPosition",
     "XMHLSInfo",
     "XMChannel",
+    "MarkerTimeline",
     "XMLiveChannel",
+    "build_hls_variant_table",
+    "XMNowPlaying",
+    "extract_now_playing",
     "QualitySize",
     "RegionChoice",
 ]
@@ -37,6 +59,7 @@ __all__ = [
 
 LIVE_PRIMARY_HLS = "https://siriusxm-priprodlive.akamaized.net"
 LIVE_SECONDARY_HLS = "https://siriusxm-secprodlive.akamaized.net"
+HLS_PLACEHOLDERS = ("live_primary_hls", "live_secondary_hls")
 
 
 def parse_xm_datetime(dt_string: str):
@@ -50,6 +73,17 @@ def parse_xm_timestamp(timestamp: int):
     return datetime.fromtimestamp(timestamp / 1000, timezone.utc)
 
 
+def strip_hls_placeholder(url: str) -> str:
+    """Removes a leading `%Live_Primary_HLS%`/`%Live_Secondary_HLS%` token
+    from an HLS URL, in any case"""
+
+    if url.startswith("%"):
+        end = url.find("%", 1)
+        if end > 0 and url[1:end].lower() in HLS_PLACEHOLDERS:
+            return url[end + 1 :]
+    return url
+
+
 class QualitySize(str, Enum):
     SMALL_64k = "SMALL"
     MEDIUM_128k = "MEDIUM"
@@ -66,7 +100,7 @@ class SXMBaseModel(BaseModel):
 
 
 class XMArt(SXMBaseModel):
-    name: Optional[str]
+    name: Optional[str] = None
     url: str
     art_type: str = Field(..., alias="type")
 
@@ -90,7 +124,7 @@ class XMCategory(SXMBaseModel):
 class XMMarker(SXMBaseModel):
     guid: str = Field(..., alias="assetGUID")
     time: datetime
-    time_seconds: int
+    time_seconds: int = 0
     duration: timedelta
 
     @field_validator("time", mode="before")
@@ -115,7 +149,7 @@ class XMShow(SXMBaseModel):
     long_title: str = Field(..., alias="longTitle")
     short_description: str = Field(..., alias="shortDescription")
     long_description: str = Field(..., alias="longDescription")
-    arts: List[XMArt] = Field(..., alias="creativeArts")
+    arts: List[XMArt] = Field([], alias="creativeArts")
 
     @field_validator("arts", mode="before")
     @classmethod
@@ -208,17 +242,8 @@ class XMHLSInfo(SXMBaseModel):
     @property
     def resolved_url(self):
         if self._url_cache is None:
-            # Normalize any placeholder tokens in the path and join with the configured root
-            path = self.url or ""
-            # Remove any SXM placeholder tokens that sometimes appear in URLs
-            for token in (
-                "%Live_Primary_HLS%",
-                "%live_primary_hls%",
-                "%Live_Secondary_HLS%",
-                "%live_secondary_hls%",
-            ):
-                if path.startswith(token):
-                    path = path[len(token) :]
+            # Remove any SXM placeholder token and join with the configured root
+            path = strip_hls_placeholder(self.url or "")
             # Ensure exactly one slash between root and path
             root = (
                 self._primary_root if self.name == "primary" else self._secondary_root
@@ -268,18 +293,230 @@ class XMChannel(SXMBaseModel):
         return f"#{self.channel_number} {self.name}"
 
 
+def _datetime_to_ms(dt: datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def _marker_key(marker: Dict[str, Any]) -> Tuple[Optional[str], int]:
+    return (marker.get("assetGUID"), marker["time"])
+
+
+def _layer_markers(marker_lists: Iterable[dict], layer: str) -> Iterator[dict]:
+    for marker_list in marker_lists:
+        if marker_list.get("layer") == layer:
+            for marker in marker_list.get("markers", []):
+                if layer in marker:
+                    yield marker
+
+
+def _is_song_cut(marker: Dict[str, Any]) -> bool:
+    return marker["cut"].get("cutContentType") == "Song"
+
+
+class MarkerTimeline(Sequence):
+    """Time sorted index of raw SXM marker dicts.
+
+    Marker times are kept in an array backed column so lookups by time are
+    a bisect instead of a scan. Markers are only validated into `model`
+    when they are actually accessed, so a large live channel response
+    costs almost nothing until a marker is read.
+
+    Parameters
+    ----------
+    model : Type[:class:`XMMarker`]
+        Model raw markers are validated into on access
+    markers : Iterable[:class:`dict`]
+        Raw marker dicts, in any order
+    """
+
+    model: Type[XMMarker]
+
+    _times: array
+    _raw: List[Dict[str, Any]]
+    _validated: List[Optional[XMMarker]]
+    _keys: Set[Tuple[Optional[str], int]]
+
+    def __init__(self, model: Type[XMMarker], markers: Iterable[Dict[str, Any]] = ()):
+        self.model = model
+        self._raw = []
+        self._times = array("q")
+        self._validated = []
+        self._keys = set()
+        self.merge(markers)
+
+    @classmethod
+    def from_marker_lists(
+        cls, model: Type[XMMarker], marker_lists: Iterable[dict], layer: str
+    ) -> "MarkerTimeline":
+        """Builds a timeline from the `markerLists` of a live channel
+        response, keeping markers from `layer` that have a `layer` key"""
+
+        return cls(model, _layer_markers(marker_lists, layer))
+
+    @property
+    def times(self) -> array:
+        """Sorted marker times in milliseconds since epoch"""
+        return self._times
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(len(self))[index]]
+        return self._get(range(len(self))[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._get(index)
+
+    def _get(self, index: int) -> XMMarker:
+        marker = self._validated[index]
+        if marker is None:
+            marker = self.model.model_validate(self._raw[index])
+            self._validated[index] = marker
+        return marker
+
+    def raw(self, index: int) -> Dict[str, Any]:
+        """Returns the unvalidated marker dict at `index`"""
+        return self._raw[index]
+
+    def select(self, predicate: Callable[[Dict[str, Any]], bool]) -> "MarkerTimeline":
+        """Returns a new timeline of the raw markers matching `predicate`"""
+
+        timeline = MarkerTimeline(self.model)
+        for index, marker in enumerate(self._raw):
+            if predicate(marker):
+                timeline._raw.append(marker)
+                timeline._times.append(self._times[index])
+                timeline._validated.append(self._validated[index])
+                timeline._keys.add(_marker_key(marker))
+        return timeline
+
+    def merge(
+        self,
+        markers: Iterable[Dict[str, Any]],
+        retention: Optional[timedelta] = None,
+        now: Optional[datetime] = None,
+    ) -> int:
+        """Adds raw markers that are not already in the timeline, deduped
+        by `assetGUID` and time, and returns how many were added.
+
+        Markers already in the timeline are skipped with a set lookup, so
+        merging a full now playing response only costs work for the new
+        markers.
+
+        Parameters
+        ----------
+        markers : Iterable[:class:`dict`]
+            Raw marker dicts, in any order
+        retention : Optional[:class:`timedelta`]
+            If set, markers older than `now - retention` are evicted,
+            except the one still in effect at that time
+        now : Optional[:class:`datetime`]
+        """
+
+        new = []
+        for marker in markers:
+            key = _marker_key(marker)
+            if key not in self._keys:
+                self._keys.add(key)
+                new.append(marker)
+
+        if new:
+            new.sort(key=lambda x: x["time"])
+            if not self._times or new[0]["time"] >= self._times[-1]:
+                self._raw.extend(new)
+                self._times.extend(m["time"] for m in new)
+                self._validated.extend([None] * len(new))
+            else:
+                entries = sorted(
+                    zip(self._raw + new, self._validated + [None] * len(new)),
+                    key=lambda x: x[0]["time"],
+                )
+                self._raw = [raw for raw, _ in entries]
+                self._validated = [validated for _, validated in entries]
+                self._times = array("q", (m["time"] for m in self._raw))
+
+        if retention is not None:
+            if now is None:
+                now = datetime.now(timezone.utc)
+            self.evict(now - retention)
+        return len(new)
+
+    def evict(self, before: datetime) -> int:
+        """Removes the markers older than `before` and returns how many
+        were removed. The latest of them is kept, since it is still in
+        effect at `before`.
+
+        Parameters
+        ----------
+        before : :class:`datetime`
+        """
+
+        count = bisect_left(self._times, _datetime_to_ms(before)) - 1
+        if count > 0:
+            for marker in self._raw[:count]:
+                self._keys.discard(_marker_key(marker))
+            del self._raw[:count]
+            del self._times[:count]
+            del self._validated[:count]
+        return count
+
+    def latest_index(self, now_ms: int) -> int:
+        """Returns the index of the latest marker that started before
+        `now_ms` or `-1` if there is none"""
+        return bisect_left(self._times, now_ms) - 1
+
+    def latest(self, now: Optional[datetime] = None) -> Optional[XMMarker]:
+        """Returns the latest marker relative to `now`
+
+        Parameters
+        ----------
+        now : Optional[:class:`datetime`]
+        """
+
+        if now is None:
+            now = datetime.now(timezone.utc)
+
+        # compare at second precision like `XMMarker.time_seconds`
+        index = self.latest_index(int(now.timestamp()) * 1000)
+        if index < 0:
+            return None
+        return self._get(index)
+
+    def between(self, start: datetime, end: datetime) -> List[XMMarker]:
+        """Returns all markers with `start <= time < end`
+
+        Parameters
+        ----------
+        start : :class:`datetime`
+        end : :class:`datetime`
+        """
+
+        first = bisect_left(self._times, _datetime_to_ms(start))
+        last = bisect_right(self._times, _datetime_to_ms(end) - 1)
+        return [self._get(i) for i in range(first, last)]
+
+
 class XMLiveChannel(SXMBaseModel):
     """See `tests/sample_data/xm_live_channel.json` for sample"""
 
+    model_config = ConfigDict(populate_by_name=True, arbitrary_types_allowed=True)
+
     id: str = Field(..., alias="channelId")  # noqa A003
     hls_infos: List[XMHLSInfo] = Field(..., alias="hlsAudioInfos")
     custom_hls_infos: List[XMHLSInfo] = Field(..., alias="customAudioInfos")
-    episode_markers: List[XMEpisodeMarker] = Field(default_factory=list)
-    cut_markers: List[XMCutMarker] = Field(default_factory=list)
+    episode_markers: MarkerTimeline = Field(
+        default_factory=lambda: MarkerTimeline(XMEpisodeMarker)
+    )
+    cut_markers: MarkerTimeline = Field(
+        default_factory=lambda: MarkerTimeline(XMCutMarker)
+    )
     tune_time: Optional[datetime] = None
 
     _stream_quality: QualitySize = PrivateAttr(QualitySize.LARGE_256k)
-    _song_cuts: Optional[List[XMCutMarker]] = PrivateAttr(None)
+    _song_cuts: Optional[MarkerTimeline] = PrivateAttr(None)
     _primary_hls: Optional[XMHLSInfo] = PrivateAttr(None)
     _secondary_hls: Optional[XMHLSInfo] = PrivateAttr(None)
 
@@ -291,23 +528,58 @@ class XMLiveChannel(SXMBaseModel):
     @field_validator("episode_markers", mode="before")
     @classmethod
     def _validate_episode_markers(cls, v):
-        markers = []
-        for marker_list in v:
-            if marker_list["layer"] == "episode":
-                for marker in marker_list["markers"]:
-                    markers.append(XMEpisodeMarker.model_validate(marker))
-        return sorted(markers, key=lambda x: x.time)
+        if isinstance(v, MarkerTimeline):
+            return v
+        return MarkerTimeline.from_marker_lists(XMEpisodeMarker, v, "episode")
 
     @field_validator("cut_markers", mode="before")
     @classmethod
     def _validate_cut_markers(cls, v):
-        markers = []
-        for marker_list in v:
-            if marker_list["layer"] == "cut":
-                for marker in marker_list["markers"]:
-                    if "cut" in marker:
-                        markers.append(XMCutMarker.model_validate(marker))
-        return sorted(markers, key=lambda x: x.time)
+        if isinstance(v, MarkerTimeline):
+            return v
+        return MarkerTimeline.from_marker_lists(XMCutMarker, v, "cut")
+
+    def merge(
+        self,
+        update: Union[XMLiveChannel, Dict[str, Any]],
+        retention: Optional[timedelta] = None,
+        now: Optional[datetime] = None,
+    ) -> int:
+        """Merges the markers from a newer now playing response into this
+        live channel and returns the number of new markers.
+
+        Only markers that are not already known are added (and later
+        validated), so a long running client only pays for what changed
+        since the last refresh.
+
+        Parameters
+        ----------
+        update : Union[:class:`XMLiveChannel`, :class:`dict`]
+            Another live channel or raw `liveChannelData` dict
+        retention : Optional[:class:`timedelta`]
+            If set, markers older than `now - retention` are evicted,
+            except the one still in effect at that time
+        now : Optional[:class:`datetime`]
+        """
+
+        if isinstance(update, XMLiveChannel):
+            cuts: Iterable[dict] = update.cut_markers._raw
+            episodes: Iterable[dict] = update.episode_markers._raw
+        else:
+            marker_lists = update.get("markerLists", [])
+            cuts = list(_layer_markers(marker_lists, "cut"))
+            episodes = _layer_markers(marker_lists, "episode")
+
+        added = self.cut_markers.merge(cuts, retention, now)
+        added += self.episode_markers.merge(episodes, retention, now)
+        if self._song_cuts is not None:
+            # known songs are skipped by key, so only new songs cost work
+            self._song_cuts.merge((m for m in cuts if _is_song_cut(m)), retention, now)
+        return added
+
+    @field_serializer("episode_markers", "cut_markers")
+    def _serialize_markers(self, v: MarkerTimeline):
+        return [marker.model_dump() for marker in v]
 
     def set_stream_quality(self, value: QualitySize):
         self._stream_quality = value
@@ -346,14 +618,11 @@ class XMLiveChannel(SXMBaseModel):
         return self._secondary_hls  # type: ignore
 
     @property
-    def song_cuts(self) -> List[XMCutMarker]:
-        """Returns a list of all `XMCut` objects that are for songs"""
+    def song_cuts(self) -> MarkerTimeline:
+        """Returns a timeline of all `XMCut` objects that are for songs"""
 
         if self._song_cuts is None:
-            self._song_cuts = []
-            for cut in self.cut_markers:
-                if isinstance(cut.cut, XMSong):
-                    self._song_cuts.append(cut)
+            self._song_cuts = self.cut_markers.select(_is_song_cut)
 
         return self._song_cuts
 
@@ -367,20 +636,11 @@ class XMLiveChannel(SXMBaseModel):
     ) -> Union[XMMarker, None]:
         """Returns the latest `XMMarker` based on type relative to now"""
 
-        markers: Optional[List[XMMarker]] = getattr(self, marker_attr)
+        markers: Optional[MarkerTimeline] = getattr(self, marker_attr)
         if markers is None:
             return None
 
-        if now is None:
-            now = datetime.now(timezone.utc)
-
-        now_sec = int(now.timestamp())
-        latest = None
-        for marker in markers:
-            if now_sec <= marker.time_seconds:
-                break
-            latest = marker
-        return latest
+        return markers.latest(now)
 
     def get_latest_episode(
         self, now: Optional[datetime] = None
@@ -417,3 +677,147 @@ class XMLiveChannel(SXMBaseModel):
         now : Optional[:class:`datetime`]
         """
         return self._latest_marker("song_cuts", now)  # type: ignore
+
+
+def build_hls_variant_table(
+    hls_infos: Iterable[Dict[str, Any]], primary_root: str, secondary_root: str
+) -> Dict[Tuple[str, str], str]:
+    """Resolves every variant URL of a channel's raw `hlsAudioInfos` once.
+
+    Returns a table of `(name, size)` to resolved URL for every
+    :class:`QualitySize`, where `name` is `"primary"` or `"secondary"`.
+    Picks the same variant as :attr:`XMLiveChannel.primary_hls` /
+    :attr:`XMLiveChannel.secondary_hls`: the first one with the requested
+    size or else the last one with that name.
+
+    Parameters
+    ----------
+    hls_infos : Iterable[:class:`dict`]
+        Raw `hlsAudioInfos` from a live channel response
+    primary_root : :class:`str`
+    secondary_root : :class:`str`
+    """
+
+    roots = {
+        "primary": primary_root.rstrip("/"),
+        "secondary": secondary_root.rstrip("/"),
+    }
+    by_size: Dict[str, Dict[str, str]] = {}
+    fallback: Dict[str, str] = {}
+    for hls_info in hls_infos:
+        name = hls_info["name"]
+        root = roots["primary"] if name == "primary" else roots["secondary"]
+        path = strip_hls_placeholder(hls_info.get("url") or "").lstrip("/")
+        url = f"{root}/{path}"
+
+        by_size.setdefault(name, {}).setdefault(hls_info["size"], url)
+        fallback[name] = url
+
+    table: Dict[Tuple[str, str], str] = {}
+    for name, urls in by_size.items():
+        for quality in QualitySize:
+            table[(name, quality.value)] = urls.get(quality.value, fallback[name])
+    return table
+
+
+class XMNowPlaying(NamedTuple):
+    """Compact now playing record for a channel, see
+    :func:`extract_now_playing`"""
+
+    channel_id: str
+    title: str
+    artist: str
+    album: Optional[str]
+    played_at_ms: Optional[int]
+
+    @classmethod
+    def from_marker(cls, channel_id: str, marker: Dict[str, Any]) -> XMNowPlaying:
+        cut = marker.get("cut", {})
+        artists = cut.get("artists") or []
+        album = cut.get("album") or {}
+        return cls(
+            channel_id=channel_id,
+            title=cut.get("title") or "Unknown",
+            artist=artists[0]["name"] if artists else "Unknown",
+            album=album.get("title"),
+            played_at_ms=marker.get("time"),
+        )
+
+
+def _live_channel_data(data: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if data is None:
+        return None
+
+    try:
+        if data["messages"][0]["code"] != 100:
+            return None
+        return data["moduleList"]["modules"][0]["moduleResponse"]["liveChannelData"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def extract_now_playing(
+    responses: Mapping[str, Optional[Dict[str, Any]]], now_ms: Optional[int] = None
+) -> Dict[str, Optional[XMNowPlaying]]:
+    """Extracts the current cut for any number of channels from raw
+    `tune/now-playing-live` responses without validating any markers.
+
+    The cut markers of every channel are flattened into one list that is
+    sorted once by `(channel, time)` and then the current cut of each
+    channel is found with a bisect. The current cut is the latest one
+    played at or before `now_ms`, or the last one if they are all in the
+    future.
+
+    Parameters
+    ----------
+    responses : Mapping[:class:`str`, Optional[:class:`dict`]]
+        Raw responses from :meth:`SXMClientAsync.get_now_playing` by
+        channel ID
+    now_ms : Optional[:class:`int`]
+        Time to get the current cut for in milliseconds since epoch.
+        Defaults to now
+
+    Returns
+    -------
+    Dict[:class:`str`, Optional[:class:`XMNowPlaying`]]
+        Record by channel ID; `None` if the response was unsuccessful or
+        had no cuts
+    """
+
+    if now_ms is None:
+        now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+
+    channel_ids = list(responses.keys())
+    owners = array("l")
+    times = array("q")
+    markers: List[Dict[str, Any]] = []
+    for index, channel_id in enumerate(channel_ids):
+        live_channel_data = _live_channel_data(responses[channel_id])
+        if live_channel_data is None:
+            continue
+
+        for marker in _layer_markers(live_channel_data.get("markerLists", []), "cut"):
+            owners.append(index)
+            times.append(marker.get("time", 0))
+            markers.append(marker)
+
+    order = sorted(range(len(markers)), key=lambda i: (owners[i], times[i]))
+    keys = [(owners[i], times[i]) for i in order]
+
+    results: Dict[str, Optional[XMNowPlaying]] = {}
+    start = 0
+    for index, channel_id in enumerate(channel_ids):
+        end = bisect_left(keys, (index + 1,), start)
+        if start == end:
+            results[channel_id] = None
+            continue
+
+        latest = bisect_right(keys, (index, now_ms), start, end) - 1
+        if latest < start:
+            latest = end - 1
+        results[channel_id] = XMNowPlaying.from_marker(
+            channel_id, markers[order[latest]]
+        )
+        start = end
+
+    return results
@@ -0,0 +1,252 @@
+"""Segment prefetching module for sxm"""
+
+import logging
+from asyncio import CancelledError, Semaphore, Task, get_event_loop, shield, sleep
+from time import monotonic
+from typing import Awaitable, Callable, Dict, Optional
+
+from sxm.client import SXMClientAsync
+from sxm.models import QualitySize
+from sxm.scheduler import Priority, upstream_priority
+from sxm.stream import DEFAULT_TARGET_DURATION, MediaPlaylist, parse_playlist
+
+__all__ = ["SegmentPrefetcher"]
+
+# HLS players start a live playlist this many segments from the end
+LIVE_EDGE_SEGMENTS = 3
+
+
+class SegmentPrefetcher:
+    """Keeps the media playlist for a single channel/quality fresh and the
+    next segments after the furthest listener warm in memory.
+
+    The playlist is reloaded every half target duration. Each reload (and
+    each segment request that moves the furthest listener forward) queues
+    the next `ahead` segments by media sequence; they are fetched
+    concurrently, at most `concurrency` at a time. Prefetches for segments
+    that dropped out of the playlist or are behind every listener are
+    cancelled. The prefetcher stops itself after `idle_timeout` seconds
+    without a playlist or segment request.
+
+    Parameters
+    ----------
+    sxm : :class:`SXMClientAsync`
+        SXM client to use
+    channel_id : :class:`str`
+        ID of SXM channel to prefetch
+    quality : Optional[:class:`QualitySize`]
+        Stream quality to use. Defaults to the client's `stream_quality`
+    get_segment : Optional[Callable[[:class:`str`], Awaitable[Optional[bytes]]]]
+        Coroutine used to fetch segments. Defaults to
+        :meth:`SXMClientAsync.get_segment`
+    ahead : :class:`int`
+        Number of segments to keep warm after the furthest listener
+    concurrency : :class:`int`
+        Max concurrent segment prefetches
+    idle_timeout : :class:`float`
+        Seconds without requests before the prefetcher stops
+    """
+
+    channel_id: str
+    quality: Optional[QualitySize]
+    ahead: int
+    idle_timeout: float
+
+    playlist: Optional[str]
+    media: Optional[MediaPlaylist]
+
+    _sequences: Dict[str, int]
+    _segments: Dict[str, bytes]
+    _tasks: Dict[str, Task]
+    _position: Optional[int]
+    _task: Optional[Task]
+
+    def __init__(
+        self,
+        sxm: SXMClientAsync,
+        channel_id: str,
+        quality: Optional[QualitySize] = None,
+        get_segment: Optional[Callable[[str], Awaitable[Optional[bytes]]]] = None,
+        ahead: int = 3,
+        concurrency: int = 2,
+        idle_timeout: float = 30,
+    ):
+        self._log = logging.getLogger(__file__)
+        self._sxm = sxm
+        self._get_segment = get_segment or sxm.get_segment
+        self._semaphore = Semaphore(concurrency)
+
+        self.channel_id = channel_id
+        self.quality = quality
+        self.ahead = ahead
+        self.idle_timeout = idle_timeout
+
+        self.playlist = None
+        self.media = None
+
+        self._sequences = {}
+        self._segments = {}
+        self._tasks = {}
+        self._position = None
+        self._task = None
+        self._last_used = monotonic()
+
+    def __contains__(self, path: str) -> bool:
+        return path in self._sequences
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def touch(self) -> None:
+        """Marks the prefetcher as in use, postponing its idle timeout"""
+
+        self._last_used = monotonic()
+
+    def start(self, playlist: Optional[str] = None) -> None:
+        """Starts the playlist reload loop if it is not running
+
+        Parameters
+        ----------
+        playlist : Optional[:class:`str`]
+            Freshly fetched playlist to start prefetching from
+        """
+
+        self.touch()
+        if playlist is not None:
+            self._update(playlist)
+
+        if not self.is_running:
+            self._task = get_event_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        """Stops reloading the playlist and drops all prefetched segments"""
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._reset()
+
+    async def get_segment(self, path: str) -> Optional[bytes]:
+        """Returns a segment from the prefetch cache, waiting on an in flight
+        prefetch if there is one, or fetches it directly"""
+
+        self.touch()
+        sequence = self._sequences.get(path)
+        if sequence is not None and (
+            self._position is None or sequence > self._position
+        ):
+            self._position = sequence
+            self._schedule()
+
+        data = self._segments.get(path)
+        if data is not None:
+            return data
+
+        task = self._tasks.get(path)
+        if task is not None:
+            # a listener is blocked on this prefetch now
+            self._sxm.scheduler.promote(task)
+            try:
+                data = await shield(task)
+            except CancelledError:
+                if not task.cancelled():
+                    raise
+            if data is not None:
+                return data
+
+        return await self._get_segment(path)
+
+    def _update(self, playlist: str) -> None:
+        self.playlist = playlist
+        self.media = parse_playlist(playlist)
+        self._sequences = {s.path: s.sequence for s in self.media.segments}
+
+        for path in list(self._segments):
+            if path not in self._sequences:
+                del self._segments[path]
+
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self.media is None or not self.media.segments:
+            return
+
+        segments = self.media.segments
+        if self._position is None:
+            start = max(len(segments) - LIVE_EDGE_SEGMENTS, 0)
+            wanted = segments[start : start + self.ahead]
+        else:
+            wanted = [s for s in segments if s.sequence > self._position]
+            wanted = wanted[: self.ahead]
+
+        for path, task in list(self._tasks.items()):
+            sequence = self._sequences.get(path)
+            if sequence is None or (
+                self._position is not None and sequence < self._position
+            ):
+                task.cancel()
+                del self._tasks[path]
+
+        loop = get_event_loop()
+        for segment in wanted:
+            if segment.path in self._segments or segment.path in self._tasks:
+                continue
+            self._tasks[segment.path] = loop.create_task(self._fetch(segment.path))
+
+    async def _fetch(self, path: str) -> Optional[bytes]:
+        try:
+            async with self._semaphore:
+                with upstream_priority(Priority.PREFETCH):
+                    data = await self._get_segment(path)
+        except CancelledError:
+            raise
+        except Exception as e:  # noqa: BLE001
+            self._log.warning(f"Could not prefetch segment {path}: {e}")
+            return None
+        finally:
+            self._tasks.pop(path, None)
+
+        if data is not None and path in self._sequences:
+            self._segments[path] = data
+        return data
+
+    async def _run(self) -> None:
+        try:
+            while True:
+                target_duration = (
+                    self.media.target_duration
+                    if self.media is not None
+                    else DEFAULT_TARGET_DURATION
+                )
+                await sleep(max(target_duration / 2, 1))
+
+                if monotonic() - self._last_used > self.idle_timeout:
+                    self._log.debug(f"Prefetcher for {self.channel_id} is idle")
+                    break
+
+                try:
+                    with upstream_priority(Priority.PREFETCH):
+                        playlist = await self._sxm.get_playlist(
+                            self.channel_id, quality=self.quality
+                        )
+                except Exception as e:  # noqa: BLE001
+                    self._log.warning(
+                        f"Could not reload playlist for {self.channel_id}: {e}"
+                    )
+                    playlist = None
+
+                if playlist:
+                    self._update(playlist)
+        finally:
+            self._reset()
+
+    def _reset(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+        self._segments.clear()
+        self._sequences = {}
+        self._position = None
+        self.playlist = None
+        self.media = None
@@ -0,0 +1,227 @@
+"""Upstream request scheduling module for sxm
+
+Every request :class:`SXMClientAsync` makes to SXM takes a token from the
+bucket of its endpoint class first: REST API requests and HLS CDN
+requests (playlists and segments) are limited separately. When a bucket
+is empty, waiting requests get tokens by priority, so segment fetches a
+listener is blocked on go before prefetches, which go before background
+metadata polls.
+
+The priority of a request comes from the context it is made in, see
+:func:`upstream_priority`.
+"""
+
+import itertools
+from asyncio import (
+    CancelledError,
+    Future,
+    Task,
+    TimerHandle,
+    current_task,
+    get_event_loop,
+)
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+from time import monotonic
+from typing import Dict, Iterator, List, Optional
+
+__all__ = [
+    "EndpointClass",
+    "Priority",
+    "TokenBucket",
+    "UpstreamScheduler",
+    "upstream_priority",
+]
+
+DEFAULT_REST_RATE = 10.0
+DEFAULT_CDN_RATE = 50.0
+
+
+class EndpointClass(str, Enum):
+    REST = "rest"
+    CDN = "cdn"
+
+
+class Priority(IntEnum):
+    """Lower values get tokens first"""
+
+    LISTENER = 0
+    PREFETCH = 1
+    BACKGROUND = 2
+
+
+_priority: ContextVar[Priority] = ContextVar(
+    "sxm_upstream_priority", default=Priority.LISTENER
+)
+
+
+@contextmanager
+def upstream_priority(priority: Priority) -> Iterator[None]:
+    """Context manager that makes upstream requests in its body (and in
+    tasks created in it) wait with `priority`"""
+
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: Priority
+    order: int
+    future: Future = field(compare=False)
+    task: Optional[Task] = field(compare=False)
+
+
+class TokenBucket:
+    """Token bucket that refills at `rate` tokens per second up to `burst`
+    tokens. Waiters get tokens in priority order, then in arrival order.
+
+    Parameters
+    ----------
+    rate : :class:`float`
+        Tokens added per second
+    burst : Optional[:class:`float`]
+        Max tokens in the bucket. Defaults to `rate`
+    """
+
+    rate: float
+    burst: float
+    waited: int
+
+    _tokens: float
+    _updated: float
+    _waiters: List[_Waiter]
+    _timer: Optional[TimerHandle]
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = max(burst if burst is not None else rate, 1)
+        self.waited = 0
+
+        self._tokens = self.burst
+        self._updated = monotonic()
+        self._waiters = []
+        self._timer = None
+        self._order = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, priority: Priority = Priority.LISTENER) -> None:
+        """Takes a token, waiting for one if the bucket is empty"""
+
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return
+
+        self.waited += 1
+        waiter = _Waiter(
+            priority,
+            next(self._order),
+            get_event_loop().create_future(),
+            current_task(),
+        )
+        self._waiters.append(waiter)
+        self._schedule()
+        try:
+            await waiter.future
+        except CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # granted after the waiting task was cancelled, give it back
+                self._tokens += 1
+                self._grant()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def promote(self, task: Task, priority: Priority) -> None:
+        """Raises the priority of `task`, if it is waiting for a token"""
+
+        for waiter in self._waiters:
+            if waiter.task is task and waiter.priority > priority:
+                waiter.priority = priority
+
+    def _refill(self) -> None:
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _grant(self) -> None:
+        self._timer = None
+        self._refill()
+        while self._waiters and self._tokens >= 1:
+            waiter = min(self._waiters)
+            self._waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            self._tokens -= 1
+            waiter.future.set_result(None)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if not self._waiters or self._timer is not None:
+            return
+
+        delay = max((1 - self._tokens) / self.rate, 0)
+        self._timer = get_event_loop().call_later(delay, self._grant)
+
+
+class UpstreamScheduler:
+    """Client wide rate limits for upstream requests, one
+    :class:`TokenBucket` per :class:`EndpointClass`
+
+    Parameters
+    ----------
+    rest_rate : Optional[:class:`float`]
+        REST API requests per second. `None` turns the limit off
+    cdn_rate : Optional[:class:`float`]
+        HLS playlist and segment requests per second. `None` turns the
+        limit off
+    rest_burst : Optional[:class:`float`]
+        REST API requests allowed at once after being idle. Defaults to
+        twice `rest_rate`
+    cdn_burst : Optional[:class:`float`]
+        HLS requests allowed at once after being idle. Defaults to twice
+        `cdn_rate`
+    """
+
+    buckets: Dict[EndpointClass, TokenBucket]
+
+    def __init__(
+        self,
+        rest_rate: Optional[float] = DEFAULT_REST_RATE,
+        cdn_rate: Optional[float] = DEFAULT_CDN_RATE,
+        rest_burst: Optional[float] = None,
+        cdn_burst: Optional[float] = None,
+    ):
+        self.buckets = {}
+        if rest_rate:
+            self.buckets[EndpointClass.REST] = TokenBucket(
+                rest_rate, rest_burst if rest_burst is not None else rest_rate * 2
+            )
+        if cdn_rate:
+            self.buckets[EndpointClass.CDN] = TokenBucket(
+                cdn_rate, cdn_burst if cdn_burst is not None else cdn_rate * 2
+            )
+
+    async def acquire(self, endpoint: EndpointClass) -> None:
+        """Waits until a request to `endpoint` may be sent, at the priority
+        of the current context"""
+
+        bucket = self.buckets.get(endpoint)
+        if bucket is not None:
+            await bucket.acquire(_priority.get())
+
+    def promote(self, task: Task, priority: Priority = Priority.LISTENER) -> None:
+        """Raises the priority of the requests `task` is waiting to send,
+        e.g. when a listener starts waiting on a prefetch"""
+
+        for bucket in self.buckets.values():
+            bucket.promote(task, priority)
@@ -0,0 +1,310 @@
+"""Continuous per-channel stream module for sxm"""
+
+import abc
+import logging
+import re
+from asyncio import (
+    CancelledError,
+    Queue,
+    QueueEmpty,
+    QueueFull,
+    Task,
+    get_event_loop,
+    sleep,
+)
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, List, Optional, Set
+
+from sxm.client import HLS_AES_KEY, SXMClientAsync
+from sxm.models import QualitySize
+
+try:
+    from cryptography.hazmat.primitives import padding
+    from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+    HAS_CRYPTOGRAPHY = True
+except ImportError:  # pragma: no cover
+    HAS_CRYPTOGRAPHY = False
+
+__all__ = [
+    "Broadcaster",
+    "ChannelStream",
+    "MediaPlaylist",
+    "PlaylistSegment",
+    "parse_playlist",
+]
+
+
+KEY_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+DEFAULT_TARGET_DURATION = 10.0
+
+
+@dataclass
+class PlaylistSegment:
+    sequence: int
+    path: str
+    duration: float
+
+
+@dataclass
+class MediaPlaylist:
+    target_duration: float = DEFAULT_TARGET_DURATION
+    media_sequence: int = 0
+    key_method: Optional[str] = None
+    key_iv: Optional[bytes] = None
+    segments: List[PlaylistSegment] = field(default_factory=list)
+
+    @property
+    def is_encrypted(self) -> bool:
+        return self.key_method is not None and self.key_method != "NONE"
+
+    def segment_iv(self, segment: PlaylistSegment) -> bytes:
+        """Returns the AES IV for a segment; HLS defaults to the media
+        sequence number when the key tag has no explicit IV"""
+
+        if self.key_iv is not None:
+            return self.key_iv
+        return segment.sequence.to_bytes(16, "big")
+
+
+def parse_playlist(playlist: str) -> MediaPlaylist:
+    """Parses a media playlist as returned by
+    :meth:`SXMClientAsync.get_playlist`
+
+    Parameters
+    ----------
+    playlist : :class:`str`
+        m3u8 playlist text
+    """
+
+    media = MediaPlaylist()
+    sequence = 0
+    duration = 0.0
+    for line in playlist.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith("#EXT-X-TARGETDURATION:"):
+            media.target_duration = float(line.split(":", 1)[1])
+        elif line.startswith("#EXT-X-MEDIA-SEQUENCE:"):
+            media.media_sequence = int(line.split(":", 1)[1])
+            sequence = media.media_sequence
+        elif line.startswith("#EXT-X-KEY:"):
+            attrs = dict(KEY_ATTRIBUTE_RE.findall(line.split(":", 1)[1]))
+            media.key_method = attrs.get("METHOD")
+            iv = attrs.get("IV")
+            media.key_iv = bytes.fromhex(iv[2:].zfill(32)) if iv else None
+        elif line.startswith("#EXTINF:"):
+            duration = float(line.split(":", 1)[1].split(",", 1)[0])
+        elif not line.startswith("#"):
+            media.segments.append(PlaylistSegment(sequence, line, duration))
+            sequence += 1
+            duration = 0.0
+
+    return media
+
+
+def decrypt_segment(media: MediaPlaylist, segment: PlaylistSegment, data: bytes):
+    """Decrypts an AES-128 HLS segment with :data:`HLS_AES_KEY`"""
+
+    if not media.is_encrypted:
+        return data
+
+    if not HAS_CRYPTOGRAPHY:
+        raise RuntimeError("`cryptography` is required to decrypt HLS segments")
+
+    decryptor = Cipher(
+        algorithms.AES(HLS_AES_KEY), modes.CBC(media.segment_iv(segment))
+    ).decryptor()
+    unpadder = padding.PKCS7(128).unpadder()
+    data = decryptor.update(data) + decryptor.finalize()
+    return unpadder.update(data) + unpadder.finalize()
+
+
+class Broadcaster(abc.ABC):
+    """Fans items produced by a single background task out to any number
+    of listeners.
+
+    Every listener gets its own bounded queue. If a listener falls behind
+    and its queue is full, its oldest item is dropped so a slow consumer
+    never blocks the producer or any other listener. The producer task,
+    :meth:`_run` of a subclass, is started with the first listener and
+    cancelled with the last one.
+
+    Parameters
+    ----------
+    queue_size : :class:`int`
+        Number of items buffered per listener before dropping
+    burst : :class:`int`
+        Number of recent items sent to a listener as soon as it connects,
+        at most `queue_size`
+    """
+
+    dropped: int
+    queue_size: int
+
+    _listeners: Set[Queue]
+    _recent: Deque[Any]
+    _task: Optional[Task]
+
+    def __init__(self, queue_size: int = 4, burst: int = 2):
+        self._log = logging.getLogger(__file__)
+
+        self.queue_size = queue_size
+        self.dropped = 0
+
+        self._listeners = set()
+        self._recent = deque(maxlen=burst)
+        self._task = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def listener_count(self) -> int:
+        return len(self._listeners)
+
+    def subscribe(self) -> Queue:
+        """Adds a listener and starts the producer if needed. Returns the
+        listener's queue; `None` is put on it when the producer stops."""
+
+        queue: Queue = Queue(maxsize=self.queue_size)
+        recent = list(self._recent)
+        # only replay as much of the burst as fits in the queue
+        if self.queue_size > 0:
+            recent = recent[-self.queue_size :]
+        for item in recent:
+            queue.put_nowait(item)
+        self._listeners.add(queue)
+
+        if not self.is_running:
+            self._task = get_event_loop().create_task(self._produce())
+        return queue
+
+    def unsubscribe(self, queue: Queue) -> None:
+        """Removes a listener and stops the producer if it was the last one"""
+
+        self._listeners.discard(queue)
+        if not self._listeners and self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self._recent.clear()
+
+    def stop(self) -> None:
+        """Stops the producer and ends every listener's queue with `None`"""
+
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._publish(None, remember=False)
+        self._listeners.clear()
+        self._recent.clear()
+
+    def _publish(self, item: Any, remember: bool = True) -> None:
+        if remember and item is not None:
+            self._recent.append(item)
+
+        for queue in self._listeners:
+            try:
+                queue.put_nowait(item)
+            except QueueFull:
+                self.dropped += 1
+                try:
+                    queue.get_nowait()
+                except QueueEmpty:  # pragma: no cover
+                    pass
+                queue.put_nowait(item)
+
+    async def _produce(self) -> None:
+        try:
+            await self._run()
+        except CancelledError:
+            raise
+        except Exception as e:  # noqa: BLE001
+            self._log.exception(f"{type(self).__name__} stopped: {e}")
+        finally:
+            self._publish(None)
+
+    @abc.abstractmethod
+    async def _run(self) -> None:
+        """Produces items with :meth:`_publish` while there are listeners"""
+
+
+class ChannelStream(Broadcaster):
+    """Shared segment pipeline for a single channel that is fanned out to
+    any number of listeners through a :class:`Broadcaster`.
+
+    Parameters
+    ----------
+    sxm : :class:`SXMClientAsync`
+        SXM client to use
+    channel_id : :class:`str`
+        ID of SXM channel to stream
+    get_segment : Optional[Callable[[:class:`str`], Awaitable[Optional[bytes]]]]
+        Coroutine used to fetch segments. Defaults to
+        :meth:`SXMClientAsync.get_segment`
+    queue_size : :class:`int`
+        Number of segments buffered per listener before dropping
+    burst : :class:`int`
+        Number of recent segments sent to a listener as soon as it connects
+    quality : Optional[:class:`QualitySize`]
+        Stream quality to use. Defaults to the client's `stream_quality`
+    """
+
+    channel_id: str
+    quality: Optional[QualitySize]
+
+    def __init__(
+        self,
+        sxm: SXMClientAsync,
+        channel_id: str,
+        get_segment: Optional[Callable[[str], Awaitable[Optional[bytes]]]] = None,
+        queue_size: int = 4,
+        burst: int = 2,
+        quality: Optional[QualitySize] = None,
+    ):
+        super().__init__(queue_size=queue_size, burst=burst)
+        self._sxm = sxm
+        self._get_segment = get_segment or sxm.get_segment
+
+        self.channel_id = channel_id
+        self.quality = quality
+
+    async def _run(self) -> None:
+        last_sequence: Optional[int] = None
+        while self._listeners:
+            try:
+                playlist = await self._sxm.get_playlist(
+                    self.channel_id, quality=self.quality
+                )
+            except Exception as e:  # noqa: BLE001
+                self._log.error(f"Error getting playlist for stream: {e}")
+                playlist = None
+
+            if playlist is None:
+                await sleep(1)
+                continue
+
+            media = parse_playlist(playlist)
+            segments = media.segments
+            if last_sequence is None:
+                segments = segments[-(self._recent.maxlen or 1) :]
+            else:
+                segments = [s for s in segments if s.sequence > last_sequence]
+
+            for segment in segments:
+                try:
+                    data = await self._get_segment(segment.path)
+                except Exception as e:  # noqa: BLE001
+                    self._log.warning(f"Dropping segment {segment.path}: {e}")
+                    data = None
+                last_sequence = segment.sequence
+                if data is None:
+                    continue
+
+                self._publish(decrypt_segment(media, segment, data))
+
+            await sleep(max(media.target_duration / 2, 1))
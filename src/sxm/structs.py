@@ -0,0 +1,154 @@
+"""Decode-only struct variants of the channel list models for sxm
+
+These mirror the attribute names of the :mod:`sxm.models` classes, but are
+slotted dataclasses built straight from raw SXM dicts without any runtime
+validation. They are a lot cheaper to create and smaller in memory than the
+pydantic models, and can be converted to them with `to_model` when the
+extra validation or fields are needed.
+
+Live channel data does not need them: playlist URL refreshes read the raw
+`hlsAudioInfos` (see :func:`sxm.models.build_hls_variant_table`) and now
+playing reads the raw cut markers (see
+:func:`sxm.models.extract_now_playing`).
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
+
+from sxm.models import XMChannel
+
+__all__ = [
+    "AnyChannel",
+    "XMImageStruct",
+    "XMCategoryStruct",
+    "XMChannelStruct",
+]
+
+
+@dataclass(slots=True)
+class XMImageStruct:
+    url: str
+    name: Optional[str] = None
+    platform: Optional[str] = None
+    height: Optional[int] = None
+    width: Optional[int] = None
+    size: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> XMImageStruct:
+        return cls(
+            data["url"],
+            data.get("name"),
+            data.get("platform"),
+            data.get("height"),
+            data.get("width"),
+            data.get("size"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "name": self.name,
+            "platform": self.platform,
+            "height": self.height,
+            "width": self.width,
+            "size": self.size,
+        }
+
+
+@dataclass(slots=True)
+class XMCategoryStruct:
+    guid: str
+    name: str
+    key: Optional[str] = None
+    order: Optional[int] = None
+    short_name: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> XMCategoryStruct:
+        return cls(
+            data["categoryGuid"],
+            data["name"],
+            data.get("key"),
+            data.get("order"),
+            data.get("shortName"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "categoryGuid": self.guid,
+            "name": self.name,
+            "key": self.key,
+            "order": self.order,
+            "shortName": self.short_name,
+        }
+
+
+@dataclass(slots=True)
+class XMChannelStruct:
+    """Struct variant of :class:`XMChannel`"""
+
+    guid: str
+    id: str  # noqa A003
+    name: str
+    streaming_name: str
+    sort_order: int
+    short_description: str
+    medium_description: str
+    url: str
+    is_available: bool
+    is_favorite: bool
+    is_mature: bool
+    channel_number: int
+    images: List[XMImageStruct]
+    categories: List[XMCategoryStruct]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> XMChannelStruct:
+        return cls(
+            data["channelGuid"],
+            data["channelId"],
+            data["name"],
+            data["streamingName"],
+            int(data["sortOrder"]),
+            data["shortDescription"],
+            data["mediumDescription"],
+            data["url"],
+            bool(data["isAvailable"]),
+            bool(data["isFavorite"]),
+            bool(data["isMature"]),
+            int(data["siriusChannelNumber"]),
+            [XMImageStruct.from_dict(i) for i in data["images"]["images"]],
+            [XMCategoryStruct.from_dict(c) for c in data["categories"]["categories"]],
+        )
+
+    @property
+    def pretty_name(self) -> str:
+        """Returns a formated version of channel number + channel name"""
+        return f"#{self.channel_number} {self.name}"
+
+    def to_model(self) -> XMChannel:
+        return XMChannel.model_validate(
+            {
+                "channelGuid": self.guid,
+                "channelId": self.id,
+                "name": self.name,
+                "streamingName": self.streaming_name,
+                "sortOrder": self.sort_order,
+                "shortDescription": self.short_description,
+                "mediumDescription": self.medium_description,
+                "url": self.url,
+                "isAvailable": self.is_available,
+                "isFavorite": self.is_favorite,
+                "isMature": self.is_mature,
+                "siriusChannelNumber": self.channel_number,
+                "images": {"images": [i.to_dict() for i in self.images]},
+                "categories": {"categories": [c.to_dict() for c in self.categories]},
+            }
+        )
+
+
+# channel list entries, depending on `fast_models`
+AnyChannel = Union[XMChannel, XMChannelStruct]
@@ -0,0 +1,180 @@
+"""Optional request tracing for sxm
+
+A :class:`Tracer` passed to :class:`SXMClientAsync` times spans around
+upstream requests, playlist URL resolution, segment fetches and retry
+loops. Finished spans are passed to a callback and can be mirrored to an
+OpenTelemetry tracer. Spans over a threshold are logged with the time
+spent in each nested span. Without a tracer, a traced method costs one
+attribute check.
+"""
+
+import functools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import monotonic
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+__all__ = ["Span", "Tracer", "trace_retry", "traced"]
+
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar(
+    "sxm_current_span", default=None
+)
+
+
+@dataclass
+class Span:
+    """A timed operation. `phases` has the total duration of each kind of
+    nested span and `events` has retries and other point in time events"""
+
+    name: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    start: float = field(default_factory=monotonic)
+    duration: float = 0.0
+    phases: Dict[str, float] = field(default_factory=dict)
+    events: List[Tuple[str, Dict[str, Any]]] = field(default_factory=list)
+    error: Optional[BaseException] = None
+    parent: Optional["Span"] = field(default=None, repr=False)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        self.events.append((name, attributes or {}))
+
+
+class Tracer:
+    """Collects spans for :class:`SXMClientAsync`
+
+    Parameters
+    ----------
+    on_span : Optional[Callable[[:class:`Span`], `None`]]
+        Called with every finished span
+    slow_threshold : Optional[:class:`float`]
+        Spans that take at least this many seconds are logged as warnings
+        with their phase timings. `None` turns slow logging off
+    otel_tracer : Optional[Any]
+        OpenTelemetry tracer (anything with `start_as_current_span`) to
+        mirror spans to
+    """
+
+    def __init__(
+        self,
+        on_span: Optional[Callable[[Span], None]] = None,
+        slow_threshold: Optional[float] = None,
+        otel_tracer: Optional[Any] = None,
+    ):
+        self._log = logging.getLogger(__file__)
+
+        self.on_span = on_span
+        self.slow_threshold = slow_threshold
+        self.otel_tracer = otel_tracer
+
+    @property
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Context manager that times a span nested in the current one"""
+
+        parent = _current_span.get()
+        span = Span(name, attributes, parent=parent)
+        token = _current_span.set(span)
+
+        otel_context = None
+        if self.otel_tracer is not None:
+            otel_context = self.otel_tracer.start_as_current_span(
+                name, attributes=attributes
+            )
+            otel_context.__enter__()
+
+        try:
+            yield span
+        except BaseException as e:
+            span.error = e
+            raise
+        finally:
+            span.duration = monotonic() - span.start
+            _current_span.reset(token)
+
+            if otel_context is not None:
+                error = span.error
+                otel_context.__exit__(
+                    None if error is None else type(error),
+                    error,
+                    None if error is None else error.__traceback__,
+                )
+            if parent is not None:
+                parent.phases[name] = parent.phases.get(name, 0.0) + span.duration
+            self._finish(span)
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        """Adds an event to the current span, if there is one"""
+
+        span = _current_span.get()
+        if span is not None:
+            span.add_event(name, attributes)
+
+    def _finish(self, span: Span) -> None:
+        if self.slow_threshold is not None and span.duration >= self.slow_threshold:
+            phases = ", ".join(
+                f"{name}={duration * 1000:.1f}ms"
+                for name, duration in span.phases.items()
+            )
+            self._log.warning(
+                f"Slow {span.name} took {span.duration * 1000:.1f}ms "
+                f"{span.attributes} ({phases or 'no phases'}, "
+                f"{len(span.events)} events)"
+            )
+
+        if self.on_span is not None:
+            try:
+                self.on_span(span)
+            except Exception as e:  # noqa: BLE001
+                self._log.error(f"Error in span callback: {e}")
+
+
+def traced(name: str, *arg_names: str):
+    """Decorator for async :class:`SXMClientAsync` methods that wraps each
+    call in a span when the client has a tracer. The first positional
+    arguments are recorded as span attributes named by `arg_names`."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            tracer = self.tracer
+            if tracer is None:
+                return await func(self, *args, **kwargs)
+
+            attributes = dict(zip(arg_names, args))
+            for arg_name in arg_names[len(args) :]:
+                if arg_name in kwargs:
+                    attributes[arg_name] = kwargs[arg_name]
+            with tracer.span(name, **attributes):
+                return await func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def trace_retry(retry_state) -> None:
+    """`tenacity` `before_sleep` hook that adds a `retry` event to the
+    current span of the client being retried"""
+
+    client = retry_state.args[0] if retry_state.args else None
+    tracer = getattr(client, "tracer", None)
+    if tracer is None:
+        return
+
+    outcome = retry_state.outcome
+    error = outcome.exception() if outcome is not None else None
+    tracer.add_event(
+        "retry",
+        function=retry_state.fn.__name__,
+        attempt=retry_state.attempt_number,
+        error=None if error is None else repr(error),
+    )
@@ -0,0 +1,137 @@
+import asyncio
+from io import BytesIO
+
+import httpx
+import pytest
+
+from sxm.art import ArtProxy, art_path, art_url, is_art_host, resize_image
+from sxm.cache import SegmentCache
+
+ART_URL = "https://siriusxm-priprodart.akamaized.net/albumart/v4/1234.jpg"
+
+
+def make_session(requests, status_code=200):
+    async def handler(request):
+        requests.append(str(request.url))
+        await asyncio.sleep(0.01)
+        return httpx.Response(status_code, content=b"image")
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_art_hosts_and_paths():
+    assert is_art_host("pri.art.prod.streaming.siriusxm.com")
+    assert is_art_host("siriusxm-priprodart.akamaized.net")
+    assert not is_art_host("example.com")
+    assert not is_art_host("evil.akamaized.net")
+    # only image hosts, not the API on the same domain
+    assert not is_art_host("player.siriusxm.com")
+    assert not is_art_host("siriusxm-priprodlive.akamaized.net")
+
+    assert art_path(ART_URL, "small") == (
+        "/art/https/siriusxm-priprodart.akamaized.net/albumart/v4/1234.jpg"
+        "?size=small"
+    )
+    assert art_path("https://example.com/1234.jpg") is None
+
+    # URL syntax in the host must not change where the request goes
+    assert not is_art_host("evil.example?.siriusxm.com")
+    assert not is_art_host("evil.example#.siriusxm.com")
+    assert not is_art_host("user@x.siriusxm.com")
+    assert art_url("https", "evil.example?.siriusxm.com", "a.jpg") is None
+    assert art_url("https", "evil.example#.siriusxm.com", "a.jpg") is None
+    assert (
+        art_url("https", "pri.art.prod.streaming.siriusxm.com", "a?b#c.jpg")
+        == "https://pri.art.prod.streaming.siriusxm.com/a%3Fb%23c.jpg"
+    )
+
+
+def test_concurrent_requests_share_one_fetch(tmp_path):
+    requests = []
+
+    async def run():
+        cache = SegmentCache(tmp_path, memory_items=0, suffix=".img")
+        art = ArtProxy(cache=cache, session=make_session(requests))
+
+        images = await asyncio.gather(*(art.get(ART_URL) for _ in range(10)))
+        assert images == [b"image"] * 10
+        await cache.close()
+
+        # later requests are served from disk
+        assert await art.get(ART_URL) == b"image"
+        await art.close()
+
+    asyncio.run(run())
+    assert requests == [ART_URL]
+    assert len(list(tmp_path.glob("*.img"))) == 1
+
+
+def test_failed_fetch_is_not_cached():
+    requests = []
+
+    async def run():
+        art = ArtProxy(session=make_session(requests, status_code=404))
+        assert await art.get(ART_URL) is None
+        assert await art.get(ART_URL) is None
+
+    asyncio.run(run())
+    assert len(requests) == 2
+
+
+def test_redirects_are_not_followed():
+    requests = []
+
+    async def handler(request):
+        requests.append(str(request.url))
+        return httpx.Response(302, headers={"Location": "http://127.0.0.1/secret"})
+
+    async def run():
+        session = httpx.AsyncClient(
+            transport=httpx.MockTransport(handler), follow_redirects=True
+        )
+        art = ArtProxy(session=session)
+        assert await art.get(ART_URL) is None
+        assert await art.get("http://127.0.0.1/secret") is None
+        await session.aclose()
+
+    asyncio.run(run())
+    assert requests == [ART_URL]
+
+
+def test_large_images_are_not_fetched():
+    async def chunks():
+        for _ in range(2):
+            yield b"x" * 6
+
+    async def handler(request):
+        if request.url.path.endswith("/streamed.jpg"):
+            # no Content-Length, so the size is only known while reading
+            return httpx.Response(200, content=chunks())
+        return httpx.Response(200, content=b"x" * 12)
+
+    async def run():
+        session = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        art = ArtProxy(session=session, max_size=10)
+        assert await art.get(ART_URL) is None
+        assert await art.get(ART_URL.replace("1234", "streamed")) is None
+
+        art.max_size = 12
+        assert await art.get(ART_URL) == b"x" * 12
+        await session.aclose()
+
+    asyncio.run(run())
+
+
+def test_resize_image():
+    image_module = pytest.importorskip("PIL.Image")
+
+    output = BytesIO()
+    image_module.new("RGB", (1000, 500)).save(output, format="JPEG")
+
+    resized = resize_image(output.getvalue(), 300)
+    with image_module.open(BytesIO(resized)) as image:
+        assert image.size == (300, 150)
+        assert image.format == "JPEG"
+
+    small = resize_image(resized, 600)
+    assert small == resized
@@ -0,0 +1,42 @@
+import asyncio
+
+from sxm.cache import SegmentCache
+
+
+def test_segment_cache_tiers(tmp_path):
+    async def run():
+        cache = SegmentCache(tmp_path, max_bytes=250, memory_items=1)
+        cache.put("AAC_Data/octane/octane_1.aac", b"1" * 100)
+        cache.put("AAC_Data/octane/octane_2.aac", b"2" * 100)
+        await cache.close()
+
+        # only the latest segment is kept in memory
+        assert cache.get("AAC_Data/octane/octane_1.aac") is None
+        assert cache.get("AAC_Data/octane/octane_2.aac") == b"2" * 100
+
+        file_path = cache.get_file("AAC_Data/octane/octane_1.aac")
+        assert file_path.read_bytes() == b"1" * 100
+        assert cache.size == 200
+
+        # over max_bytes, least recently used files are evicted
+        cache.put("AAC_Data/octane/octane_3.aac", b"3" * 100)
+        await cache.close()
+        assert cache.get_file("AAC_Data/octane/octane_2.aac") is None
+        assert cache.get_file("AAC_Data/octane/octane_1.aac") is not None
+        assert cache.size == 200
+        assert len(list(tmp_path.glob("*.aac"))) == 2
+
+    asyncio.run(run())
+
+
+def test_segment_cache_reuses_files(tmp_path):
+    async def run():
+        cache = SegmentCache(tmp_path)
+        cache.put("AAC_Data/octane/octane_1.aac", b"1" * 100)
+        await cache.close()
+
+    asyncio.run(run())
+
+    cache = SegmentCache(tmp_path)
+    assert cache.size == 100
+    assert cache.get_file("AAC_Data/octane/octane_1.aac") is not None
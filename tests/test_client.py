@@ -0,0 +1,184 @@
+import asyncio
+import copy
+from unittest.mock import MagicMock
+
+from sxm import SXMClientAsync
+from sxm.models import QualitySize
+
+
+def _channel(channel_id):
+    channel = MagicMock()
+    channel.id = channel_id
+    channel.guid = f"{channel_id}-guid"
+    return channel
+
+
+def test_get_now_playing_many(xm_live_channel_response):
+    sxm = SXMClientAsync("user", "password", user_agent="test")
+    in_flight = 0
+    max_in_flight = 0
+
+    async def _ensure_authenticated():
+        return True
+
+    async def _get(path, params, authenticate=True, **kwargs):
+        nonlocal in_flight, max_in_flight
+        assert not authenticate
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"channelId": params["channelId"]}
+
+    sxm._ensure_authenticated = _ensure_authenticated
+    sxm._get = _get
+
+    async def run():
+        channels = [_channel(f"channel{i}") for i in range(10)]
+        results = [r async for r in sxm.get_now_playing_many(channels, concurrency=3)]
+        await sxm.close_session()
+        return results
+
+    results = asyncio.run(run())
+
+    assert len(results) == 10
+    assert all(data["channelId"] == channel.id for channel, data in results)
+    assert max_in_flight == 3
+
+
+def test_warm_up_resolves_playlist_urls():
+    sxm = SXMClientAsync("user", "password", user_agent="test")
+    channels = [_channel(f"channel{i}") for i in range(4)]
+    sxm._urls = {"Live_Primary_HLS": "https://example.com"}
+    sxm._channels = channels
+    sxm._channel_index = {c.id: c for c in channels}
+    sxm._favorite_channels = channels[:2]
+    resolved = []
+
+    async def _get_playlist_url(channel_id, quality=None):
+        resolved.append(channel_id)
+        return None if channel_id == "channel3" else f"{channel_id}.m3u8"
+
+    sxm._get_playlist_url = _get_playlist_url
+
+    async def run():
+        favorites = await sxm.warm_up()
+        requested = await sxm.warm_up(["channel2", "channel3", "missing"])
+        await sxm.close_session()
+        return favorites, requested
+
+    assert asyncio.run(run()) == (2, 1)
+    assert resolved == ["channel0", "channel1", "channel2", "channel3"]
+
+
+def test_segment_url_rebuilt_on_root_or_token_change():
+    sxm = SXMClientAsync("user", "password", user_agent="test")
+    sxm._urls = {
+        "Live_Primary_HLS": "https://primary.example.com/hls",
+        "Live_Secondary_HLS": "https://secondary.example.com/hls/",
+    }
+    urls = []
+
+    async def get(url):
+        urls.append(url)
+        response = MagicMock()
+        response.is_error = False
+        response.content = b"data"
+        return response
+
+    async def run():
+        await sxm.close_session()
+        sxm._session = MagicMock()
+        sxm._session.get = get
+        sxm._session.cookies = {"SXMAKTOKEN": "t=abc,x"}
+
+        await sxm.get_segment("AAC_Data/octane/octane_1.aac")
+        await sxm.get_segment("/AAC_Data/octane/octane_2.aac")
+        sxm._session.cookies = {"SXMAKTOKEN": "t=a+b/c,x"}
+        sxm.set_primary(False)
+        await sxm.get_segment("AAC_Data/octane/octane_3.aac")
+
+    asyncio.run(run())
+
+    assert urls == [
+        "https://primary.example.com/hls/AAC_Data/octane/octane_1.aac"
+        "?token=abc&consumer=k2&gupId=",
+        "https://primary.example.com/hls/AAC_Data/octane/octane_2.aac"
+        "?token=abc&consumer=k2&gupId=",
+        "https://secondary.example.com/hls/AAC_Data/octane/octane_3.aac"
+        "?token=a%2Bb%2Fc&consumer=k2&gupId=",
+    ]
+
+
+def test_get_live_channel_merges_into_one_object(xm_live_channel_response):
+    sxm = SXMClientAsync("user", "password", user_agent="test")
+    module = xm_live_channel_response["moduleList"]["modules"][0]
+    markers = module["moduleResponse"]["liveChannelData"]["markerLists"]
+    cut_list = next(m for m in markers if m["layer"] == "cut")
+    responses = []
+
+    async def get_now_playing(channel):
+        return responses.pop(0)
+
+    sxm.get_now_playing = get_now_playing
+
+    def response(cuts):
+        data = copy.deepcopy(xm_live_channel_response)
+        live_channel_data = data["moduleList"]["modules"][0]["moduleResponse"][
+            "liveChannelData"
+        ]
+        for marker_list in live_channel_data["markerLists"]:
+            if marker_list["layer"] == "cut":
+                marker_list["markers"] = cuts
+        return data
+
+    async def run():
+        cuts = cut_list["markers"]
+        responses.extend([response(cuts[:5]), response(cuts)])
+        channel = _channel("octane")
+
+        first = await sxm.get_live_channel(channel, retention=None)
+        assert len(first.cut_markers) == 5
+
+        # the second response repeats the first 5 markers
+        second = await sxm.get_live_channel(channel, retention=None)
+        assert second is first
+        assert len(second.cut_markers) == len(
+            {(m.guid, m.time) for m in second.cut_markers}
+        )
+        assert len(second.cut_markers) == 9
+
+        await sxm.close_session()
+
+    asyncio.run(run())
+
+
+def test_get_stream_qualities(xm_live_channel_response):
+    sxm = SXMClientAsync("user", "password", user_agent="test")
+    live_channel_data = xm_live_channel_response["moduleList"]["modules"][0][
+        "moduleResponse"
+    ]["liveChannelData"]
+    live_channel_data["hlsAudioInfos"] = [
+        h for h in live_channel_data["hlsAudioInfos"] if h["size"] != "MEDIUM"
+    ]
+    requests = []
+
+    async def get_now_playing(channel):
+        requests.append(channel.id)
+        return xm_live_channel_response
+
+    sxm.get_now_playing = get_now_playing
+
+    async def run():
+        qualities = await sxm.get_stream_qualities(_channel("octane"))
+        assert qualities == [QualitySize.SMALL_64k, QualitySize.LARGE_256k]
+
+        # a cached variant table answers without a request
+        sxm._hls_tables["octane"] = (("p", "s", (("primary", "SMALL", "u"),)), {})
+        qualities = await sxm.get_stream_qualities(_channel("octane"))
+        assert qualities == [QualitySize.SMALL_64k]
+
+        await sxm.close_session()
+
+    asyncio.run(run())
+    assert requests == ["octane"]
@@ -0,0 +1,41 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from sxm.events import NowPlayingPoller
+
+
+def test_now_playing_poller_changes(xm_live_channel_response):
+    channel = MagicMock()
+    channel.id = "octane"
+    poller = NowPlayingPoller(MagicMock(), channel)
+
+    changes = dict(poller._changes(xm_live_channel_response))
+
+    assert changes["cut"]["channel_id"] == "octane"
+    assert changes["cut"]["title"]
+    assert changes["episode"]["title"] == "Octane with Jose Mangin"
+    # same response again is not a change
+    assert poller._changes(xm_live_channel_response) == []
+
+
+def test_now_playing_poller_interval_has_a_floor(xm_live_channel_response):
+    xm_live_channel_response["moduleList"]["modules"][0]["updateFrequency"] = 0
+    channel = MagicMock()
+    channel.id = "octane"
+    sxm = MagicMock()
+    polls = []
+
+    async def get_now_playing(channel):
+        polls.append(channel.id)
+        return xm_live_channel_response
+
+    sxm.get_now_playing = get_now_playing
+
+    async def run():
+        poller = NowPlayingPoller(sxm, channel)
+        queue = poller.subscribe()
+        await asyncio.sleep(0.1)
+        poller.unsubscribe(queue)
+
+    asyncio.run(run())
+    assert polls == ["octane"]
@@ -0,0 +1,434 @@
+import asyncio
+import json
+from unittest.mock import MagicMock
+
+import aiohttp
+import httpx
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import make_mocked_request
+
+import sxm.http as http_module
+from sxm.art import ArtProxy
+from sxm.cache import SegmentCache
+from sxm.client import AuthenticationError
+from sxm.http import (
+    PROXY_KEY,
+    SXMProxy,
+    make_http_app,
+    make_http_handler,
+    playlist_max_age,
+    serve,
+)
+from sxm.models import QualitySize
+
+PLAYLIST = """#EXTM3U
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:100
+#EXTINF:10,
+AAC_Data/octane/octane_100.aac"""
+
+
+def make_sxm():
+    sxm = MagicMock()
+    sxm.stream_quality = QualitySize.LARGE_256k
+    sxm.session_generation = 1
+    sxm.segments = []
+    sxm.channel_requests = 0
+
+    async def get_playlist(channel_id, quality=None):
+        return PLAYLIST
+
+    async def get_segment(path):
+        sxm.segments.append(path)
+        return b"segment"
+
+    async def get_channels():
+        sxm.channel_requests += 1
+        return [{"channelId": f"channel{i}", "name": "x" * 50} for i in range(50)]
+
+    async def get_channel(name):
+        if name.lower() != "octane":
+            return None
+        channel = MagicMock()
+        channel.id = "octane"
+        channel.name = "Octane"
+        return channel
+
+    async def get_stream_qualities(channel):
+        return [QualitySize.SMALL_64k, QualitySize.LARGE_256k]
+
+    sxm.get_playlist = get_playlist
+    sxm.get_segment = get_segment
+    sxm.get_channels = get_channels
+    sxm.get_channel = get_channel
+    sxm.get_stream_qualities = get_stream_qualities
+    return sxm
+
+
+def run_with_handler(sxm, func):
+    handler = make_http_handler(sxm, precache=False)
+
+    async def get(path, headers=None):
+        return await handler(make_mocked_request("GET", path, headers=headers))
+
+    asyncio.run(func(get))
+
+
+def test_playlist_etag_and_max_age():
+    async def check(get):
+        response = await get("/octane.m3u8")
+        assert response.status == 200
+        assert response.headers["Cache-Control"] == "max-age=5"
+        etag = response.headers["ETag"]
+
+        response = await get("/octane.m3u8", headers={"If-None-Match": etag})
+        assert response.status == 304
+        assert response.headers["ETag"] == etag
+
+    run_with_handler(make_sxm(), check)
+
+
+def test_segment_not_modified_skips_fetch():
+    sxm = make_sxm()
+
+    async def check(get):
+        response = await get("/AAC_Data/octane/octane_100.aac")
+        assert response.status == 200
+        assert "immutable" in response.headers["Cache-Control"]
+        etag = response.headers["ETag"]
+
+        response = await get(
+            "/AAC_Data/octane/octane_100.aac",
+            headers={"If-None-Match": f'W/"other", {etag}'},
+        )
+        assert response.status == 304
+
+    run_with_handler(sxm, check)
+    assert sxm.segments == ["AAC_Data/octane/octane_100.aac"]
+
+
+def test_channels_are_fetched_once():
+    sxm = make_sxm()
+
+    async def check(get):
+        responses = await asyncio.gather(*(get("/channels/") for _ in range(5)))
+        assert all(r.status == 200 for r in responses)
+        etag = responses[0].headers["ETag"]
+
+        response = await get("/channels/", headers={"If-None-Match": etag})
+        assert response.status == 304
+
+    run_with_handler(sxm, check)
+    assert sxm.channel_requests == 1
+
+
+def test_master_playlist_lists_channel_variants():
+    async def check(get):
+        response = await get("/master/octane.m3u8")
+        assert response.status == 200
+        assert response.text.splitlines()[1::2] == [
+            '#EXT-X-STREAM-INF:BANDWIDTH=64000,CODECS="mp4a.40.2"',
+            '#EXT-X-STREAM-INF:BANDWIDTH=256000,CODECS="mp4a.40.2"',
+        ]
+        assert response.text.splitlines()[2::2] == [
+            "/octane.m3u8?quality=SMALL",
+            "/octane.m3u8?quality=LARGE",
+        ]
+
+        response = await get("/master/missing.m3u8")
+        assert response.status == 404
+
+    run_with_handler(make_sxm(), check)
+
+
+def test_master_playlist_bodies_are_keyed_by_channel():
+    proxy = SXMProxy(make_sxm(), precache=False)
+
+    async def run():
+        for channel_id in ("octane", "OCTANE", "missing1", "missing2"):
+            await proxy.handle(make_mocked_request("GET", f"/master/{channel_id}.m3u8"))
+
+    asyncio.run(run())
+    assert list(proxy._bodies._entries) == [("master", "octane")]
+
+
+def test_playlist_max_age():
+    assert playlist_max_age(PLAYLIST) == 5
+    assert playlist_max_age("#EXTM3U\n#EXT-X-TARGETDURATION:1") == 1
+    assert playlist_max_age("#EXTM3U") == 5
+
+
+def test_segment_served_from_disk_cache(tmp_path):
+    sxm = make_sxm()
+    cache = SegmentCache(tmp_path, memory_items=0)
+    handler = make_http_handler(sxm, precache=False, segment_cache=cache)
+
+    async def run():
+        path = "/AAC_Data/octane/octane_100.aac"
+        response = await handler(make_mocked_request("GET", path))
+        assert response.body == b"segment"
+        await cache.close()
+
+        response = await handler(make_mocked_request("GET", path))
+        assert isinstance(response, web.FileResponse)
+
+    asyncio.run(run())
+    assert sxm.segments == ["AAC_Data/octane/octane_100.aac"]
+
+
+def test_art_served_from_cache(tmp_path):
+    requests = []
+
+    async def upstream(request):
+        requests.append(str(request.url))
+        return httpx.Response(200, content=b"image")
+
+    async def run():
+        cache = SegmentCache(tmp_path, memory_items=0, suffix=".img")
+        proxy = SXMProxy(make_sxm(), precache=False)
+        proxy.art = ArtProxy(
+            cache=cache,
+            session=httpx.AsyncClient(transport=httpx.MockTransport(upstream)),
+        )
+
+        path = "/art/https/siriusxm-priprodart.akamaized.net/albumart/1234.jpg"
+        response = await proxy.handle(make_mocked_request("GET", path))
+        assert response.status == 200
+        assert response.body == b"image"
+        assert response.headers["Content-Type"] == "image/jpeg"
+        await cache.close()
+
+        response = await proxy.handle(make_mocked_request("GET", path))
+        assert isinstance(response, web.FileResponse)
+
+        response = await proxy.handle(make_mocked_request("GET", f"{path}?size=huge"))
+        assert response.status == 400
+
+        for path in (
+            "/art/https/example.com/1234.jpg",
+            "/art/https/evil.example%3F.siriusxm.com/a.jpg",
+            "/art/https/evil.example%23.siriusxm.com/a.jpg",
+            "/art/https/127.0.0.1%3F.siriusxm.com/a.jpg",
+        ):
+            response = await proxy.handle(make_mocked_request("GET", path))
+            assert response.status == 404
+        await proxy.art.close()
+
+    asyncio.run(run())
+    assert requests == ["https://siriusxm-priprodart.akamaized.net/albumart/1234.jpg"]
+
+
+def run_with_app(app, func, tmp_path):
+    socket_path = str(tmp_path / "proxy.sock")
+
+    async def run():
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.UnixSite(runner, socket_path).start()
+        try:
+            connector = aiohttp.UnixConnector(path=socket_path)
+            async with aiohttp.ClientSession(
+                "http://proxy", connector=connector, auto_decompress=False
+            ) as http:
+                await func(http)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_app_routes_and_metrics(tmp_path):
+    sxm = make_sxm()
+    app = make_http_app(sxm, precache=False)
+
+    async def check(http):
+        async with http.get("/octane.m3u8") as response:
+            assert response.status == 200
+            assert response.headers["Server-Timing"].startswith("app;dur=")
+        async with http.get("/AAC_Data/octane/octane_100.aac") as response:
+            assert await response.read() == b"segment"
+        async with http.get("/key/1") as response:
+            assert response.status == 200
+        async with http.get("/missing") as response:
+            assert response.status == 404
+
+        async with http.get("/metrics") as response:
+            metrics = await response.json()
+
+        assert {r: m["requests"] for r, m in metrics.items()} == {
+            "playlist": 1,
+            "segment": 1,
+            "key": 1,
+            "unmatched": 1,
+        }
+
+    run_with_app(app, check, tmp_path)
+    sxm.start_session_renewal.assert_called_once()
+    sxm.stop_session_renewal.assert_called_once()
+
+
+def test_app_compresses_large_json(tmp_path):
+    app = make_http_app(make_sxm(), renew_session=False)
+
+    async def check(http):
+        headers = {"Accept-Encoding": "gzip"}
+        async with http.get("/channels/", headers=headers) as response:
+            assert response.status == 200
+            assert response.headers["Content-Encoding"] == "gzip"
+            assert response.headers["Vary"] == "Accept-Encoding"
+
+        skip = ["Accept-Encoding"]
+        async with http.get("/channels/", skip_auto_headers=skip) as response:
+            assert "Content-Encoding" not in response.headers
+
+    run_with_app(app, check, tmp_path)
+
+
+def test_app_cleanup_stops_prefetchers(tmp_path):
+    app = make_http_app(make_sxm(), renew_session=False)
+    proxy = app[PROXY_KEY]
+    prefetchers = []
+
+    async def check(http):
+        async with http.get("/octane.m3u8") as response:
+            assert response.status == 200
+        prefetchers.extend(proxy._prefetchers.values())
+        assert prefetchers[0].is_running
+
+    run_with_app(app, check, tmp_path)
+    assert not prefetchers[0].is_running
+    assert proxy._prefetchers == {}
+
+
+def test_app_streams_channel(tmp_path):
+    app = make_http_app(make_sxm(), renew_session=False)
+    proxy = app[PROXY_KEY]
+
+    async def check(http):
+        async with http.get("/stream/octane.aac") as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"] == "audio/aac"
+            assert response.headers["icy-name"] == "Octane"
+            assert await response.content.readexactly(7) == b"segment"
+            assert len(proxy._streams) == 1
+
+        async with http.get("/stream/missing.aac") as response:
+            assert response.status == 404
+        async with http.get("/stream/octane.aac?quality=huge") as response:
+            assert response.status == 400
+
+    run_with_app(app, check, tmp_path)
+
+
+def test_app_stream_needs_cryptography(tmp_path, monkeypatch):
+    monkeypatch.setattr(http_module, "HAS_CRYPTOGRAPHY", False)
+    app = make_http_app(make_sxm(), renew_session=False)
+
+    async def check(http):
+        async with http.get("/stream/octane.aac") as response:
+            assert response.status == 501
+            assert "stream" in await response.text()
+
+    run_with_app(app, check, tmp_path)
+    assert app[PROXY_KEY]._streams == {}
+
+
+def test_app_now_playing_events(tmp_path, xm_live_channel_response):
+    sxm = make_sxm()
+    polls = []
+
+    async def get_now_playing(channel):
+        polls.append(channel.id)
+        return xm_live_channel_response
+
+    sxm.get_now_playing = get_now_playing
+    app = make_http_app(sxm, renew_session=False, event_keepalive=0.05)
+    proxy = app[PROXY_KEY]
+    pollers = []
+
+    async def check(http):
+        async with http.get("/now_playing/events?channel=octane") as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"] == "text/event-stream"
+            pollers.extend(proxy._pollers.values())
+
+            lines = [await response.content.readline() for _ in range(8)]
+            assert lines[0] == b"event: cut\n"
+            assert json.loads(lines[1].removeprefix(b"data: "))["channel_id"] == (
+                "octane"
+            )
+            assert lines[2] == b"\n"
+            assert lines[3] == b"event: episode\n"
+            assert lines[4].startswith(b"data: {")
+            assert lines[5:] == [b"\n", b": keepalive\n", b"\n"]
+
+        # the next keepalive notices the client is gone
+        await asyncio.sleep(0.2)
+        assert proxy._pollers == {}
+        assert not pollers[0].is_running
+
+    run_with_app(app, check, tmp_path)
+    assert polls == ["octane"]
+
+
+def test_serve_starts_up_concurrently():
+    events = []
+
+    async def step(name, result):
+        events.append(f"start {name}")
+        await asyncio.sleep(0.01)
+        events.append(f"end {name}")
+        return result
+
+    class Client:
+        def reauthenticate(self):
+            return step("auth", False)
+
+        @property
+        def configuration(self):
+            return step("configuration", {})
+
+        @property
+        def channels(self):
+            return step("channels", [])
+
+    async def run():
+        with pytest.raises(AuthenticationError):
+            await serve(Client(), 0)
+
+    asyncio.run(run())
+    assert events[:3] == ["start auth", "start configuration", "start channels"]
+
+
+def test_idle_channel_is_released():
+    sxm = make_sxm()
+    proxy = SXMProxy(sxm, listener_timeout=0.1)
+    key = ("octane", QualitySize.LARGE_256k)
+
+    async def get(path, remote):
+        request = make_mocked_request("GET", path).clone(remote=remote)
+        return await proxy.handle(request)
+
+    async def run():
+        await get("/octane.m3u8", "10.0.0.1")
+        await get("/octane.m3u8", "10.0.0.2")
+        prefetcher = proxy._prefetchers[key]
+        assert proxy.listeners.count(key) == 2
+
+        # the second listener went quiet, the first one is still playing
+        proxy.listeners._listeners[key]["10.0.0.2"] -= 1
+        await get("/AAC_Data/octane/octane_100.aac", "10.0.0.1")
+        await asyncio.sleep(0.06)
+        assert proxy.listeners.count(key) == 1
+        sxm.release_channel.assert_not_called()
+
+        proxy.listeners._listeners[key]["10.0.0.1"] -= 1
+        await asyncio.sleep(0.06)
+        assert key not in proxy.listeners
+        assert key not in proxy._prefetchers
+        assert not prefetcher.is_running
+        proxy.stop()
+
+    asyncio.run(run())
+    sxm.release_channel.assert_called_once_with(*key)
@@ -0,0 +1,21 @@
+from sxm.listeners import ListenerTracker
+
+
+def test_last_listener_expires_key():
+    tracker = ListenerTracker(timeout=10)
+    key = ("octane", "LARGE")
+
+    assert tracker.touch(key, "10.0.0.1")
+    assert tracker.touch(key, "10.0.0.2")
+    assert not tracker.touch(key, "10.0.0.1")
+    assert tracker.count(key) == 2
+
+    # first listener refreshed at +8, second one went quiet
+    now = tracker._listeners[key]["10.0.0.1"]
+    tracker._listeners[key]["10.0.0.1"] = now + 8
+
+    assert tracker.expire(now + 11) == []
+    assert tracker.counts() == {key: 1}
+    assert tracker.expire(now + 19) == [key]
+    assert key not in tracker
+    assert len(tracker) == 0
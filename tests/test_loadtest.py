@@ -0,0 +1,55 @@
+import asyncio
+from time import monotonic
+
+import httpx
+
+from sxm.loadtest import LoadTestResult, _run_player
+
+PLAYLIST = """#EXTM3U
+#EXT-X-TARGETDURATION:0.2
+#EXT-X-MEDIA-SEQUENCE:10
+#EXTINF:0.05,
+AAC_Data/octane/octane_10.aac
+#EXTINF:0.05,
+AAC_Data/octane/octane_11.aac
+#EXTINF:0.05,
+AAC_Data/octane/octane_12.aac
+#EXTINF:0.05,
+AAC_Data/octane/octane_13.aac"""
+
+
+def test_run_player_counts_stalls():
+    requested = []
+
+    async def handler(request: httpx.Request):
+        requested.append(request.url.path)
+        if request.url.path.endswith(".m3u8"):
+            return httpx.Response(200, text=PLAYLIST)
+
+        # slower than real time, every segment after the first stalls
+        await asyncio.sleep(0.2)
+        return httpx.Response(200, content=b"x" * 100)
+
+    async def run():
+        result = LoadTestResult(players=1)
+        transport = httpx.MockTransport(handler)
+        async with httpx.AsyncClient(
+            base_url="http://proxy", transport=transport
+        ) as http:
+            await asyncio.wait_for(
+                _run_player(http, "octane", monotonic() + 0.5, result), 2
+            )
+        return result
+
+    result = asyncio.run(run())
+
+    # the live edge is 3 segments from the end
+    assert requested == [
+        "/octane.m3u8",
+        "/AAC_Data/octane/octane_11.aac",
+        "/AAC_Data/octane/octane_12.aac",
+        "/AAC_Data/octane/octane_13.aac",
+    ]
+    assert result.bytes == 300
+    assert result.stalls == 2
+    assert result.errors == 0
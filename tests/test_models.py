@@ -1,7 +1,12 @@
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch
 
-from sxm.models import XMLiveChannel
+from sxm.models import (
+    QualitySize,
+    XMLiveChannel,
+    build_hls_variant_table,
+    extract_now_playing,
+)
 
 
 def test_channel(sxm_client):
@@ -107,3 +112,134 @@ def test_live_channel(sxm_client):
     assert cut.cut.album.title == "Ten Thousand Fists"
     assert len(cut.cut.artists) == 1
     assert cut.cut.artists[0].name == "Disturbed"
+
+
+def test_live_channel_marker_timeline(xm_live_channel_response):
+    module = xm_live_channel_response["moduleList"]["modules"][0]
+    live_channel_data = module["moduleResponse"]["liveChannelData"]
+
+    channel = XMLiveChannel.model_validate(
+        {
+            "channelId": "octane",
+            "hlsAudioInfos": live_channel_data["hlsAudioInfos"],
+            "customAudioInfos": live_channel_data["customAudioInfos"],
+            "episode_markers": live_channel_data["markerLists"],
+            "cut_markers": live_channel_data["markerLists"],
+        }
+    )
+
+    assert len(channel.cut_markers) == 9
+    assert len(channel.song_cuts) == 5
+    assert len(channel.episode_markers) == 3
+    assert list(channel.cut_markers.times) == sorted(channel.cut_markers.times)
+
+    now = datetime(2021, 7, 14, 18, tzinfo=timezone.utc)
+    cut = channel.get_latest_cut(now)
+    assert cut.time < now
+    # only the returned marker is validated
+    assert sum(m is not None for m in channel.cut_markers._validated) == 1
+
+    start = datetime(2021, 7, 14, tzinfo=timezone.utc)
+    markers = channel.cut_markers.between(start, now)
+    assert markers[-1] is cut
+    assert all(start <= m.time < now for m in markers)
+
+    episode = channel.get_latest_episode()
+    assert episode.episode.long_title == "Octane with Jose Mangin"
+
+
+def test_live_channel_merge(xm_live_channel_response):
+    module = xm_live_channel_response["moduleList"]["modules"][0]
+    live_channel_data = module["moduleResponse"]["liveChannelData"]
+    cut_list = next(m for m in live_channel_data["markerLists"] if m["layer"] == "cut")
+    cuts = [m for m in cut_list["markers"] if "cut" in m]
+
+    channel = XMLiveChannel.model_validate(
+        {
+            "channelId": "octane",
+            "hlsAudioInfos": [],
+            "customAudioInfos": [],
+            "cut_markers": [{"layer": "cut", "markers": cuts[:5]}],
+        }
+    )
+    assert len(channel.cut_markers) == 5
+    songs = channel.song_cuts
+    assert len(songs) == 2
+
+    # full history again only adds the markers that are new
+    assert channel.merge(live_channel_data) == 4 + 3
+    assert channel.merge(live_channel_data) == 0
+    assert len(channel.cut_markers) == 9
+    # the song timeline is extended, not rebuilt
+    assert channel.song_cuts is songs
+    assert len(songs) == 5
+    assert list(songs.times) == sorted(songs.times)
+    assert list(channel.cut_markers.times) == sorted(channel.cut_markers.times)
+
+    # evict everything older than 12 minutes before the latest cut, except
+    # the cut still playing at that time
+    now = channel.cut_markers[-1].time
+    cutoff = now - timedelta(minutes=12)
+    channel.merge(live_channel_data, retention=timedelta(minutes=12), now=now)
+    assert channel.cut_markers[0].time < cutoff
+    assert all(m.time >= cutoff for m in channel.cut_markers[1:])
+    assert len(channel.cut_markers) == 7
+
+
+def test_live_channel_merge_keeps_current_episode(xm_live_channel_response):
+    module = xm_live_channel_response["moduleList"]["modules"][0]
+    live_channel_data = module["moduleResponse"]["liveChannelData"]
+
+    channel = XMLiveChannel.model_validate(
+        {"channelId": "octane", "hlsAudioInfos": [], "customAudioInfos": []}
+    )
+    channel.merge(live_channel_data)
+    now = channel.cut_markers[-1].time
+    episode = channel.get_latest_episode(now)
+    assert episode is not None
+
+    channel.merge(live_channel_data, retention=timedelta(minutes=10), now=now)
+    assert len(channel.cut_markers) > 0
+    assert channel.get_latest_cut(now) is not None
+    assert channel.get_latest_episode(now).guid == episode.guid
+
+
+def test_extract_now_playing(xm_live_channel_response):
+    now_ms = 1626294000000
+    records = extract_now_playing(
+        {
+            "octane": xm_live_channel_response,
+            "other": xm_live_channel_response,
+            "missing": None,
+        },
+        now_ms,
+    )
+
+    assert records["missing"] is None
+    assert records["octane"] == records["other"]._replace(channel_id="octane")
+
+    record = records["octane"]
+    assert record.channel_id == "octane"
+    assert record.played_at_ms == 1626293998037
+    assert record.played_at_ms <= now_ms
+    assert record.artist != "Unknown"
+
+
+def test_build_hls_variant_table(xm_live_channel_response):
+    module = xm_live_channel_response["moduleList"]["modules"][0]
+    hls_infos = module["moduleResponse"]["liveChannelData"]["hlsAudioInfos"]
+
+    table = build_hls_variant_table(hls_infos, "https://primary/", "https://secondary")
+
+    channel = XMLiveChannel.model_validate(
+        {"channelId": "octane", "hlsAudioInfos": hls_infos, "customAudioInfos": []}
+    )
+    channel.set_hls_roots("https://primary/", "https://secondary")
+    for quality in QualitySize:
+        channel.set_stream_quality(quality)
+        assert table[("primary", quality.value)] == channel.primary_hls.resolved_url
+        assert table[("secondary", quality.value)] == channel.secondary_hls.resolved_url
+
+    assert table[("primary", "LARGE")] == (
+        "https://primary/AAC_Data/octane/octane_variant_large_v3.m3u8"
+    )
@@ -0,0 +1,78 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from sxm.prefetch import SegmentPrefetcher
+
+
+def make_playlist(first: int, count: int = 6) -> str:
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:10", f"#EXT-X-MEDIA-SEQUENCE:{first}"]
+    for sequence in range(first, first + count):
+        lines.append("#EXTINF:10,")
+        lines.append(f"AAC_Data/octane/HLS_1/octane_{sequence}.aac")
+    return "\n".join(lines)
+
+
+def test_prefetcher_keeps_segments_ahead_of_listener():
+    fetched = []
+
+    async def get_segment(path):
+        fetched.append(path)
+        await asyncio.sleep(0)
+        return path.encode()
+
+    async def run():
+        prefetcher = SegmentPrefetcher(
+            MagicMock(), "octane", get_segment=get_segment, ahead=2
+        )
+        prefetcher.start(make_playlist(100))
+        await asyncio.sleep(0.01)
+
+        # starts at the live edge, 3 segments from the end
+        assert fetched == [
+            "AAC_Data/octane/HLS_1/octane_103.aac",
+            "AAC_Data/octane/HLS_1/octane_104.aac",
+        ]
+
+        data = await prefetcher.get_segment("AAC_Data/octane/HLS_1/octane_103.aac")
+        assert data == b"AAC_Data/octane/HLS_1/octane_103.aac"
+        await asyncio.sleep(0.01)
+        assert fetched[2:] == ["AAC_Data/octane/HLS_1/octane_105.aac"]
+
+        # segments that left the playlist are dropped
+        prefetcher._update(make_playlist(104))
+        assert "AAC_Data/octane/HLS_1/octane_103.aac" not in prefetcher
+        assert "AAC_Data/octane/HLS_1/octane_104.aac" in prefetcher._segments
+
+        prefetcher.stop()
+        assert not prefetcher.is_running
+        assert prefetcher.playlist is None
+
+    asyncio.run(run())
+
+
+def test_prefetcher_cancels_stale_prefetches():
+    started = []
+
+    async def get_segment(path):
+        started.append(path)
+        await asyncio.sleep(10)
+
+    async def run():
+        prefetcher = SegmentPrefetcher(
+            MagicMock(), "octane", get_segment=get_segment, ahead=3, concurrency=1
+        )
+        prefetcher.start(make_playlist(100))
+        await asyncio.sleep(0)
+        assert len(prefetcher._tasks) == 3
+
+        # listener jumped ahead, everything before it is stale
+        prefetcher._position = 104
+        prefetcher._schedule()
+        assert list(prefetcher._tasks) == [
+            "AAC_Data/octane/HLS_1/octane_104.aac",
+            "AAC_Data/octane/HLS_1/octane_105.aac",
+        ]
+
+        prefetcher.stop()
+
+    asyncio.run(run())
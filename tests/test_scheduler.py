@@ -0,0 +1,100 @@
+import asyncio
+from time import monotonic
+
+import pytest
+
+from sxm import SXMClientAsync
+from sxm.scheduler import (
+    EndpointClass,
+    Priority,
+    TokenBucket,
+    UpstreamScheduler,
+    upstream_priority,
+)
+
+
+def test_bucket_grants_by_priority():
+    order = []
+
+    async def take(bucket, name, priority):
+        await bucket.acquire(priority)
+        order.append(name)
+
+    async def run():
+        bucket = TokenBucket(100, burst=1)
+        await bucket.acquire()
+
+        await asyncio.gather(
+            take(bucket, "poll", Priority.BACKGROUND),
+            take(bucket, "prefetch", Priority.PREFETCH),
+            take(bucket, "listener", Priority.LISTENER),
+            take(bucket, "listener2", Priority.LISTENER),
+        )
+        return bucket
+
+    bucket = asyncio.run(run())
+    assert order == ["listener", "listener2", "prefetch", "poll"]
+    assert bucket.waited == 4
+
+
+def test_bucket_limits_rate():
+    async def run():
+        bucket = TokenBucket(50, burst=1)
+        start = monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        return monotonic() - start
+
+    # the first token is in the bucket, the next 5 take 20ms each
+    assert asyncio.run(run()) >= 0.09
+
+
+def test_cancelled_waiter_is_skipped():
+    async def run():
+        bucket = TokenBucket(100, burst=1)
+        await bucket.acquire()
+
+        waiting = asyncio.ensure_future(bucket.acquire(Priority.LISTENER))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+
+        assert bucket.waiting == 0
+        await asyncio.wait_for(bucket.acquire(Priority.BACKGROUND), 1)
+
+    asyncio.run(run())
+
+
+def test_scheduler_uses_context_priority_and_promote():
+    order = []
+
+    async def request(scheduler, name):
+        await scheduler.acquire(EndpointClass.CDN)
+        order.append(name)
+
+    async def run():
+        scheduler = UpstreamScheduler(rest_rate=None, cdn_rate=100, cdn_burst=1)
+        assert EndpointClass.REST not in scheduler.buckets
+        await scheduler.acquire(EndpointClass.CDN)
+
+        with upstream_priority(Priority.BACKGROUND):
+            poll = asyncio.ensure_future(request(scheduler, "poll"))
+        with upstream_priority(Priority.PREFETCH):
+            prefetch = asyncio.ensure_future(request(scheduler, "prefetch"))
+        await asyncio.sleep(0)
+
+        # a listener is now waiting on the poll
+        scheduler.promote(poll)
+        await asyncio.gather(poll, prefetch)
+
+        # REST requests are not limited
+        await asyncio.wait_for(scheduler.acquire(EndpointClass.REST), 0.01)
+
+    asyncio.run(run())
+    assert order == ["poll", "prefetch"]
+
+
+def test_clients_are_not_limited_by_default():
+    sxm = SXMClientAsync("user", "password", user_agent="test")
+    assert sxm.scheduler.buckets == {}
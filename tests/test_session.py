@@ -0,0 +1,120 @@
+import asyncio
+
+from sxm import SXMClientAsync, client
+
+
+def test_renew_session_swaps_and_drains(monkeypatch):
+    async def authenticate(self):
+        self._session.cookies.set("JSESSIONID", "renewed")
+        return True
+
+    monkeypatch.setattr(SXMClientAsync, "authenticate", authenticate)
+    monkeypatch.setattr(client, "SESSION_DRAIN_TIME", 0.01)
+
+    async def run():
+        sxm = SXMClientAsync("user", "password", user_agent="test")
+        old_session = sxm._session
+
+        assert await sxm.renew_session()
+        assert sxm._session is not old_session
+        assert sxm._session.cookies["JSESSIONID"] == "renewed"
+        # in flight requests can still finish on the old session
+        assert not old_session.is_closed
+
+        await asyncio.sleep(0.05)
+        assert old_session.is_closed
+        await sxm.close_session()
+
+    asyncio.run(run())
+
+
+def test_close_session_closes_draining_sessions(monkeypatch):
+    async def authenticate(self):
+        return True
+
+    monkeypatch.setattr(SXMClientAsync, "authenticate", authenticate)
+
+    async def run():
+        sxm = SXMClientAsync("user", "password", user_agent="test")
+        old_session = sxm._session
+
+        assert await sxm.renew_session()
+        assert not old_session.is_closed
+
+        # shutting down right after a renewal does not wait for the drain
+        await asyncio.wait_for(sxm.close_session(), 1)
+        assert old_session.is_closed
+        assert not sxm._draining
+
+    asyncio.run(run())
+
+
+def test_failed_renewal_keeps_session(monkeypatch):
+    async def authenticate(self):
+        return False
+
+    monkeypatch.setattr(SXMClientAsync, "authenticate", authenticate)
+
+    async def run():
+        sxm = SXMClientAsync("user", "password", user_agent="test")
+        old_session = sxm._session
+
+        assert not await sxm.renew_session()
+        assert sxm._session is old_session
+        await sxm.close_session()
+
+    asyncio.run(run())
+
+
+def test_reauthenticate_is_single_flight(monkeypatch):
+    calls = 0
+
+    async def authenticate(self):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return True
+
+    monkeypatch.setattr(SXMClientAsync, "authenticate", authenticate)
+
+    async def run():
+        sxm = SXMClientAsync("user", "password", user_agent="test")
+        generation = sxm.session_generation
+
+        results = await asyncio.gather(
+            *(sxm.reauthenticate(generation, reset=True) for _ in range(5))
+        )
+        assert results == [True] * 5
+        # the reset replaced the session exactly once
+        assert sxm.session_generation == generation + 1
+        await sxm.close_session()
+
+    asyncio.run(run())
+    assert calls == 1
+
+
+def test_reauthenticate_ignores_stale_generation(monkeypatch):
+    calls = 0
+
+    async def authenticate(self):
+        nonlocal calls
+        calls += 1
+        return True
+
+    monkeypatch.setattr(SXMClientAsync, "authenticate", authenticate)
+
+    async def run():
+        sxm = SXMClientAsync("user", "password", user_agent="test")
+        stale = sxm.session_generation
+        await sxm.close_session()
+        sxm.reset_session()
+        sxm._session.cookies.set("AWSALB", "new")
+        sxm._session.cookies.set("JSESSIONID", "new")
+        session = sxm._session
+
+        assert await sxm.reauthenticate(stale, reset=True)
+        assert sxm._session is session
+        await sxm.close_session()
+
+    asyncio.run(run())
+    assert calls == 0
@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from sxm.stream import Broadcaster, ChannelStream, parse_playlist
+
+SAMPLE_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-TARGETDURATION:10
+#EXT-X-MEDIA-SEQUENCE:100
+#EXT-X-KEY:METHOD=AES-128,URI="key/1"
+#EXTINF:10,
+AAC_Data/octane/HLS_1/octane_100.aac
+#EXTINF:10,
+AAC_Data/octane/HLS_1/octane_101.aac
+#EXTINF:9.5,
+AAC_Data/octane/HLS_1/octane_102.aac"""
+
+
+def test_parse_playlist():
+    media = parse_playlist(SAMPLE_PLAYLIST)
+
+    assert media.target_duration == 10
+    assert media.media_sequence == 100
+    assert media.is_encrypted
+    assert [s.sequence for s in media.segments] == [100, 101, 102]
+    assert media.segments[2].duration == 9.5
+    assert media.segments[0].path == "AAC_Data/octane/HLS_1/octane_100.aac"
+    assert media.segment_iv(media.segments[1]) == (101).to_bytes(16, "big")
+
+
+def test_channel_stream_drops_for_slow_listener():
+    playlist = SAMPLE_PLAYLIST.replace('#EXT-X-KEY:METHOD=AES-128,URI="key/1"\n', "")
+
+    async def get_playlist(channel_id, quality=None):
+        return playlist
+
+    async def get_segment(path):
+        return path.encode()
+
+    async def run():
+        sxm = MagicMock()
+        sxm.get_playlist = get_playlist
+        stream = ChannelStream(
+            sxm, "octane", get_segment=get_segment, queue_size=1, burst=3
+        )
+
+        slow = stream.subscribe()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert stream.dropped == 2
+        assert slow.get_nowait() == b"AAC_Data/octane/HLS_1/octane_102.aac"
+
+        stream.unsubscribe(slow)
+        assert not stream.is_running
+
+    asyncio.run(run())
+
+
+class IdleBroadcaster(Broadcaster):
+    async def _run(self) -> None:
+        await asyncio.Event().wait()
+
+
+def test_burst_fits_small_queues():
+    async def run():
+        broadcaster = IdleBroadcaster(queue_size=1)
+        broadcaster._publish(b"1")
+        broadcaster._publish(b"2")
+
+        queue = broadcaster.subscribe()
+        assert queue.get_nowait() == b"2"
+        broadcaster.stop()
+
+    asyncio.run(run())
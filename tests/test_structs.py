@@ -0,0 +1,37 @@
+from sxm.models import XMChannel
+from sxm.structs import XMChannelStruct
+
+CHANNEL = {
+    "channelGuid": "octane-guid",
+    "channelId": "octane",
+    "name": "Octane",
+    "streamingName": "Octane",
+    "sortOrder": "37",
+    "shortDescription": "Hard Rock",
+    "mediumDescription": "New hard rock",
+    "url": "https://www.siriusxm.com/octane",
+    "isAvailable": True,
+    "isFavorite": False,
+    "isMature": True,
+    "siriusChannelNumber": "37",
+    "images": {
+        "images": [
+            {"url": "https://pri.art.siriusxm.com/octane.png", "width": 300},
+        ]
+    },
+    "categories": {"categories": [{"categoryGuid": "rock-guid", "name": "Rock"}]},
+}
+
+
+def test_channel_struct():
+    channel = XMChannelStruct.from_dict(CHANNEL)
+
+    assert channel.id == "octane"
+    assert channel.sort_order == 37
+    assert channel.pretty_name == "#37 Octane"
+    assert channel.images[0].width == 300
+    assert channel.categories[0].name == "Rock"
+
+    model = channel.to_model()
+    assert isinstance(model, XMChannel)
+    assert model == XMChannel.model_validate(CHANNEL)
@@ -0,0 +1,69 @@
+import asyncio
+import logging
+from unittest.mock import MagicMock
+
+from tenacity import retry, stop_after_attempt
+
+from sxm import SXMClientAsync
+from sxm.tracing import Tracer, trace_retry, traced
+
+
+def test_segment_span_is_a_phase_of_parent(caplog):
+    spans = []
+    tracer = Tracer(on_span=spans.append, slow_threshold=0)
+    sxm = SXMClientAsync("user", "password", user_agent="test", tracer=tracer)
+    sxm._urls = {"Live_Primary_HLS": "https://example.com"}
+
+    async def get(url, params=None):
+        response = MagicMock()
+        response.is_error = False
+        response.content = b"data"
+        return response
+
+    async def run():
+        await sxm.close_session()
+        sxm._session = MagicMock()
+        sxm._session.get = get
+        sxm._session.cookies = {}
+
+        with tracer.span("proxy.segment") as span:
+            await sxm.get_segment("AAC_Data/octane/octane_1.aac")
+        return span
+
+    with caplog.at_level(logging.WARNING):
+        parent = asyncio.run(run())
+
+    assert [s.name for s in spans] == ["sxm.segment", "proxy.segment"]
+    assert spans[0].attributes == {"path": "AAC_Data/octane/octane_1.aac"}
+    assert spans[0].parent is parent
+    assert set(parent.phases) == {"sxm.segment"}
+    assert "Slow sxm.segment" in caplog.text
+
+
+def test_retries_are_span_events():
+    spans = []
+
+    class Client:
+        tracer = Tracer(on_span=spans.append)
+        calls = 0
+
+        @traced("test.fetch", "key")
+        @retry(stop=stop_after_attempt(3), before_sleep=trace_retry)
+        async def fetch(self, key):
+            self.calls += 1
+            if self.calls < 3:
+                raise ValueError("nope")
+            return key
+
+    assert asyncio.run(Client().fetch("octane")) == "octane"
+
+    (span,) = spans
+    assert span.attributes == {"key": "octane"}
+    assert [e[1]["attempt"] for e in span.events] == [1, 2]
+    assert span.events[0][1]["function"] == "fetch"
+
+
+def test_no_tracer_is_passthrough():
+    sxm = SXMClientAsync("user", "password", user_agent="test")
+    assert sxm.tracer is None
+    asyncio.run(sxm.close_session())